@@ -0,0 +1,156 @@
+"""Measure the throughput of forwarding stores into one aggregator.
+
+Simulates many nodes on localhost, each a `ForwardingStore` sending ticks
+of a synthetic process table over TCP to an `Aggregator` that writes into a
+store discarding the rows. Reports the messages, rows and (compressed)
+bytes per second the aggregator merges, and how many messages the nodes
+had to drop for lack of credit.
+
+Example:
+    ```bash
+    python benchmarks/aggregator.py --nodes 128 --ticks 50 --processes 500
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import threading
+import time
+
+import numpy as np
+import polars
+
+from magnify.store.base import BaseStore
+from magnify.store.proxy import Aggregator
+from magnify.store.proxy import ForwardingStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+
+class CountingStore(BaseStore):
+    """Store counting the rows written to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.rows = 0
+        self.ticks = 0
+
+    def _put(self, measurements: dict[str, TimedMeasurement]):
+        self.ticks += 1
+        for timed_measurement in measurements.values():
+            self.rows += len(timed_measurement.measurement)
+
+    def put_task(self, task: TimedTask):
+        """Ignore tasks."""
+
+
+def synthetic_tick(processes: int, seed: int) -> dict[str, TimedMeasurement]:
+    """Generate the measurements of one tick of a node."""
+    rng = np.random.default_rng(seed)
+    now = datetime.datetime.now(datetime.UTC)
+    return {
+        'psutil': TimedMeasurement(
+            now,
+            polars.DataFrame(
+                {
+                    'psutil_process_pid': np.arange(processes),
+                    'psutil_process_time_user': rng.exponential(10, processes),
+                    'psutil_process_memory_resident': rng.integers(
+                        2**20,
+                        2**30,
+                        processes,
+                    ),
+                },
+            ),
+        ),
+        'rapl': TimedMeasurement(now, float(rng.normal(100, 5))),
+    }
+
+
+def drive(
+    nodes: list[ForwardingStore],
+    ticks: int,
+    tick: dict[str, TimedMeasurement],
+) -> None:
+    """Send every tick from each of the nodes."""
+    for _ in range(ticks):
+        for node in nodes:
+            node.put_measurement(tick)
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=128)
+    parser.add_argument('--ticks', type=int, default=50)
+    parser.add_argument('--processes', type=int, default=500)
+    parser.add_argument('--credits', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5560)
+    parser.add_argument('--json', action='store_true', help='Print JSON.')
+    options = parser.parse_args()
+
+    store = CountingStore()
+    aggregator = Aggregator(
+        [store],
+        f'tcp://127.0.0.1:{options.port}',
+        credits=options.credits,
+    )
+    aggregator.start()
+    aggregator.ready.wait()
+
+    nodes = [
+        ForwardingStore(
+            f'tcp://127.0.0.1:{options.port}',
+            host=f'node{i}',
+            max_pending=options.ticks,
+        )
+        for i in range(options.nodes)
+    ]
+    tick = synthetic_tick(options.processes, 0)
+    expected = options.nodes * options.ticks
+
+    start = time.perf_counter()
+    threads = [
+        threading.Thread(
+            target=drive,
+            args=(nodes[i :: options.threads], options.ticks, tick),
+        )
+        for i in range(options.threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for node in nodes:
+        node.close()
+    dropped = sum(node.dropped for node in nodes)
+    while store.ticks < expected - dropped:
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    aggregator.shutdown()
+
+    results = {
+        'options': vars(options),
+        'seconds': elapsed,
+        'messages_per_second': store.ticks / elapsed,
+        'rows_per_second': store.rows / elapsed,
+        'megabytes_per_second': aggregator.bytes / elapsed / 2**20,
+        'dropped': dropped,
+    }
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f'{options.nodes} nodes: {results["messages_per_second"]:.0f} '
+        f'ticks/s, {results["rows_per_second"]:.0f} rows/s, '
+        f'{results["megabytes_per_second"]:.1f} MiB/s, '
+        f'{dropped} dropped',
+    )
+
+
+if __name__ == '__main__':
+    main()
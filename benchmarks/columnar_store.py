@@ -0,0 +1,124 @@
+"""Compare disk usage and write cost of the csv and columnar stores.
+
+Writes synthetic psutil-like process tables and a float stream through
+`FileStore` and `ParquetStore` (Parquet and Arrow IPC) and reports the
+bytes written and CPU time spent per tick.
+
+Example:
+    ```bash
+    python benchmarks/columnar_store.py --ticks 600 --processes 500
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import pathlib
+import tempfile
+import time
+
+import numpy as np
+import polars
+
+from magnify.store.base import BaseStore
+from magnify.store.file import FileStore
+from magnify.store.parquet import ParquetStore
+from magnify.types import TimedMeasurement
+
+
+def synthetic_ticks(
+    ticks: int,
+    processes: int,
+    seed: int = 0,
+) -> list[dict[str, TimedMeasurement]]:
+    """Generate the measurements of a one second sampling interval."""
+    rng = np.random.default_rng(seed)
+    start = datetime.datetime.now(datetime.UTC)
+    pids = np.arange(processes)
+    user = np.zeros(processes)
+    rss = rng.integers(2**20, 2**30, processes)
+    data = []
+    for i in range(ticks):
+        user = user + rng.exponential(0.1, processes)
+        rss = rss + rng.integers(-(2**12), 2**12, processes)
+        time_ = start + datetime.timedelta(seconds=i)
+        data.append(
+            {
+                'psutil': TimedMeasurement(
+                    time_,
+                    polars.DataFrame(
+                        {
+                            'psutil_process_pid': pids,
+                            'psutil_process_time_user': user,
+                            'psutil_process_memory_resident': rss,
+                            'psutil_process_num_threads': np.ones(
+                                processes,
+                                dtype=np.int64,
+                            ),
+                        },
+                    ),
+                ),
+                'rapl': TimedMeasurement(time_, float(rng.normal(100, 5))),
+            },
+        )
+    return data
+
+
+def run(store: BaseStore, data: list[dict[str, TimedMeasurement]]) -> float:
+    """Return the CPU microseconds per tick to write the data."""
+    start = time.process_time()
+    for measurements in data:
+        store.put_measurement(measurements)
+    store.close()
+    return (time.process_time() - start) / len(data) * 1e6
+
+
+def disk_usage(path: pathlib.Path) -> int:
+    """Return the number of bytes of the files under path."""
+    return sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=600)
+    parser.add_argument('--processes', type=int, default=500)
+    parser.add_argument('--max-rows', type=int, default=100_000)
+    parser.add_argument('--json', action='store_true', help='Print JSON.')
+    options = parser.parse_args()
+
+    data = synthetic_ticks(options.ticks, options.processes)
+    stores = {
+        'csv': lambda d: FileStore(d),
+        'parquet': lambda d: ParquetStore(d, max_rows=options.max_rows),
+        'ipc': lambda d: ParquetStore(
+            d,
+            format='ipc',
+            max_rows=options.max_rows,
+        ),
+    }
+
+    results = {'options': vars(options), 'stores': {}}
+    for name, make_store in stores.items():
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = pathlib.Path(tmp_dir)
+            us = run(make_store(path), data)
+            results['stores'][name] = {
+                'cpu_us_per_tick': us,
+                'bytes': disk_usage(path),
+            }
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results['stores'].items():
+        print(
+            f'{name:>8}: {result["bytes"] / 2**20:8.2f} MiB, '
+            f'{result["cpu_us_per_tick"]:.0f}us CPU per tick',
+        )
+
+
+if __name__ == '__main__':
+    main()
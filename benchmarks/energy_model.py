@@ -0,0 +1,142 @@
+"""Compare the accuracy and per-tick latency of the energy models.
+
+Feeds synthetic perf counters and RAPL readings through `PerfEnergySensor`
+with each model kind. Halfway through, the coefficients of the synthetic
+workload change to force the models to adapt. Each model runs on small
+counts and on counter rates of a busy node, around 1e9 to 1e10 per second,
+where the intercept is hardest to estimate.
+
+Example:
+    ```bash
+    python benchmarks/energy_model.py --ticks 2000 --processes 256
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import time
+from unittest import mock
+
+import numpy as np
+import polars
+
+from magnify.sensor.energy import _DEFAULT_ENERGY_EVENTS
+from magnify.sensor.energy import PerfEnergySensor
+
+# Counts per process per tick, and coefficients before and after the drift
+_MAGNITUDES = {
+    'small': (
+        1000,
+        np.array([0.001, 0.00025, 0.0005]),
+        np.array([0.0015, 0.0001, 0.0008]),
+    ),
+    'realistic': (
+        4e8,
+        np.array([2e-9, 1e-9, 5e-10]),
+        np.array([3e-9, 4e-10, 8e-10]),
+    ),
+}
+
+
+def synthetic_ticks(
+    ticks: int,
+    processes: int,
+    noise: float,
+    magnitude: str = 'small',
+    seed: int = 0,
+) -> list[tuple[polars.DataFrame, float]]:
+    """Generate (perf, rapl) pairs for a one second sampling interval."""
+    rng = np.random.default_rng(seed)
+    high, weights, drifted = _MAGNITUDES[magnitude]
+    data = []
+    for i in range(ticks):
+        counters = rng.uniform(0, high, (processes, len(weights)))
+        perf = polars.DataFrame(
+            counters,
+            schema=_DEFAULT_ENERGY_EVENTS,
+            orient='row',
+        ).with_columns(
+            pid=polars.int_range(processes),
+            ppid=polars.lit(0),
+        )
+        w = weights if i < ticks // 2 else drifted
+        power = counters.sum(axis=0) @ w + 60
+        data.append((perf, float(power * rng.normal(1, noise))))
+    return data
+
+
+def run(
+    model: str,
+    magnitude: str,
+    data: list[tuple[polars.DataFrame, float]],
+) -> dict:
+    """Run the sensor over the data and collect accuracy and latency."""
+    start = datetime.datetime.now(datetime.UTC)
+    clock = (start + datetime.timedelta(seconds=i) for i in range(10**9))
+    with mock.patch('datetime.datetime') as m:
+        m.now.side_effect = clock
+        sensor = PerfEnergySensor(model=model)
+        latencies = []
+        errors = []
+        for perf, rapl in data:
+            features = perf.select(polars.sum(sensor.events)).to_numpy()
+            if sensor.model is not None:
+                predicted = sensor.model.predict(features)[0]
+                errors.append(abs(predicted - rapl) / rapl)
+
+            t0 = time.perf_counter()
+            sensor.invoke(perf, rapl)
+            latencies.append(time.perf_counter() - t0)
+
+    latencies = np.array(latencies) * 1e6
+    return {
+        'model': model,
+        'magnitude': magnitude,
+        'relative_error': float(np.mean(errors)),
+        'intercept': float(sensor.model.intercept_),
+        'latency_us_p50': float(np.percentile(latencies, 50)),
+        'latency_us_p99': float(np.percentile(latencies, 99)),
+        'latency_us_max': float(latencies.max()),
+    }
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=64)
+    parser.add_argument('--noise', type=float, default=0.05)
+    parser.add_argument('--json', action='store_true', help='Print JSON.')
+    options = parser.parse_args()
+
+    results = []
+    for magnitude in _MAGNITUDES:
+        data = synthetic_ticks(
+            options.ticks,
+            options.processes,
+            options.noise,
+            magnitude,
+        )
+        results.extend(
+            run(model, magnitude, data) for model in ('rls', 'elasticnet')
+        )
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    for r in results:
+        print(
+            f'{r["model"]:>10} {r["magnitude"]:>9}: '
+            f'error {r["relative_error"]:.4f}  '
+            f'intercept {r["intercept"]:.1f}  '
+            f'p50 {r["latency_us_p50"]:.0f}us  '
+            f'p99 {r["latency_us_p99"]:.0f}us  '
+            f'max {r["latency_us_max"]:.0f}us',
+        )
+
+
+if __name__ == '__main__':
+    main()
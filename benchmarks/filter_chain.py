@@ -0,0 +1,143 @@
+"""Microbenchmark filtering for configurations with many streams and stores.
+
+Compares the per-tick cost of the previous filtering path of
+`BaseStore.put_measurement` (copying the measurement dict for includes and
+twice for every filter) with compiled `FilterChain`s, with and without
+sharing chains between stores that have identical filters.
+
+Example:
+    ```bash
+    python benchmarks/filter_chain.py --streams 200 --stores 16
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import time
+from collections.abc import Callable
+
+from magnify.filters.base import BaseFilter
+from magnify.filters.basic import Downsample
+from magnify.filters.chain import FilterChain
+from magnify.types import TimedMeasurement
+
+
+def legacy_filter(
+    measurements: dict[str, TimedMeasurement],
+    filters: list[BaseFilter],
+    includes: None | set[str],
+) -> dict[str, TimedMeasurement]:
+    """Filter measurements the way put_measurement did before chains."""
+    if includes is not None:
+        measurements = {
+            k: measurements[k] for k in includes & measurements.keys()
+        }
+    for f in filters:
+        measurements = f.apply(measurements)
+    return measurements
+
+
+def make_config(
+    streams: list[str],
+    stores: int,
+    filters: int,
+    distinct: int,
+) -> list[tuple[list[BaseFilter], set[str], int]]:
+    """Create the filters and includes of every store.
+
+    Stores are split into `distinct` groups with identical configuration.
+    Filters pass every measurement through so only routing is measured.
+    """
+    configs = []
+    for i in range(stores):
+        group = i % distinct
+        includes = set(streams[group::distinct] + streams[: len(streams) // 2])
+        store_filters = [
+            Downsample(k=1, to=set(streams[j::filters][:5]))
+            for j in range(filters)
+        ]
+        configs.append((store_filters, includes, group))
+    return configs
+
+
+def make_runners(
+    streams: list[str],
+    configs: list[tuple[list[BaseFilter], set[str], int]],
+) -> dict[str, Callable[[], None]]:
+    """Create a function filtering one tick for every store per approach."""
+    now = datetime.datetime.now(datetime.UTC)
+
+    def legacy():
+        measurements = {s: TimedMeasurement(now, 1.0) for s in streams}
+        for filters, includes, _ in configs:
+            legacy_filter(measurements, filters, includes)
+
+    chains = [FilterChain(f, includes) for f, includes, _ in configs]
+
+    def compiled():
+        measurements = {s: TimedMeasurement(now, 1.0) for s in streams}
+        for chain in chains:
+            chain(measurements)
+
+    shared_chains = {}
+    for f, includes, group in configs:
+        if group in shared_chains:
+            shared_chains[group].memoize = True
+        else:
+            shared_chains[group] = FilterChain(f, includes)
+    per_store = [shared_chains[group] for _, _, group in configs]
+
+    def shared():
+        measurements = {s: TimedMeasurement(now, 1.0) for s in streams}
+        for chain in per_store:
+            chain(measurements)
+
+    return {'legacy': legacy, 'compiled': compiled, 'shared': shared}
+
+
+def bench(fn: Callable[[], None], ticks: int) -> float:
+    """Return the mean microseconds per tick of fn."""
+    start = time.perf_counter()
+    for _ in range(ticks):
+        fn()
+    return (time.perf_counter() - start) / ticks * 1e6
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--streams', type=int, default=200)
+    parser.add_argument('--stores', type=int, default=16)
+    parser.add_argument('--filters', type=int, default=4)
+    parser.add_argument('--distinct', type=int, default=4)
+    parser.add_argument('--ticks', type=int, default=2000)
+    parser.add_argument('--json', action='store_true', help='Print JSON.')
+    options = parser.parse_args()
+
+    streams = [f'stream{i}' for i in range(options.streams)]
+    configs = make_config(
+        streams,
+        options.stores,
+        options.filters,
+        options.distinct,
+    )
+    runners = make_runners(streams, configs)
+
+    results = {
+        'options': vars(options),
+        'us_per_tick': {
+            name: bench(fn, options.ticks) for name, fn in runners.items()
+        },
+    }
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, us in results['us_per_tick'].items():
+        print(f'{name:>10}: {us:.1f}us per tick')
+
+
+if __name__ == '__main__':
+    main()
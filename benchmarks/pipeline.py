@@ -0,0 +1,448 @@
+"""Benchmark the monitoring pipeline from sensors through filters to stores.
+
+Synthetic sensors emit process tables of a configurable number of rows and
+columns, with plain `pid` columns like perf, and a table with the columns
+of the psutil sensor. Ticks are taken by `MagnifyMonitor.take_measurement`
+and put into every store (without filters), and through every filter (into
+a store that discards the result). The forwarding store sends to an
+aggregator on a thread of the same process, which discards what it
+receives, and the Elasticsearch store indexes into a local stub of the
+bulk API, so both include the cost of their receiver. Each case reports
+the ticks per second, the latency percentiles of the `take_measurement`,
+filter and `_put` stages and the peak RSS of the process so far. A storm
+of task events is then published to `MagnifyMonitor.task_listener` to
+measure the task events per second.
+
+Results can be saved as JSON to compare versions.
+
+Example:
+    ```bash
+    python benchmarks/pipeline.py --ticks 200 --rows 2000 --output base.json
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import gzip
+import http.server
+import importlib.metadata
+import json
+import pathlib
+import platform
+import resource
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+
+import numpy as np
+import polars
+import zmq
+
+from magnify.filters.base import BaseFilter
+from magnify.filters.basic import Aggregate
+from magnify.filters.basic import Downsample
+from magnify.filters.basic import TopK
+from magnify.filters.compression import SwingingDoor
+from magnify.filters.delta import CounterRate
+from magnify.filters.delta import Deadband
+from magnify.monitor import MagnifyMonitor
+from magnify.sensor.base import BaseSensor
+from magnify.store.base import BaseStore
+from magnify.store.elasticsearch import ElasticsearchStore
+from magnify.store.file import FileStore
+from magnify.store.memory import MemoryStore
+from magnify.store.parquet import ParquetStore
+from magnify.store.proxy import Aggregator
+from magnify.store.proxy import ForwardingStore
+from magnify.store.recording import RecordingStore
+from magnify.store.shm import SharedMemoryStore
+from magnify.store.sqlite import SqliteStore
+from magnify.store.writer import AsyncStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+PERCENTILES = (50, 90, 99, 100)
+
+
+class SyntheticSensor(BaseSensor):
+    """Sensor emitting a process table of random walks."""
+
+    def __init__(self, name: str, rows: int, columns: int, seed: int = 0):
+        """Initialize a sensor of rows processes and columns counters."""
+        self._name = name
+        self.rng = np.random.default_rng(seed)
+        self.pids = np.arange(rows)
+        self.values = self.rng.uniform(0, 1e6, (columns, rows))
+
+    @property
+    def name(self) -> str:
+        """Return the logical name of this sensor."""
+        return self._name
+
+    def invoke(self) -> TimedMeasurement:
+        """Advance the random walks and return them."""
+        self.values += self.rng.exponential(10.0, self.values.shape)
+        data = {'pid': self.pids}
+        data.update({f'c{i}': column for i, column in enumerate(self.values)})
+        return TimedMeasurement(
+            datetime.datetime.now(datetime.UTC),
+            polars.DataFrame(data),
+        )
+
+
+class PsutilShapedSensor(BaseSensor):
+    """Sensor emitting a table with the columns of the psutil sensor."""
+
+    def __init__(self, rows: int, seed: int = 0):
+        """Initialize a sensor of rows processes."""
+        self.rng = np.random.default_rng(seed)
+        self.pids = np.arange(1000, 1000 + rows)
+        self.static = {
+            'psutil_process_pid': self.pids,
+            'psutil_process_ppid': np.full(rows, 1),
+            'psutil_process_create_time': self.rng.uniform(1.7e9, 1.8e9, rows),
+            'psutil_process_name': [f'proc{i % 50}' for i in range(rows)],
+            'psutil_process_status': ['sleeping'] * rows,
+            'psutil_process_nice': np.zeros(rows, dtype=np.int64),
+        }
+        self.counters = {
+            'psutil_process_time_user': np.zeros(rows),
+            'psutil_process_time_system': np.zeros(rows),
+            'psutil_process_disk_read': np.zeros(rows, dtype=np.int64),
+            'psutil_process_disk_write': np.zeros(rows, dtype=np.int64),
+        }
+
+    @property
+    def name(self) -> str:
+        """Return the logical name of this sensor."""
+        return 'psutil'
+
+    def invoke(self) -> TimedMeasurement:
+        """Advance the counters and return the process table."""
+        rows = len(self.pids)
+        for values in self.counters.values():
+            if values.dtype.kind == 'i':
+                values += self.rng.integers(0, 4096, rows)  # noqa: PLW2901
+            else:
+                values += self.rng.exponential(0.01, rows)  # noqa: PLW2901
+        gauges = {
+            'psutil_process_cpu_percent': self.rng.uniform(0, 100, rows),
+            'psutil_process_memory_percent': self.rng.uniform(0, 1, rows),
+            'psutil_process_memory_virtual': self.rng.integers(
+                2**20,
+                2**30,
+                rows,
+            ),
+            'psutil_process_memory_resident': self.rng.integers(
+                2**20,
+                2**28,
+                rows,
+            ),
+        }
+        return TimedMeasurement(
+            datetime.datetime.now(datetime.UTC),
+            polars.DataFrame({**self.static, **gauges, **self.counters}),
+        )
+
+
+class FloatSensor(BaseSensor):
+    """Sensor emitting a float, like RAPL."""
+
+    def __init__(self, name: str, seed: int = 0):
+        """Initialize a float sensor."""
+        self._name = name
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def name(self) -> str:
+        """Return the logical name of this sensor."""
+        return self._name
+
+    def invoke(self) -> TimedMeasurement:
+        """Return a random value."""
+        return TimedMeasurement(
+            datetime.datetime.now(datetime.UTC),
+            float(self.rng.normal(100, 5)),
+        )
+
+
+class NullStore(BaseStore):
+    """Store discarding everything, to measure filters alone."""
+
+    def __init__(self, filters: tuple[BaseFilter] = ()):
+        """Initialize a store counting the task events it discards."""
+        super().__init__(filters=filters)
+        self.tasks = 0
+
+    def _put(self, measurements: dict[str, TimedMeasurement]):
+        pass
+
+    def put_task(self, task: TimedTask):
+        """Discard a task event."""
+        self.tasks += 1
+
+
+class _BulkStub(http.server.BaseHTTPRequestHandler):
+    """Elasticsearch bulk API accepting every document."""
+
+    def do_POST(self):  # noqa: N802
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        # An action line and a document line per document
+        items = [{'create': {'status': 201}}] * (body.count(b'\n') // 2)
+        payload = json.dumps({'errors': False, 'items': items}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def peak_rss() -> int:
+    """Return the peak resident memory of the process in bytes."""
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """Return the latency percentiles of samples in microseconds."""
+    if not samples:
+        return {}
+    values = np.percentile(np.array(samples) * 1e6, PERCENTILES)
+    return {f'p{p}': float(v) for p, v in zip(PERCENTILES, values)}
+
+
+def run_case(
+    monitor: MagnifyMonitor,
+    store: BaseStore,
+    ticks: int,
+) -> dict[str, object]:
+    """Run ticks through the stages of a monitor with one store."""
+    stages: dict[str, list[float]] = {'take': [], 'filter': [], 'put': []}
+    start = time.perf_counter()
+    for _ in range(ticks):
+        t0 = time.perf_counter()
+        measurements = monitor.take_measurement()
+        t1 = time.perf_counter()
+        filtered = store.chain(measurements)
+        t2 = time.perf_counter()
+        store._put(filtered)
+        t3 = time.perf_counter()
+        stages['take'].append(t1 - t0)
+        stages['filter'].append(t2 - t1)
+        stages['put'].append(t3 - t2)
+    store.close()
+    elapsed = time.perf_counter() - start
+    return {
+        'ticks_per_second': ticks / elapsed,
+        'latency_us': {name: percentiles(s) for name, s in stages.items()},
+        'peak_rss': peak_rss(),
+    }
+
+
+def task_storm(events: int, address: str, timeout: float = 30.0) -> float:
+    """Return the task events per second received by the task listener."""
+    store = NullStore()
+    monitor = MagnifyMonitor([], [store], monitor_address=address)
+    listener = threading.Thread(target=monitor.task_listener, daemon=True)
+    listener.start()
+
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.setsockopt(zmq.SNDHWM, 0)
+    socket.connect(address)
+    message = {
+        'task_id': 'storm',
+        'pid': 1,
+        'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+        'event': 1,
+    }
+    # Wait for the subscription to reach the listener
+    while store.tasks == 0:
+        socket.send_json(message)
+        time.sleep(0.01)
+
+    received = store.tasks
+    start = time.perf_counter()
+    for i in range(events):
+        message['task_id'] = f'storm-{i}'
+        socket.send_json(message)
+    deadline = start + timeout
+    while store.tasks - received < events and time.perf_counter() < deadline:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    monitor.kill_event.set()
+    listener.join()
+    socket.close()
+    context.term()
+    return (store.tasks - received) / elapsed
+
+
+def make_stores(
+    path: pathlib.Path,
+    aggregator_address: str,
+    elasticsearch_url: str,
+) -> dict[str, Callable[[], BaseStore]]:
+    """Create a factory of every store writing under path."""
+    return {
+        'file': lambda: FileStore(path / 'file'),
+        'parquet': lambda: ParquetStore(path / 'parquet'),
+        'ipc': lambda: ParquetStore(path / 'ipc', format='ipc'),
+        'sqlite': lambda: SqliteStore(path / 'magnify.db'),
+        'memory': lambda: MemoryStore(),
+        'shm': lambda: SharedMemoryStore(directory=path / 'shm'),
+        'recording': lambda: RecordingStore(path / 'magnify.rec'),
+        'forwarding': lambda: ForwardingStore(aggregator_address),
+        'elasticsearch': lambda: ElasticsearchStore(elasticsearch_url),
+        'async-file': lambda: AsyncStore(FileStore(path / 'async')),
+    }
+
+
+def make_filters(columns: int) -> dict[str, Callable[[], BaseFilter]]:
+    """Create a factory of every filter for the synthetic streams."""
+    # Filters with their default keys, so the synthetic tables are keyed
+    # by pid and the psutil table by its pid and create time
+    counters = [f'c{i}' for i in range(columns)]
+    gauges = ['psutil_process_cpu_percent', 'psutil_process_memory_resident']
+    return {
+        'downsample': lambda: Downsample(10),
+        'aggregate': lambda: Aggregate(k=10),
+        'topk': lambda: TopK(100, by='c0', other=True),
+        'topk-psutil': lambda: TopK(
+            100,
+            by='psutil_process_cpu_percent',
+            other=True,
+        ),
+        'deadband': lambda: Deadband(
+            relative=dict.fromkeys([*counters, *gauges], 0.01),
+        ),
+        'counter-rate': lambda: CounterRate(),
+        'swinging-door': lambda: SwingingDoor(1.0),
+    }
+
+
+def versions() -> dict[str, str]:
+    """Return the versions of the code under test."""
+    found = {'python': platform.python_version()}
+    for package in ('magnify', 'polars', 'numpy', 'pyzmq'):
+        try:
+            found[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            found[package] = 'unknown'
+    return found
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--columns', type=int, default=8)
+    parser.add_argument('--streams', type=int, default=2)
+    parser.add_argument('--tasks', type=int, default=100_000)
+    parser.add_argument(
+        '--only',
+        action='append',
+        help='Only run the store or filter with this name. May be repeated.',
+    )
+    parser.add_argument('--output', help='Save the results as JSON.')
+    parser.add_argument('--json', action='store_true', help='Print JSON.')
+    options = parser.parse_args()
+
+    def sensors() -> list[BaseSensor]:
+        return [
+            *(
+                SyntheticSensor(f'table{i}', options.rows, options.columns, i)
+                for i in range(options.streams)
+            ),
+            PsutilShapedSensor(options.rows),
+            FloatSensor('rapl'),
+        ]
+
+    results = {
+        'options': vars(options),
+        'versions': versions(),
+        'stores': {},
+        'filters': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = pathlib.Path(tmp_dir)
+        aggregator_address = f'ipc://{path}/aggregator'
+        aggregator = Aggregator([NullStore()], aggregator_address)
+        aggregator.start()
+        aggregator.ready.wait()
+        elasticsearch = http.server.ThreadingHTTPServer(
+            ('127.0.0.1', 0),
+            _BulkStub,
+        )
+        threading.Thread(
+            target=elasticsearch.serve_forever,
+            daemon=True,
+        ).start()
+        elasticsearch_url = f'http://127.0.0.1:{elasticsearch.server_port}'
+
+        cases = [
+            ('stores', name, factory)
+            for name, factory in make_stores(
+                path,
+                aggregator_address,
+                elasticsearch_url,
+            ).items()
+        ] + [
+            ('filters', name, lambda f=factory: NullStore(filters=(f(),)))
+            for name, factory in make_filters(options.columns).items()
+        ]
+        try:
+            for kind, name, factory in cases:
+                if options.only is not None and name not in options.only:
+                    continue
+                monitor = MagnifyMonitor(sensors(), [])
+                results[kind][name] = run_case(
+                    monitor,
+                    factory(),
+                    options.ticks,
+                )
+        finally:
+            aggregator.shutdown()
+            elasticsearch.shutdown()
+            elasticsearch.server_close()
+
+        if options.tasks > 0:
+            results['task_events_per_second'] = task_storm(
+                options.tasks,
+                f'ipc://{path}/monitor',
+            )
+    results['peak_rss'] = peak_rss()
+
+    if options.output is not None:
+        with open(options.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for kind in ('stores', 'filters'):
+        for name, result in results[kind].items():
+            latency = result['latency_us']
+            print(
+                f'{name:>14}: {result["ticks_per_second"]:8.1f} ticks/s, '
+                f'take p50 {latency["take"]["p50"]:7.0f}us, '
+                f'filter p50 {latency["filter"]["p50"]:7.0f}us, '
+                f'put p50 {latency["put"]["p50"]:7.0f}us '
+                f'p99 {latency["put"]["p99"]:7.0f}us',
+            )
+    if 'task_events_per_second' in results:
+        print(f'task events: {results["task_events_per_second"]:.0f}/s')
+    print(f'peak RSS: {results["peak_rss"] / 2**20:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Measure the per-tick cost of writing process tables to `SqliteStore`.
+
+Writes synthetic psutil-like tables of many processes, one tick per
+simulated second, and reports the wall and CPU time of each tick to check
+that a single core sustains the monitoring rate.
+
+Example:
+    ```bash
+    python benchmarks/sqlite_store.py --ticks 60 --processes 5000
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import pathlib
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import polars
+
+from magnify.store.sqlite import SqliteStore
+from magnify.types import TimedMeasurement
+
+
+def synthetic_tick(
+    rng: np.random.Generator,
+    time_: datetime.datetime,
+    processes: int,
+) -> dict[str, TimedMeasurement]:
+    """Generate the measurements of one tick."""
+    return {
+        'psutil': TimedMeasurement(
+            time_,
+            polars.DataFrame(
+                {
+                    'psutil_process_pid': np.arange(processes),
+                    'psutil_process_time_user': rng.exponential(10, processes),
+                    'psutil_process_memory_resident': rng.integers(
+                        2**20,
+                        2**30,
+                        processes,
+                    ),
+                    'psutil_process_num_threads': rng.integers(
+                        1,
+                        64,
+                        processes,
+                    ),
+                },
+            ),
+        ),
+        'rapl': TimedMeasurement(time_, float(rng.normal(100, 5))),
+    }
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ticks', type=int, default=60)
+    parser.add_argument('--processes', type=int, default=5000)
+    parser.add_argument('--json', action='store_true', help='Print JSON.')
+    options = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    start = datetime.datetime.now(datetime.UTC)
+    ticks = [
+        synthetic_tick(
+            rng,
+            start + datetime.timedelta(seconds=i),
+            options.processes,
+        )
+        for i in range(options.ticks)
+    ]
+
+    wall, cpu = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = pathlib.Path(tmp_dir) / 'magnify.db'
+        store = SqliteStore(db_path)
+        for measurements in ticks:
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            store.put_measurement(measurements)
+            wall.append(time.perf_counter() - wall_start)
+            cpu.append(time.process_time() - cpu_start)
+        store.close()
+        size = sum(p.stat().st_size for p in db_path.parent.iterdir())
+
+    results = {
+        'options': vars(options),
+        'wall_ms_median': statistics.median(wall) * 1e3,
+        'wall_ms_max': max(wall) * 1e3,
+        'cpu_ms_median': statistics.median(cpu) * 1e3,
+        'rows_per_second': options.processes / statistics.median(wall),
+        'bytes': size,
+    }
+    if options.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f'{results["wall_ms_median"]:.1f}ms median '
+        f'({results["wall_ms_max"]:.1f}ms max) per tick, '
+        f'{results["cpu_ms_median"]:.1f}ms CPU, '
+        f'{results["rows_per_second"]:.0f} rows/s, '
+        f'{size / 2**20:.1f} MiB',
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+"""Attribute the resource usage of a finished run to its tasks.
+
+The files written by a [`FileStore`][magnify.store.file.FileStore] or a
+[`ParquetStore`][magnify.store.parquet.ParquetStore] are scanned lazily and
+joined with the task intervals so runs larger than memory can be analyzed
+with the streaming engine of polars.
+
+Example:
+    ```bash
+    magnify analyze cache/ -o usage.parquet
+    ```
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pathlib
+import re
+import sys
+from collections.abc import Callable
+from collections.abc import Sequence
+
+import polars
+
+from magnify.client import TaskEvent
+from magnify.store.file import partitions
+
+_KEYS = ('task_id', 'pid', 'start_time')
+_SINKS: dict[str, Callable[..., None]] = {
+    '.csv': polars.LazyFrame.sink_csv,
+    '.parquet': polars.LazyFrame.sink_parquet,
+    '.arrow': polars.LazyFrame.sink_ipc,
+    '.ndjson': polars.LazyFrame.sink_ndjson,
+    '.jsonl': polars.LazyFrame.sink_ndjson,
+}
+
+
+def _csv_files(directory: pathlib.Path, stream: str) -> list[pathlib.Path]:
+    pattern = re.compile(rf'{re.escape(stream)}(?:\.(\d+))?\.csv(?:\.gz)?')
+    found = []
+    # Files of the root directory come before those of the partitions
+    for order, path in enumerate([directory, *partitions(directory)]):
+        for file in path.iterdir():
+            match = pattern.fullmatch(file.name)
+            if match is not None:
+                found.append((order, int(match.group(1) or 0), file))
+    return [file for *_, file in sorted(found)]
+
+
+def scan_stream(
+    directory: str | os.PathLike[str],
+    stream: str,
+) -> None | polars.LazyFrame:
+    """Lazily scan the files of a stream of a store directory.
+
+    Args:
+        directory: Directory of a file or parquet store.
+        stream: Name of the stream.
+
+    Returns:
+        The rows of the stream in the order they were written, or None if
+        the stream has no files.
+    """
+    directory = pathlib.Path(directory)
+    stream_dir = directory / stream
+    if stream_dir.is_dir():
+        parquet = sorted(stream_dir.glob('part-*.parquet'))
+        if parquet:
+            return polars.scan_parquet(parquet)
+        ipc = sorted(stream_dir.glob('part-*.arrow'))
+        if ipc:
+            return polars.scan_ipc(ipc)
+
+    files = _csv_files(directory, stream)
+    if not files:
+        return None
+    return polars.scan_csv(files, try_parse_dates=True)
+
+
+def _parse_time(column: str) -> polars.Expr:
+    return (
+        polars.col(column)
+        .cast(polars.String)
+        .str.to_datetime(time_unit='us', time_zone='UTC')
+    )
+
+
+def scan_tasks(directory: str | os.PathLike[str]) -> polars.DataFrame:
+    """Read the intervals of the tasks of a store directory.
+
+    File stores write one row per interval, parquet stores write the raw
+    task events which are paired here.
+
+    Returns:
+        The `task_id`, `pid`, `start_time`, `end_time` and `status` of
+        every task that ended, sorted by start time, and the `host` of the
+        task if the store recorded it.
+
+    Raises:
+        FileNotFoundError: If the directory has no task files.
+    """
+    tasks = scan_stream(directory, 'tasks')
+    if tasks is None:
+        raise FileNotFoundError(f'No tasks found in {directory}.')
+
+    schema = tasks.collect_schema()
+    hosts = ['host'] if 'host' in schema else []
+    if 'event' in schema:
+        ends = polars.col('event') != TaskEvent.START
+        tasks = tasks.group_by('task_id', 'process_id', *hosts).agg(
+            polars.col('timestamp')
+            .filter(polars.col('event') == TaskEvent.START)
+            .min()
+            .alias('start_time'),
+            polars.col('timestamp').filter(ends).max().alias('end_time'),
+            polars.col('event')
+            .filter(ends)
+            .last()
+            .replace_strict(
+                {int(e): e.name for e in TaskEvent},
+                default=None,
+                return_dtype=polars.String,
+            )
+            .alias('status'),
+        )
+
+    return (
+        tasks.select(
+            polars.col('task_id').cast(polars.String),
+            polars.col('process_id').cast(polars.Int64).alias('pid'),
+            _parse_time('start_time'),
+            _parse_time('end_time'),
+            polars.col('status').cast(polars.String),
+            *(polars.col(c).cast(polars.String) for c in hosts),
+        )
+        .drop_nulls(['start_time', 'end_time'])
+        .sort('start_time')
+        .collect()
+    )
+
+
+def _psutil_usage(schema: polars.Schema) -> list[polars.Expr]:
+    exprs = []
+    if {'psutil_process_time_user', 'psutil_process_time_system'} <= set(
+        schema,
+    ):
+        cpu = polars.col('psutil_process_time_user') + polars.col(
+            'psutil_process_time_system',
+        )
+        exprs.append((cpu.max() - cpu.min()).alias('cpu_time'))
+    if 'psutil_process_memory_resident' in schema:
+        exprs.append(
+            polars.col('psutil_process_memory_resident')
+            .max()
+            .alias('peak_rss'),
+        )
+    for column, name in (
+        ('psutil_process_disk_read', 'read_bytes'),
+        ('psutil_process_disk_write', 'write_bytes'),
+    ):
+        if column in schema:
+            counter = polars.col(column)
+            exprs.append((counter.max() - counter.min()).alias(name))
+    return exprs
+
+
+def _perf_usage(schema: polars.Schema) -> list[polars.Expr]:
+    # Counters are reset after every read, so they add up
+    return [
+        polars.col(c).sum()
+        for c, dtype in schema.items()
+        if dtype.is_numeric() and c not in ('pid', 'ppid', 'cpu', 'socket')
+    ]
+
+
+def _energy_usage(schema: polars.Schema) -> list[polars.Expr]:
+    if 'power' not in schema:
+        return []
+    duration = (
+        polars.col('end_time') - polars.col('start_time')
+    ).first().dt.total_microseconds() / 1e6
+    return [(polars.col('power').mean() * duration).alias('energy')]
+
+
+# Stream, pid column and the aggregations of the rows of a task
+_USAGE: tuple[
+    tuple[str, str, Callable[[polars.Schema], list[polars.Expr]]],
+    ...,
+] = (
+    ('psutil', 'psutil_process_pid', _psutil_usage),
+    ('perf', 'pid', _perf_usage),
+    ('energy', 'pid', _energy_usage),
+)
+
+
+def task_usage(
+    directory: str | os.PathLike[str],
+    streams: None | Sequence[str] = None,
+) -> polars.LazyFrame:
+    """Compute the resource usage of each task from a store directory.
+
+    Rows of a stream are matched to the task that started last on their
+    process before them, if the task had not ended yet, with an as-of join
+    so the rows are only read once. Processes are assumed to run one task
+    at a time and rows to be stored in time order. Rows and tasks are
+    also matched by `host` when both have it, e.g., when written by an
+    aggregator, as the pids of different nodes may collide.
+
+    Usage is computed per task and process:
+
+    - `cpu_time`: user and system seconds, from `psutil`.
+    - `peak_rss`: maximum resident memory in bytes, from `psutil`.
+    - `read_bytes` and `write_bytes`: bytes read and written, from
+      `psutil`.
+    - the sum of each hardware counter, from `perf`.
+    - `energy`: joules, the mean power from `energy` times the duration.
+
+    Args:
+        directory: Directory of a file or parquet store.
+        streams: Streams to compute usage from. All known streams found in
+            the directory if None.
+
+    Returns:
+        A lazy frame with one row per task and process.
+    """
+    tasks = scan_tasks(directory)
+    result = tasks.lazy().with_columns(
+        (
+            (
+                polars.col('end_time') - polars.col('start_time')
+            ).dt.total_microseconds()
+            / 1e6
+        ).alias('duration'),
+    )
+    for stream, pid_column, usage in _USAGE:
+        if streams is not None and stream not in streams:
+            continue
+        samples = scan_stream(directory, stream)
+        if samples is None:
+            continue
+        schema = samples.collect_schema()
+        exprs = usage(schema)
+        if pid_column not in schema or not exprs:
+            continue
+
+        # Pids of different nodes may collide
+        hosts = (
+            ['host'] if 'host' in schema and 'host' in tasks.columns else []
+        )
+        attributed = (
+            samples.select(
+                polars.col('time'),
+                polars.col(pid_column).cast(polars.Int64).alias('pid'),
+                *(polars.col(c).cast(polars.String) for c in hosts),
+                *(c for c in schema if c not in ('time', pid_column, *hosts)),
+            )
+            .join_asof(
+                tasks.lazy(),
+                left_on='time',
+                right_on='start_time',
+                by=[*hosts, 'pid'],
+                coalesce=False,
+                check_sortedness=False,
+            )
+            .filter(polars.col('time') < polars.col('end_time'))
+            .group_by(*hosts, *_KEYS)
+            .agg(exprs)
+        )
+        result = result.join(attributed, on=[*hosts, *_KEYS], how='left')
+    return result
+
+
+def main(argv: None | Sequence[str] = None) -> int:
+    """Write the resource usage of each task of a run."""
+    parser = argparse.ArgumentParser(
+        description='Compute the resource usage of each task of a run.',
+        prog='magnify analyze',
+    )
+    parser.add_argument(
+        'directory',
+        help='Directory of the file or parquet store of the run.',
+    )
+    parser.add_argument(
+        '--output',
+        '-o',
+        help=(
+            'File to write, as csv, parquet, arrow or ndjson by extension. '
+            'Default is csv to stdout.'
+        ),
+    )
+    parser.add_argument(
+        '--stream',
+        action='append',
+        dest='streams',
+        help='Stream to compute usage from. May be repeated.',
+    )
+    options = parser.parse_args(argv)
+
+    try:
+        usage = task_usage(options.directory, options.streams)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+
+    if options.output is None:
+        usage.collect(engine='streaming').write_csv(sys.stdout)
+        return 0
+
+    output = pathlib.Path(options.output)
+    sink = _SINKS.get(output.suffix)
+    if sink is None:
+        parser.error(f'Unknown output format "{output.suffix}".')
+    sink(usage, output, engine='streaming')
+    return 0
@@ -3,8 +3,10 @@
 from __future__ import annotations
 
 import importlib
+import json
 import pathlib
 from typing import Any
+from typing import Literal
 from typing import Self
 
 from pydantic import AnyUrl
@@ -14,8 +16,11 @@ from pydantic import Field
 
 from magnify import MagnifyMonitor
 from magnify.filters.base import BaseFilter
+from magnify.filters.chain import FilterChain
 from magnify.sensor.base import BaseSensor
 from magnify.store.base import BaseStore
+from magnify.store.proxy import Aggregator
+from magnify.store.writer import AsyncStore
 from magnify.utils import dump
 from magnify.utils import load
 
@@ -49,6 +54,7 @@ def import_from_path(path: str) -> type[Any]:
 
 _KNOWN_SENSORS = {
     'magnify.sensor.energy.PerfEnergySensor',
+    'magnify.sensor.energy.PerSocketEnergySensor',
     'magnify.sensor.perf.PerfSensor',
     'magnify.sensor.rapl.RaplSysfsSensor',
     'magnify.sensor.psutil.PsutilSensor',
@@ -87,7 +93,14 @@ class SensorConfig(BaseModel):
         return sensor_type(**self.options)
 
 
-_KNOWN_FILTERS = {'magnify.filters.basic.Downsample'}
+_KNOWN_FILTERS = {
+    'magnify.filters.basic.Aggregate',
+    'magnify.filters.basic.Downsample',
+    'magnify.filters.basic.TopK',
+    'magnify.filters.compression.SwingingDoor',
+    'magnify.filters.delta.CounterRate',
+    'magnify.filters.delta.Deadband',
+}
 
 
 class FilterConfig(BaseModel):
@@ -122,7 +135,27 @@ class FilterConfig(BaseModel):
         return filter_type(to=self.to, **self.options)
 
 
-_KNOWN_STORES = {'magnify.store.file.FileStore'}
+_KNOWN_STORES = {
+    'magnify.store.elasticsearch.ElasticsearchStore',
+    'magnify.store.file.FileStore',
+    'magnify.store.memory.MemoryStore',
+    'magnify.store.parquet.ParquetStore',
+    'magnify.store.proxy.ForwardingStore',
+    'magnify.store.recording.RecordingStore',
+    'magnify.store.shm.SharedMemoryStore',
+    'magnify.store.sqlite.SqliteStore',
+}
+
+
+class WriterConfig(BaseModel):
+    """Configuration of the writer thread and queue of a store."""
+
+    model_config = ConfigDict(extra='forbid')
+
+    max_size: int = Field(default=1024)
+    policy: Literal['block', 'drop_oldest', 'drop_newest'] = Field(
+        default='block',
+    )
 
 
 class StoreConfig(BaseModel):
@@ -134,6 +167,7 @@ class StoreConfig(BaseModel):
     includes: None | list[str] = Field(default=None)
     options: dict[str, Any] = Field(default_factory=dict)
     filters: list[FilterConfig] = Field(default_factory=list)
+    writer: None | WriterConfig = Field(default=None)
 
     def get_store_type(self):
         """Get the store type from the configuration."""
@@ -148,19 +182,35 @@ class StoreConfig(BaseModel):
                     return import_from_path(path)
             raise ValueError(f'Unknown store type "{self.kind}".') from e
 
-    def get_store(self) -> BaseStore:
+    def chain_key(self) -> str:
+        """Return a key that is equal for stores with the same filtering."""
+        includes = None if self.includes is None else sorted(self.includes)
+        filters = [f.model_dump(mode='json') for f in self.filters]
+        return json.dumps([includes, filters], sort_keys=True)
+
+    def get_store(self, chain: None | FilterChain = None) -> BaseStore:
         """Get the store specified by the configuration.
 
+        Args:
+            chain: Filter chain to share with other stores. A new chain is
+                created from the configuration if None.
+
         Returns:
             A [`Store`][leaf.store.BaseStore] \
-            instance.
+            instance. The store writes on its own thread if a writer is
+            configured.
         """
         store_type = self.get_store_type()
-        return store_type(
-            filters=self.filters,
+        store = store_type(
+            filters=[f.get_filter() for f in self.filters],
             includes=self.includes,
             **self.options,
         )
+        if chain is not None:
+            store.chain = chain
+        if self.writer is not None:
+            store = AsyncStore(store, **self.writer.model_dump())
+        return store
 
 
 class MonitorConfig(BaseModel):
@@ -171,6 +221,7 @@ class MonitorConfig(BaseModel):
     stores: list[StoreConfig]
     monitor_address: AnyUrl = Field(default='ipc:///tmp/magnify_monitor')
     monitor_interval: int = Field(default=1)
+    instrument: bool = Field(default=False)
 
     @classmethod
     def from_toml(cls, filepath: str | pathlib.Path) -> Self:
@@ -204,12 +255,55 @@ class MonitorConfig(BaseModel):
             sensor_config.get_sensor() for sensor_config in sensors_config
         ]
 
-        stores_config = self.stores
-        stores = [store_config.get_store() for store_config in stores_config]
+        # Stores with the same includes and filters share a chain so the
+        # filters only run once per tick
+        chains: dict[str, FilterChain] = {}
+        stores = []
+        for store_config in self.stores:
+            chain = chains.get(store_config.chain_key())
+            store = store_config.get_store(chain)
+            if chain is None:
+                chains[store_config.chain_key()] = store.chain
+            else:
+                chain.memoize = True
+            stores.append(store)
 
         return MagnifyMonitor(
             sensors,
             stores,
             self.monitor_address,
             self.monitor_interval,
+            self.instrument,
+        )
+
+
+class AggregatorConfig(BaseModel):
+    """Configuration of an aggregator merging the streams of many nodes."""
+
+    model_config = ConfigDict(extra='forbid')
+    stores: list[StoreConfig]
+    address: AnyUrl = Field(default=AnyUrl('tcp://*:5560'))
+    credits: int = Field(default=16)
+    correct_clocks: bool = Field(default=True)
+    idle_timeout: float = Field(default=600.0)
+
+    @classmethod
+    def from_toml(cls, filepath: str | pathlib.Path) -> Self:
+        """Create a configuration from a TOML file.
+
+        Args:
+            filepath: Path to TOML file to load.
+        """
+        with open(filepath, 'rb') as f:
+            return load(cls, f)
+
+    def get_aggregator(self) -> Aggregator:
+        """Get an instance of the Aggregator."""
+        stores = [store_config.get_store() for store_config in self.stores]
+        return Aggregator(
+            stores,
+            self.address,
+            self.credits,
+            self.correct_clocks,
+            idle_timeout=self.idle_timeout,
         )
@@ -2,9 +2,51 @@ from __future__ import annotations
 
 from abc import ABC
 from abc import abstractmethod
+from collections.abc import Iterable
 
 from magnify.types import TimedMeasurement
 
+# Columns identifying a process, in order of preference: the psutil stream
+# and streams with a plain pid column, e.g., perf
+PROCESS_KEYS = (
+    ('psutil_process_pid', 'psutil_process_create_time'),
+    ('pid',),
+)
+# Columns describing a process rather than measuring it
+IDENTIFIER_COLUMNS = frozenset(
+    {
+        'pid',
+        'ppid',
+        'psutil_process_pid',
+        'psutil_process_ppid',
+        'psutil_process_create_time',
+    },
+)
+
+
+def process_key(
+    columns: Iterable[str],
+    key: None | str | Iterable[str] = None,
+) -> None | list[str]:
+    """Return the columns identifying a process in a DataFrame.
+
+    Args:
+        columns: Columns of the DataFrame.
+        key: Column(s) configured as the key. The first of `PROCESS_KEYS`
+            found in the columns is used if None.
+
+    Returns:
+        The key, or None if the columns do not include it.
+    """
+    columns = set(columns)
+    if key is not None:
+        key = [key] if isinstance(key, str) else list(key)
+        return key if columns.issuperset(key) else None
+    for candidate in PROCESS_KEYS:
+        if columns.issuperset(candidate):
+            return list(candidate)
+    return None
+
 
 class BaseFilter(ABC):
     """Base class to apply a filter to a measurement before storing it."""
@@ -20,6 +62,14 @@ class BaseFilter(ABC):
     ) -> dict[str, TimedMeasurement]:
         pass
 
+    def flush(self) -> dict[str, TimedMeasurement]:
+        """Return the measurements held back by the filter, e.g., a window.
+
+        Called when the stores of the filter are closed, so stateful filters
+        do not lose what they buffered.
+        """
+        return {}
+
     def apply(
         self,
         measurements: dict[str, TimedMeasurement],
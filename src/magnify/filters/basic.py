@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import polars
+
 from magnify.filters.base import BaseFilter
+from magnify.filters.base import IDENTIFIER_COLUMNS
+from magnify.filters.base import process_key
 from magnify.types import TimedMeasurement
 
 
@@ -25,3 +29,246 @@ class Downsample(BaseFilter):
                 return {}
         finally:
             self.current = (self.current + 1) % self.k
+
+
+_NUMERIC_AGGREGATES = ('mean', 'min', 'max', 'sum', 'std', 'median')
+
+
+class Aggregate(BaseFilter):
+    """Filter to aggregate measurements over a window of ticks or time.
+
+    Unlike `Downsample`, every sample in a window contributes to the value
+    that is stored, so spikes between stored values are not lost.
+    DataFrame streams are grouped by process (e.g., pid) and each numeric
+    column is replaced by one column per aggregate, named
+    `{column}_{aggregate}`. Non-numeric columns, and columns identifying a
+    process such as the parent pid, keep their last value. Float streams
+    become a one row DataFrame with one column per aggregate. The partial
+    windows are aggregated when the filter is flushed.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        k: None | int = None,
+        window: None | float = None,
+        aggregates: tuple[str, ...] = ('mean', 'min', 'max'),
+        percentiles: tuple[float, ...] = (),
+        by: None | str | list[str] = None,
+        to: None | set[str] = None,
+    ):
+        """Initialize a filter aggregating windows of measurements.
+
+        Args:
+            k: Number of ticks in a window.
+            window: Length of a window in seconds. Exactly one of k and
+                window must be provided.
+            aggregates: Aggregates to compute for each numeric column. Any
+                of mean, min, max, sum, std and median.
+            percentiles: Percentiles to compute for each numeric column, as
+                quantiles between 0 and 1. Named {column}_p{percentile}.
+            by: Column(s) to group DataFrame streams by. If None, the
+                process key is found from the columns, the pid and create
+                time of the psutil stream or a `pid` column, and DataFrames
+                without one are aggregated as one group.
+            to: Streams to apply the filter to.
+        """
+        super().__init__(to)
+
+        if (k is None) == (window is None):
+            raise ValueError('Exactly one of k or window must be set.')
+        unknown = set(aggregates) - set(_NUMERIC_AGGREGATES)
+        if unknown:
+            raise ValueError(f'Unknown aggregates {sorted(unknown)}.')
+
+        self.k = k
+        self.window = window
+        self.aggregates = tuple(aggregates)
+        self.percentiles = tuple(percentiles)
+        self.by = by
+        self.buffers: dict[str, list[TimedMeasurement]] = {}
+
+    def _window_full(self, buffer: list[TimedMeasurement]) -> bool:
+        if self.window is not None:
+            elapsed = buffer[-1].time - buffer[0].time
+            return elapsed.total_seconds() >= self.window
+        return self.k is not None and len(buffer) >= self.k
+
+    def _aggregate_exprs(self, column: str) -> list[polars.Expr]:
+        col = polars.col(column)
+        exprs = [
+            getattr(col, agg)().alias(f'{column}_{agg}')
+            for agg in self.aggregates
+        ]
+        exprs.extend(
+            col.quantile(q).alias(f'{column}_p{q * 100:g}')
+            for q in self.percentiles
+        )
+        return exprs
+
+    def _aggregate_frames(
+        self,
+        stream: str,
+        frames: list[polars.DataFrame],
+    ) -> polars.DataFrame:
+        df = polars.concat(frames, how='diagonal_relaxed')
+        group = process_key(df.columns, self.by)
+        if group is None:
+            if self.by is not None:
+                raise ValueError(
+                    f'Stream "{stream}" has no column(s) {self.by} to group '
+                    'by. Restrict the filter with "to".',
+                )
+            group = []
+
+        exprs = []
+        for column, dtype in df.schema.items():
+            if column in group:
+                continue
+            if dtype.is_numeric() and column not in IDENTIFIER_COLUMNS:
+                exprs.extend(self._aggregate_exprs(column))
+            else:
+                exprs.append(polars.col(column).last())
+
+        if len(group) == 0:
+            return df.select(exprs)
+        return df.group_by(group, maintain_order=True).agg(exprs)
+
+    def _aggregate_values(self, values: list[float]) -> polars.DataFrame:
+        df = polars.DataFrame({'value': values}, schema={'value': float})
+        return df.select(
+            expr.name.map(lambda name: name.removeprefix('value_'))
+            for expr in self._aggregate_exprs('value')
+        )
+
+    def _aggregate(
+        self,
+        stream: str,
+        buffer: list[TimedMeasurement],
+    ) -> TimedMeasurement:
+        # The ticks of a stream are either all DataFrames or all floats
+        frames = [
+            m.measurement
+            for m in buffer
+            if isinstance(m.measurement, polars.DataFrame)
+        ]
+        if frames:
+            aggregated = self._aggregate_frames(stream, frames)
+        else:
+            aggregated = self._aggregate_values(
+                [
+                    m.measurement
+                    for m in buffer
+                    if not isinstance(m.measurement, polars.DataFrame)
+                ],
+            )
+        return TimedMeasurement(buffer[-1].time, aggregated)
+
+    def flush(self) -> dict[str, TimedMeasurement]:
+        """Aggregate the partial window of each stream."""
+        flushed = {
+            stream: self._aggregate(stream, buffer)
+            for stream, buffer in self.buffers.items()
+            if buffer
+        }
+        self.buffers = {}
+        return flushed
+
+    def _apply(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        filtered = {}
+        for stream, timed_measurement in measurements.items():
+            buffer = self.buffers.setdefault(stream, [])
+            buffer.append(timed_measurement)
+            if not self._window_full(buffer):
+                continue
+
+            self.buffers[stream] = []
+            filtered[stream] = self._aggregate(stream, buffer)
+
+        return filtered
+
+
+class TopK(BaseFilter):
+    """Filter to only keep the k heaviest rows of each DataFrame stream.
+
+    Rows are selected with a partial `top_k` rather than a full sort. The
+    remaining rows can optionally be folded into a single "other" row with
+    the sum of each numeric column, so totals are preserved. In the other
+    row the key columns and columns identifying a process, such as the
+    parent pid, are null and string columns are "other". Float streams are
+    passed through unchanged.
+    """
+
+    def __init__(
+        self,
+        k: int,
+        by: str,
+        other: bool = False,
+        key: None | str | list[str] = None,
+        to: None | set[str] = None,
+    ):
+        """Initialize a top k filter.
+
+        Args:
+            k: Number of rows to keep.
+            by: Column to rank the rows by, largest first.
+            other: Append a row with the sum of the rows that were dropped.
+            key: Column(s) identifying a process, which are not summed.
+                Found from the columns of each stream if None, like the
+                pid and create time of the psutil stream.
+            to: Streams to apply the filter to.
+        """
+        super().__init__(to)
+
+        self.k = k
+        self.by = by
+        self.other = other
+        self.key = key
+
+    def _other_row(self, rest: polars.DataFrame) -> polars.DataFrame:
+        key = process_key(rest.columns, self.key) or []
+        exprs = []
+        for column, dtype in rest.schema.items():
+            if column in key or column in IDENTIFIER_COLUMNS:
+                exprs.append(polars.lit(None, dtype=dtype).alias(column))
+            elif dtype.is_numeric():
+                exprs.append(polars.col(column).sum())
+            elif dtype == polars.String:
+                exprs.append(polars.lit('other').alias(column))
+            else:
+                exprs.append(polars.lit(None, dtype=dtype).alias(column))
+        return rest.select(exprs)
+
+    def _top_k(self, df: polars.DataFrame) -> polars.DataFrame:
+        if len(df) <= self.k:
+            return df
+        if not self.other:
+            return df.top_k(self.k, by=self.by)
+
+        indexed = df.with_row_index('_row')
+        top = indexed.top_k(self.k, by=self.by)
+        rest = indexed.filter(
+            ~polars.col('_row').is_in(top['_row'].implode()),
+        )
+        return polars.concat(
+            [top.drop('_row'), self._other_row(rest.drop('_row'))],
+            how='vertical_relaxed',
+        )
+
+    def _apply(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        filtered = {}
+        for stream, timed_measurement in measurements.items():
+            df = timed_measurement.measurement
+            if isinstance(df, polars.DataFrame) and self.by in df.columns:
+                filtered[stream] = TimedMeasurement(
+                    timed_measurement.time,
+                    self._top_k(df),
+                )
+            else:
+                filtered[stream] = timed_measurement
+        return filtered
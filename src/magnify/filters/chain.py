@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterable
+from collections.abc import Sequence
+
+from magnify.filters.base import BaseFilter
+from magnify.types import TimedMeasurement
+
+
+class FilterChain:
+    """The includes and filters of a store, compiled once into a plan.
+
+    Each filter is paired with the streams it applies to so every tick
+    only routes those streams to it, instead of rebuilding the whole
+    measurement dict before and after each filter. The measurements passed
+    in are never modified; at most one copy is made per tick, and only once
+    a filter restricted to some streams changes them.
+
+    A chain can be shared by stores with identical includes and filters.
+    With `memoize` set, calling the chain again with the same measurement
+    dict returns the previous result, so the filters run once per tick no
+    matter how many stores share them.
+    """
+
+    def __init__(
+        self,
+        filters: Sequence[BaseFilter] = (),
+        includes: None | Iterable[str] = None,
+        memoize: bool = False,
+    ):
+        """Compile the plan of a chain of filters.
+
+        Args:
+            filters: Filters to apply in order.
+            includes: Streams to keep before filtering. All streams are
+                kept if None.
+            memoize: Reuse the result when called with the measurement dict
+                of the previous call.
+        """
+        self.filters = list(filters)
+        self.includes = None if includes is None else tuple(set(includes))
+        self.memoize = memoize
+
+        # Filters that do not derive from BaseFilter are applied through
+        # their public apply method
+        self._plan: list[tuple[BaseFilter, None | tuple[str, ...], bool]] = []
+        for f in self.filters:
+            if isinstance(f, BaseFilter):
+                to = None if f.to is None else tuple(set(f.to))
+                self._plan.append((f, to, True))
+            else:
+                self._plan.append((f, None, False))
+
+        # Nanoseconds taken by each filter in the last run, if set to a list
+        self.timings: None | list[None | int] = None
+
+        self._lock = threading.Lock()
+        self._last_input: None | dict[str, TimedMeasurement] = None
+        self._last_output: None | dict[str, TimedMeasurement] = None
+        self._flushed: None | dict[str, TimedMeasurement] = None
+
+    @staticmethod
+    def _step(
+        f: BaseFilter,
+        to: None | tuple[str, ...],
+        compiled: bool,
+        measurements: dict[str, TimedMeasurement],
+        owned: bool,
+    ) -> tuple[dict[str, TimedMeasurement], bool]:
+        if not compiled:
+            filtered = f.apply(measurements)
+        elif to is None:
+            filtered = f._apply(measurements)
+        else:
+            routed = {k: measurements[k] for k in to if k in measurements}
+            changed = f._apply(routed)
+            if not owned:
+                measurements = dict(measurements)
+            for k in routed.keys() - changed.keys():
+                del measurements[k]
+            measurements.update(changed)
+            return measurements, True
+
+        return filtered, owned or filtered is not measurements
+
+    def _run(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        # Whether the chain created the current dict and may modify it
+        owned = False
+        if self.includes is not None:
+            measurements = {
+                k: measurements[k] for k in self.includes if k in measurements
+            }
+            owned = True
+
+        timings = self.timings
+        for i, (f, to, compiled) in enumerate(self._plan):
+            start = 0 if timings is None else time.perf_counter_ns()
+            measurements, owned = self._step(
+                f,
+                to,
+                compiled,
+                measurements,
+                owned,
+            )
+            if timings is not None:
+                timings[i] = time.perf_counter_ns() - start
+
+        return measurements
+
+    def __call__(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        """Apply the includes and filters to the measurements of a tick."""
+        if not self.memoize:
+            return self._run(measurements)
+
+        with self._lock:
+            if (
+                measurements is self._last_input
+                and self._last_output is not None
+            ):
+                return self._last_output
+            self._last_output = self._run(measurements)
+            self._last_input = measurements
+            return self._last_output
+
+    def flush(self) -> dict[str, TimedMeasurement]:
+        """Return the measurements held back by the filters.
+
+        What a filter flushes goes through the filters after it. With
+        `memoize` set, the filters are only flushed by the first call and
+        later calls return the same result, so every store sharing the chain
+        gets it.
+        """
+        with self._lock:
+            if self.memoize and self._flushed is not None:
+                return self._flushed
+
+            measurements: dict[str, TimedMeasurement] = {}
+            for f, to, compiled in self._plan:
+                if measurements:
+                    measurements, _ = self._step(
+                        f,
+                        to,
+                        compiled,
+                        measurements,
+                        True,
+                    )
+                flush = getattr(f, 'flush', None)
+                if flush is not None:
+                    measurements = {**measurements, **flush()}
+            self._flushed = measurements
+            return measurements
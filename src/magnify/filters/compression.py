@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import datetime
+from collections.abc import Sequence
+
+import polars
+
+from magnify.filters.base import BaseFilter
+from magnify.types import TimedMeasurement
+
+
+def _value(point: TimedMeasurement) -> float:
+    # Only float streams have a door
+    if isinstance(point.measurement, polars.DataFrame):
+        raise TypeError('Expected a float measurement.')
+    return point.measurement
+
+
+class _Door:
+    """State of the swinging door of one stream."""
+
+    def __init__(self, anchor: TimedMeasurement):
+        self.anchor = anchor
+        self.last = anchor
+        self.upper = float('inf')
+        self.lower = float('-inf')
+
+    def swing(self, point: TimedMeasurement, tolerance: float) -> bool:
+        """Narrow the door to fit the point.
+
+        Returns:
+            False, leaving the door unchanged, if the point does not fit.
+        """
+        elapsed = (point.time - self.anchor.time).total_seconds()
+        if elapsed <= 0:
+            return True
+        value = _value(point) - _value(self.anchor)
+        upper = min(self.upper, (value + tolerance) / elapsed)
+        lower = max(self.lower, (value - tolerance) / elapsed)
+        if lower > upper:
+            return False
+        self.upper, self.lower = upper, lower
+        return True
+
+    def vertex(self) -> TimedMeasurement:
+        """Return the end of a segment within tolerance of every point."""
+        slope = (self.upper + self.lower) / 2
+        elapsed = (self.last.time - self.anchor.time).total_seconds()
+        return TimedMeasurement(
+            self.last.time,
+            _value(self.anchor) + slope * elapsed,
+        )
+
+
+class SwingingDoor(BaseFilter):
+    """Error bounded piecewise linear compression of float streams.
+
+    Implements the swinging door algorithm: only the vertices of a
+    piecewise linear signal that stays within `tolerance` of every sample
+    are kept. When a sample no longer fits the current segment, a vertex is
+    emitted at the time of the previous sample, on the line through the
+    middle of the door so every sample of the segment is within tolerance.
+    The original signal can be rebuilt onto any time grid with
+    [`interpolate()`][magnify.filters.compression.interpolate].
+    DataFrame streams are passed through unchanged.
+
+    The open segment of each stream is ended at its last sample by
+    [`flush()`][magnify.filters.compression.SwingingDoor.flush], which
+    stores call when they are closed.
+    """
+
+    def __init__(
+        self,
+        tolerance: float,
+        max_interval: None | float = None,
+        to: None | set[str] = None,
+    ):
+        """Initialize a swinging door compression filter.
+
+        Args:
+            tolerance: Maximum absolute error of the reconstructed signal.
+            max_interval: Maximum number of seconds between vertices. Bounds
+                how stale the stored signal can be when it is not changing.
+                The segment is ended at the last sample within the
+                interval.
+            to: Streams to apply the filter to.
+        """
+        super().__init__(to)
+
+        self.tolerance = tolerance
+        self.max_interval = max_interval
+        self.doors: dict[str, _Door] = {}
+
+    def _compress(
+        self,
+        stream: str,
+        point: TimedMeasurement,
+    ) -> None | TimedMeasurement:
+        door = self.doors.get(stream)
+        if door is None:
+            self.doors[stream] = _Door(point)
+            return point
+
+        stale = (
+            self.max_interval is not None
+            and (point.time - door.anchor.time).total_seconds()
+            > self.max_interval
+        )
+        if stale and door.last is door.anchor:
+            # No sample since the last vertex, restart from this one
+            self.doors[stream] = _Door(point)
+            return point
+
+        if not stale and door.swing(point, self.tolerance):
+            door.last = point
+            return None
+
+        # Door closed, or open for too long, the segment ends at the
+        # previous sample and the next segment starts from it
+        vertex = door.vertex()
+        door = self.doors[stream] = _Door(vertex)
+        door.swing(point, self.tolerance)
+        door.last = point
+        return vertex
+
+    def flush(self) -> dict[str, TimedMeasurement]:
+        """End the open segment of each stream at its last sample."""
+        flushed = {}
+        for stream, door in self.doors.items():
+            if door.last is not door.anchor:
+                flushed[stream] = door.vertex()
+        self.doors = {}
+        return flushed
+
+    def _apply(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        filtered = {}
+        for stream, timed_measurement in measurements.items():
+            if isinstance(timed_measurement.measurement, polars.DataFrame):
+                filtered[stream] = timed_measurement
+                continue
+
+            vertex = self._compress(stream, timed_measurement)
+            if vertex is not None:
+                filtered[stream] = vertex
+
+        return filtered
+
+
+def interpolate(
+    vertices: polars.DataFrame,
+    grid: Sequence[datetime.datetime] | polars.Series,
+    time_column: str = 'time',
+    value_column: str = 'value',
+) -> polars.DataFrame:
+    """Rebuild a signal compressed by `SwingingDoor` onto a time grid.
+
+    Example:
+        ```python
+        >>> vertices = polars.read_csv('rapl.csv', try_parse_dates=True)
+        >>> grid = polars.datetime_range(start, end, '100ms', eager=True)
+        >>> interpolate(vertices, grid)
+        ```
+
+    Args:
+        vertices: Stored vertices, e.g., read from the csv of a file store.
+        grid: Times to compute the signal at.
+        time_column: Column of vertices with the time of each vertex.
+        value_column: Column of vertices with the value of each vertex.
+
+    Returns:
+        DataFrame with the time and value columns at each time of the grid.
+        Times outside of the range of the vertices have a null value.
+    """
+    vertices = vertices.select(
+        polars.col(time_column),
+        polars.col(time_column).alias('_t0'),
+        polars.col(time_column).alias('_t1'),
+        polars.col(value_column).cast(polars.Float64).alias('_v0'),
+        polars.col(value_column).cast(polars.Float64).alias('_v1'),
+    ).sort(time_column)
+    times = (
+        polars.DataFrame({time_column: grid})
+        .with_columns(
+            polars.col(time_column).cast(vertices[time_column].dtype),
+        )
+        .sort(time_column)
+    )
+
+    before = vertices.drop('_t1', '_v1')
+    after = vertices.drop('_t0', '_v0')
+    joined = times.join_asof(before, on=time_column, strategy='backward')
+    joined = joined.join_asof(after, on=time_column, strategy='forward')
+
+    elapsed = (
+        polars.col(time_column) - polars.col('_t0')
+    ).dt.total_microseconds()
+    span = (polars.col('_t1') - polars.col('_t0')).dt.total_microseconds()
+    value = (
+        polars.when(span == 0)
+        .then(polars.col('_v0'))
+        .otherwise(
+            polars.col('_v0')
+            + (polars.col('_v1') - polars.col('_v0')) * elapsed / span,
+        )
+    )
+    return joined.select(polars.col(time_column), value.alias(value_column))
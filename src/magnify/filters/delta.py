@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+
+from magnify.filters.base import BaseFilter
+from magnify.filters.base import process_key
+from magnify.types import TimedMeasurement
+
+
+class Deadband(BaseFilter):
+    """Filter to only keep rows that changed since they were last kept.
+
+    For DataFrame streams, each row is matched to the last kept row with
+    the same key (e.g., pid) by a join against the previous frame. By
+    default the key is found from the columns: the pid and create time of
+    the psutil stream, or a `pid` column. DataFrame streams without the key
+    are passed through unchanged. A row is
+    kept if it is new or any of its values moved by more than the
+    deadband of that column. Columns without a deadband are kept on any
+    change. Every `keyframe` ticks the full frame is kept so readers can
+    rebuild the state of every process from the latest keyframe.
+
+    Float streams are kept when the value moves by more than the deadband
+    configured for the column "value".
+    """
+
+    def __init__(
+        self,
+        key: None | str | list[str] = None,
+        absolute: None | dict[str, float] = None,
+        relative: None | dict[str, float] = None,
+        keyframe: None | int = 60,
+        to: None | set[str] = None,
+    ):
+        """Initialize a deadband filter.
+
+        Args:
+            key: Column(s) identifying the same process across ticks.
+                Found from the columns of each stream if None.
+            absolute: Absolute deadband of each column.
+            relative: Deadband of each column relative to the magnitude of
+                the last kept value. If both are set for a column, the
+                larger of the two is used.
+            keyframe: Keep every row once every keyframe ticks. Disabled
+                if None.
+            to: Streams to apply the filter to.
+        """
+        super().__init__(to)
+
+        self.key = key
+        self.absolute = absolute or {}
+        self.relative = relative or {}
+        self.keyframe = keyframe
+        self.last: dict[str, polars.DataFrame | float] = {}
+        self.ticks: dict[str, int] = {}
+
+    def _threshold(self, column: str, last: polars.Expr) -> polars.Expr:
+        threshold = polars.lit(self.absolute.get(column, 0.0))
+        if column in self.relative:
+            threshold = polars.max_horizontal(
+                threshold,
+                last.abs() * self.relative[column],
+            )
+        return threshold
+
+    def _changed(self, column: str) -> polars.Expr:
+        current = polars.col(column)
+        last = polars.col(f'{column}_last')
+        if column not in self.absolute and column not in self.relative:
+            return current.ne_missing(last)
+
+        moved = (current - last).abs() > self._threshold(column, last)
+        return moved.fill_null(False) | current.is_null().ne(last.is_null())
+
+    def _filter_frame(
+        self,
+        df: polars.DataFrame,
+        last: polars.DataFrame,
+        key: list[str],
+    ) -> polars.DataFrame:
+        columns = [c for c in df.columns if c not in key and c in last.columns]
+        joined = df.join(
+            last.select(*key, *columns).with_columns(
+                _seen=polars.lit(True),
+            ),
+            on=key,
+            how='left',
+            suffix='_last',
+            maintain_order='left',
+        )
+        changed = polars.col('_seen').is_null()
+        for column in columns:
+            changed = changed | self._changed(column)
+        return joined.filter(changed).select(df.columns)
+
+    def _filter_value(self, value: float, last: float) -> bool:
+        threshold = max(
+            self.absolute.get('value', 0.0),
+            abs(last) * self.relative.get('value', 0.0),
+        )
+        if 'value' in self.absolute or 'value' in self.relative:
+            return abs(value - last) > threshold
+        return value != last
+
+    def _apply(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        filtered = {}
+        for stream, timed_measurement in measurements.items():
+            value = timed_measurement.measurement
+            key: list[str] = []
+            if isinstance(value, polars.DataFrame):
+                found = process_key(value.columns, self.key)
+                if found is None:
+                    filtered[stream] = timed_measurement
+                    continue
+                key = found
+
+            tick = self.ticks.get(stream, 0)
+            self.ticks[stream] = tick + 1
+            last = self.last.get(stream)
+            is_keyframe = (
+                self.keyframe is not None and tick % self.keyframe == 0
+            )
+
+            if not isinstance(value, polars.DataFrame):
+                if (
+                    is_keyframe
+                    or last is None
+                    or isinstance(last, polars.DataFrame)
+                    or self._filter_value(value, last)
+                ):
+                    self.last[stream] = value
+                    filtered[stream] = timed_measurement
+                continue
+
+            if is_keyframe or not isinstance(last, polars.DataFrame):
+                self.last[stream] = value
+                filtered[stream] = timed_measurement
+                continue
+
+            kept = self._filter_frame(value, last, key)
+            # Replace the kept rows and forget processes that are gone so
+            # the state is bounded by the number of live processes
+            self.last[stream] = polars.concat(
+                [
+                    last.join(kept, on=key, how='anti').join(
+                        value,
+                        on=key,
+                        how='semi',
+                    ),
+                    kept,
+                ],
+                how='diagonal_relaxed',
+            )
+            if len(kept) > 0:
+                filtered[stream] = TimedMeasurement(
+                    timed_measurement.time,
+                    kept,
+                )
+
+        return filtered
+
+
+_DEFAULT_COUNTERS = [
+    'psutil_process_time_user',
+    'psutil_process_time_system',
+    'psutil_process_disk_read',
+    'psutil_process_disk_write',
+]
+_DEFAULT_PROCESS_KEY = ['psutil_process_pid', 'psutil_process_create_time']
+
+
+class CounterRate(BaseFilter):
+    """Filter to convert cumulative counter columns into per-second rates.
+
+    Each row is matched to the same process in the previous tick by a join
+    on the key columns. Including the process create time in the key keeps
+    a reused pid from being diffed against the process that previously had
+    it. New processes and counters that went backwards (e.g., after a
+    reset) get a null rate. Only the previous tick is kept, so the state is
+    bounded by the number of live processes. Float streams, and DataFrame
+    streams without the key or any of the counter columns, e.g., perf, are
+    passed through unchanged.
+    """
+
+    def __init__(
+        self,
+        columns: list[str] = _DEFAULT_COUNTERS,
+        key: str | list[str] = _DEFAULT_PROCESS_KEY,
+        suffix: str = '_rate',
+        keep_counters: bool = False,
+        to: None | set[str] = None,
+    ):
+        """Initialize a counter to rate filter.
+
+        Args:
+            columns: Cumulative counter columns to convert.
+            key: Column(s) identifying the same process across ticks.
+            suffix: Suffix appended to the name of each rate column.
+            keep_counters: Keep the original counter columns alongside the
+                rates.
+            to: Streams to apply the filter to.
+        """
+        super().__init__(to)
+
+        self.columns = list(columns)
+        self.key = [key] if isinstance(key, str) else list(key)
+        self.suffix = suffix
+        self.keep_counters = keep_counters
+        self.last: dict[str, TimedMeasurement] = {}
+
+    def _rates(
+        self,
+        df: polars.DataFrame,
+        time: datetime.datetime,
+        last: None | TimedMeasurement,
+    ) -> polars.DataFrame:
+        columns = [c for c in self.columns if c in df.columns]
+        elapsed = 0.0
+        previous = None
+        if last is not None and isinstance(last.measurement, polars.DataFrame):
+            elapsed = (time - last.time).total_seconds()
+            previous = last.measurement
+
+        if previous is None or elapsed <= 0:
+            # No previous tick to diff against
+            rates = [
+                polars.lit(None, dtype=polars.Float64).alias(
+                    f'{c}{self.suffix}',
+                )
+                for c in columns
+            ]
+            joined = df
+        else:
+            joined = df.join(
+                previous,
+                on=self.key,
+                how='left',
+                suffix='_last',
+                maintain_order='left',
+            )
+            rates = []
+            for c in columns:
+                delta = polars.col(c) - polars.col(f'{c}_last')
+                rates.append(
+                    polars.when(delta >= 0)
+                    .then(delta / elapsed)
+                    .otherwise(None)
+                    .alias(f'{c}{self.suffix}'),
+                )
+
+        output = [
+            c for c in df.columns if self.keep_counters or c not in columns
+        ]
+        return joined.select(*output, *rates)
+
+    def _apply(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> dict[str, TimedMeasurement]:
+        filtered = {}
+        for stream, timed_measurement in measurements.items():
+            df = timed_measurement.measurement
+            if (
+                not isinstance(df, polars.DataFrame)
+                or process_key(df.columns, self.key) is None
+                or not any(c in df.columns for c in self.columns)
+            ):
+                filtered[stream] = timed_measurement
+                continue
+
+            rates = self._rates(
+                df,
+                timed_measurement.time,
+                self.last.get(stream),
+            )
+            self.last[stream] = TimedMeasurement(
+                timed_measurement.time,
+                df.select(
+                    *self.key,
+                    *(c for c in self.columns if c in df.columns),
+                ),
+            )
+            filtered[stream] = TimedMeasurement(timed_measurement.time, rates)
+
+        return filtered
@@ -0,0 +1,146 @@
+"""Time the stages of a monitor and publish them as a stream."""
+
+from __future__ import annotations
+
+import datetime
+import threading
+from collections.abc import Sequence
+
+import polars
+import psutil
+
+from magnify.filters.chain import FilterChain
+from magnify.sensor.base import BaseSensor
+from magnify.store.base import BaseStore
+from magnify.types import TimedMeasurement
+
+SELF_STREAM = 'magnify_self'
+
+
+class Instrumentation:
+    """Timings of every stage of the ticks of a monitor.
+
+    The monitor records the nanoseconds (`time.perf_counter_ns`) taken by
+    each sensor's `invoke`, each filter, and the filters and `_put` of each
+    store into preallocated slots, so recording a stage costs two clock
+    reads and a list assignment.
+
+    Each tick publishes the timings of the previous tick, which includes
+    the stores, with the resource usage of the monitor process as a one
+    row DataFrame:
+
+    - `tick_ns`: the whole tick, and `overrun`, whether the tick took
+      longer than the interval, and `overruns`, the total so far.
+    - `sensor_<name>_ns`: `invoke` of each sensor, null if skipped.
+    - `store_<i>_<kind>_filter_ns` and `store_<i>_<kind>_put_ns`: the filter
+      chain and `_put` of each store, and `store_<i>_<kind>_depth`, the
+      queue depth of stores with a writer.
+    - `filter_<i>_<j>_<kind>_ns`: each filter of the chain of store `i`.
+      Chains shared by stores are timed once, under the first store.
+    - `tasks`: task events received since the previous tick, and
+      `task_lag_ns`, the largest delay between the timestamp of an event
+      and its processing.
+    - `rss`, `cpu_user`, `cpu_system`, `num_threads` and `open_fds` of the
+      monitor process.
+    """
+
+    def __init__(
+        self,
+        sensors: Sequence[BaseSensor],
+        stores: Sequence[BaseStore],
+    ):
+        """Allocate the slots of the stages of sensors and stores."""
+        self.sensor_names = [f'sensor_{s.name}_ns' for s in sensors]
+        self.sensors: list[None | int] = [None] * len(sensors)
+
+        kinds = [type(s).__name__.lower() for s in stores]
+        self.store_names = [f'store_{i}_{k}' for i, k in enumerate(kinds)]
+        self.filters: list[None | int] = [None] * len(stores)
+        self.puts: list[None | int] = [None] * len(stores)
+        self.queued = [
+            (f'{name}_depth', store)
+            for name, store in zip(self.store_names, stores)
+            if hasattr(store, 'depth')
+        ]
+
+        self.chains: list[tuple[list[str], FilterChain]] = []
+        seen: set[int] = set()
+        for i, store in enumerate(stores):
+            chain = store.chain
+            if id(chain) in seen or not chain.filters:
+                continue
+            seen.add(id(chain))
+            chain.timings = [None] * len(chain.filters)
+            names = [
+                f'filter_{i}_{j}_{type(f).__name__.lower()}_ns'
+                for j, f in enumerate(chain.filters)
+            ]
+            self.chains.append((names, chain))
+
+        self.tick_ns: None | int = None
+        self.overrun = False
+        self.overruns = 0
+
+        self.lock = threading.Lock()
+        self.tasks = 0
+        self.task_lag_ns = 0
+
+        self.process = psutil.Process()
+
+    def task(self, lag_ns: int) -> None:
+        """Record a task event processed lag_ns after its timestamp."""
+        with self.lock:
+            self.tasks += 1
+            self.task_lag_ns = max(self.task_lag_ns, lag_ns)
+
+    def measure(self) -> TimedMeasurement:
+        """Return the timings of the previous tick and reset them."""
+        row: dict[str, None | bool | int | float] = {
+            'tick_ns': self.tick_ns,
+            'overrun': self.overrun,
+            'overruns': self.overruns,
+        }
+        row.update(zip(self.sensor_names, self.sensors))
+        for name, filter_ns, put_ns in zip(
+            self.store_names,
+            self.filters,
+            self.puts,
+        ):
+            row[f'{name}_filter_ns'] = filter_ns
+            row[f'{name}_put_ns'] = put_ns
+        for name, store in self.queued:
+            row[name] = store.depth
+        for names, chain in self.chains:
+            row.update(zip(names, chain.timings or ()))
+            chain.timings = [None] * len(names)
+
+        with self.lock:
+            row['tasks'] = self.tasks
+            row['task_lag_ns'] = self.task_lag_ns
+            self.tasks = 0
+            self.task_lag_ns = 0
+
+        with self.process.oneshot():
+            cpu = self.process.cpu_times()
+            row['rss'] = self.process.memory_info().rss
+            row['cpu_user'] = cpu.user
+            row['cpu_system'] = cpu.system
+            row['num_threads'] = self.process.num_threads()
+            row['open_fds'] = self.process.num_fds()
+
+        self.sensors = [None] * len(self.sensors)
+        self.filters = [None] * len(self.filters)
+        self.puts = [None] * len(self.puts)
+        self.tick_ns = None
+        self.overrun = False
+
+        # Stages that did not run are null, keep their columns integers
+        return TimedMeasurement(
+            datetime.datetime.now(datetime.UTC),
+            polars.DataFrame(
+                [row],
+                schema_overrides={
+                    k: polars.Int64 for k in row if k.endswith('_ns')
+                },
+            ),
+        )
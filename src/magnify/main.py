@@ -1,14 +1,36 @@
 from __future__ import annotations
 
 import argparse
+import signal
+import sys
+from collections.abc import Sequence
 
 import daemon
 
+from magnify import analyze
+from magnify.config import AggregatorConfig
 from magnify.config import MonitorConfig
+from magnify.monitor import MagnifyMonitor
+from magnify.profiling import Profiler
+from magnify.store.proxy import Aggregator
 
 
-def main():
-    """Start a resource monitor process."""
+def run_monitor(monitor: MagnifyMonitor | Aggregator) -> None:
+    """Run the monitor until interrupted, then close it."""
+    monitor.start()
+    try:
+        monitor.wait()
+    finally:
+        monitor.shutdown()
+        monitor.close()
+
+
+def main(argv: None | Sequence[str] = None):
+    """Start a resource monitor process, or analyze a run with `analyze`."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ['analyze']:
+        return analyze.main(argv[1:])
+
     parser = argparse.ArgumentParser(
         description='Start the monitor on a node',
         prog='python -m magnify.run',
@@ -24,20 +46,47 @@ def main():
         '-f',
         help=('Start monitor process in the foreground. Default is daemon.'),
     )
+    parser.add_argument(
+        '--aggregator',
+        action='store_true',
+        help='Start an aggregator for forwarding stores instead.',
+    )
+    parser.add_argument(
+        '--profile-dir',
+        help=(
+            'Profile the monitor on SIGUSR1 (stack samples) or SIGUSR2 '
+            '(tracemalloc snapshot) and write the profiles to this directory.'
+        ),
+    )
+    parser.add_argument(
+        '--profile-seconds',
+        type=float,
+        default=30.0,
+        help='Duration of each profile. Default is 30 seconds.',
+    )
 
-    options = parser.parse_args()
-    config = MonitorConfig.from_toml(options.config)
+    options = parser.parse_args(argv)
+    monitor: MagnifyMonitor | Aggregator
+    if options.aggregator:
+        monitor = AggregatorConfig.from_toml(options.config).get_aggregator()
+    else:
+        monitor = MonitorConfig.from_toml(options.config).get_monitor()
 
-    monitor = config.get_monitor()
+    signal_map = {}
+    if options.profile_dir is not None:
+        profiler = Profiler(options.profile_dir, options.profile_seconds)
+        signal_map = profiler.signal_map()
 
     if options.foreground:
-        monitor.start()
-        monitor.wait()
+        for signum, handler in signal_map.items():
+            signal.signal(signum, handler)
+        run_monitor(monitor)
 
     else:
-        with daemon.DaemonContext():
-            monitor.start()
-            monitor.wait()
+        context = daemon.DaemonContext()
+        context.signal_map.update(signal_map)
+        with context:
+            run_monitor(monitor)
 
 
 if __name__ == '__main__':
@@ -7,6 +7,8 @@ import time
 import zmq
 from pydantic import AnyUrl
 
+from magnify.instrument import Instrumentation
+from magnify.instrument import SELF_STREAM
 from magnify.sensor.base import BaseSensor
 from magnify.store.base import BaseStore
 from magnify.types import TimedMeasurement
@@ -22,12 +24,26 @@ class MagnifyMonitor:
         stores: list[BaseStore],
         monitor_address: AnyUrl = 'ipc:///tmp/magnify_monitor',
         monitor_interval: int = 1,
+        instrument: bool = False,
     ):
-        """Initialize a monitor with the configured sensors and stores."""
+        """Initialize a monitor with the configured sensors and stores.
+
+        Args:
+            sensors: Sensors to take measurements with, in order.
+            stores: Stores to put measurements and tasks into.
+            monitor_address: Address to listen for task events on.
+            monitor_interval: Seconds between ticks.
+            instrument: Time the stages of every tick and publish them as
+                the `magnify_self` stream, see
+                [`Instrumentation`][magnify.instrument.Instrumentation].
+        """
         self.sensors = sensors
         self.stores = stores
         self.monitor_address = monitor_address
         self.monitor_interval = monitor_interval
+        self.instrumentation = (
+            Instrumentation(sensors, stores) if instrument else None
+        )
 
         self.kill_event = threading.Event()
         self.started = False
@@ -38,7 +54,17 @@ class MagnifyMonitor:
             task_msg['timestamp'],
         )
         task = TimedTask(**task_msg)
-
+        if self.instrumentation is not None:
+            # Naive timestamps are assumed to be in UTC
+            timestamp = task.timestamp
+            if timestamp.tzinfo is None:
+                timestamp = timestamp.replace(tzinfo=datetime.UTC)
+            lag = datetime.datetime.now(datetime.UTC) - timestamp
+            self.instrumentation.task(int(lag.total_seconds() * 1e9))
+        self.put_task(task)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Put a task event into the stores."""
         for store in self.stores:
             store.put_task(task)
 
@@ -46,16 +72,25 @@ class MagnifyMonitor:
         """Listen to monitor address for incoming tasks."""
         context = zmq.Context()
         socket = context.socket(zmq.SUB)
+        # SUB sockets drop every message until subscribed
+        socket.setsockopt(zmq.SUBSCRIBE, b'')
         socket.bind(self.monitor_address)
 
         while not self.kill_event.is_set():
+            # Poll with a timeout so the listener notices the kill event
+            if not socket.poll(self.monitor_interval * 1000):
+                continue
             task_msg: dict[int | str] = socket.recv_json()
             self.process_task(task_msg)
 
+        socket.close()
+        context.term()
+
     def take_measurement(self) -> dict[str, TimedMeasurement]:
         """Take a measurement from all of the sensors."""
+        instrumentation = self.instrumentation
         measurement: dict[str, TimedMeasurement] = {}
-        for sensor in self.sensors:
+        for i, sensor in enumerate(self.sensors):
             skip = False
             for dep in sensor.subscribes:
                 if dep not in measurement:
@@ -66,25 +101,59 @@ class MagnifyMonitor:
                 continue
 
             args = (measurement[dep].measurement for dep in sensor.subscribes)
-            val: TimedMeasurement | None = sensor.invoke(*args)
+            if instrumentation is None:
+                val: TimedMeasurement | None = sensor.invoke(*args)
+            else:
+                start = time.perf_counter_ns()
+                val = sensor.invoke(*args)
+                instrumentation.sensors[i] = time.perf_counter_ns() - start
             if val is not None:
                 measurement[sensor.name] = val
 
         return measurement
 
+    def tick(self) -> dict[str, TimedMeasurement]:
+        """Take a measurement and put it into the stores.
+
+        Returns:
+            The measurements of the tick.
+        """
+        instrumentation = self.instrumentation
+        if instrumentation is None:
+            measurement = self.take_measurement()
+            for store in self.stores:
+                store.put_measurement(measurement)
+            return measurement
+
+        tick_start = time.perf_counter_ns()
+        self_measurement = instrumentation.measure()
+        measurement = self.take_measurement()
+        measurement[SELF_STREAM] = self_measurement
+        for i, store in enumerate(self.stores):
+            # Same as put_measurement, timing the filters and put apart
+            start = time.perf_counter_ns()
+            filtered = store.chain(measurement)
+            filtered_ns = time.perf_counter_ns()
+            store._put(filtered)
+            instrumentation.filters[i] = filtered_ns - start
+            instrumentation.puts[i] = time.perf_counter_ns() - filtered_ns
+        instrumentation.tick_ns = time.perf_counter_ns() - tick_start
+        return measurement
+
     def run(self) -> None:
         """Run the main monitoring loop."""
         now = time.time()
         while not self.kill_event.is_set():
             next_sleep_time = now + self.monitor_interval
 
-            measurement = self.take_measurement()
-            for store in self.stores:
-                store.put_measurement(measurement)
+            self.tick()
 
             remaining_time = next_sleep_time - time.time()
             if remaining_time > 0:
                 time.sleep(remaining_time)
+            elif self.instrumentation is not None:
+                self.instrumentation.overrun = True
+                self.instrumentation.overruns += 1
 
             now = time.time()
 
@@ -122,3 +191,11 @@ class MagnifyMonitor:
         # Prepare for next start
         self.kill_event.clear()
         self.started = False
+
+    def close(self) -> None:
+        """Close the sensors and stores, persisting any state they hold."""
+        for sensor in self.sensors:
+            sensor.close()
+        for store in self.stores:
+            store.flush_filters()
+            store.close()
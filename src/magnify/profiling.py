@@ -0,0 +1,178 @@
+"""Profile a running monitor on demand.
+
+A [`Profiler`][magnify.profiling.Profiler] installs signal handlers which
+profile the threads of the monitor for a few seconds and write the results
+to a directory. Nothing runs until a signal is received.
+
+Example:
+    ```bash
+    magnify -c monitor.toml --profile-dir /tmp/magnify
+    kill -USR1 <pid>  # sample the stacks of every thread
+    kill -USR2 <pid>  # trace allocations and take a tracemalloc snapshot
+    ```
+"""
+
+from __future__ import annotations
+
+import collections
+import datetime
+import os
+import pathlib
+import signal
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections.abc import Callable
+from types import FrameType
+
+
+def _stack(frame: None | FrameType) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f'{code.co_qualname} ({code.co_filename}:{frame.f_lineno})',
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Profiler:
+    """Profile the threads of a process on demand.
+
+    `sample` records the stack of every thread of the process with
+    `sys._current_frames` at a fixed interval from a background thread, so
+    the monitor threads run unmodified while they are sampled. The stacks
+    are written in the collapsed format read by flame graph tools, e.g.,
+    `flamegraph.pl` or speedscope, one line per stack with its count.
+
+    `snapshot` traces allocations with `tracemalloc` for a while, then
+    dumps the snapshot, which can be loaded with
+    `tracemalloc.Snapshot.load`, and a summary of the largest allocations
+    by line.
+
+    Only one profile runs at a time, and signals received while one runs
+    are ignored. A profile that fails writes its traceback to the
+    directory instead.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike[str],
+        seconds: float = 30.0,
+        interval: float = 0.01,
+        frames: int = 25,
+    ):
+        """Initialize a profiler writing to a directory.
+
+        Args:
+            directory: Directory to write profiles to, created if missing.
+            seconds: Duration of each profile.
+            interval: Seconds between samples of the stacks.
+            frames: Frames of the traceback of each allocation to store.
+        """
+        # Daemons change their working directory
+        self.directory = pathlib.Path(directory).resolve()
+        self.seconds = seconds
+        self.interval = interval
+        self.frames = frames
+        self.running = threading.Lock()
+
+    def _path(self, kind: str, suffix: str) -> pathlib.Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        now = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        return self.directory / f'{kind}-{os.getpid()}-{now}{suffix}'
+
+    def sample(self) -> pathlib.Path:
+        """Sample the stacks of every thread and write them.
+
+        Returns:
+            Path of the collapsed stacks.
+        """
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        counts: collections.Counter[str] = collections.Counter()
+        deadline = time.monotonic() + self.seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident != me:
+                    thread = names.get(ident, str(ident))
+                    counts[f'{thread};{_stack(frame)}'] += 1
+            time.sleep(self.interval)
+
+        path = self._path('stacks', '.folded')
+        with open(path, 'w') as f:
+            for stack, count in counts.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+    def snapshot(self, top: int = 50) -> pathlib.Path:
+        """Trace allocations for a while and write a snapshot.
+
+        Allocations are only traced while the snapshot is taken, unless
+        tracing was already started, e.g., with `PYTHONTRACEMALLOC`.
+
+        Args:
+            top: Lines with the largest allocations to summarize.
+
+        Returns:
+            Path of the snapshot. The summary has the suffix `.txt`.
+        """
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(self.frames)
+        try:
+            time.sleep(self.seconds)
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if started:
+                tracemalloc.stop()
+
+        path = self._path('tracemalloc', '.snapshot')
+        snapshot.dump(str(path))
+        with open(path.with_suffix('.txt'), 'w') as f:
+            for stat in snapshot.statistics('lineno')[:top]:
+                f.write(f'{stat}\n')
+        return path
+
+    def _run(self, profile: Callable[[], pathlib.Path]) -> None:
+        try:
+            profile()
+        except Exception:
+            # A daemon has no stderr, so keep the error with the profiles
+            with open(self._path('error', '.txt'), 'w') as f:
+                traceback.print_exc(file=f)
+        finally:
+            self.running.release()
+
+    def start(self, profile: Callable[[], pathlib.Path]) -> bool:
+        """Run a profile in a background thread.
+
+        Returns:
+            False if a profile is already running.
+        """
+        if not self.running.acquire(blocking=False):
+            return False
+        thread = threading.Thread(
+            target=self._run,
+            args=(profile,),
+            name='magnify-profiler',
+            daemon=True,
+        )
+        thread.start()
+        return True
+
+    def signal_map(
+        self,
+    ) -> dict[int, Callable[[int, None | FrameType], object]]:
+        """Map `SIGUSR1` to `sample` and `SIGUSR2` to `snapshot`.
+
+        The map can be passed to `daemon.DaemonContext` or installed with
+        `signal.signal`. The handlers only start a background thread.
+        """
+        return {
+            signal.SIGUSR1: lambda *_: self.start(self.sample),
+            signal.SIGUSR2: lambda *_: self.start(self.snapshot),
+        }
@@ -22,7 +22,7 @@ class BaseSensor(ABC):
         pass
 
     @property
-    def subscribes(self) -> tuple[str]:
+    def subscribes(self) -> tuple[str, ...]:
         """Return the names of the data streams this sensor depends on.
 
         We use string names instead of class names because there could be
@@ -38,3 +38,7 @@ class BaseSensor(ABC):
     ) -> None | TimedMeasurement:
         """Take a measurement from this sensor."""
         pass
+
+    def close(self) -> None:  # noqa: B027
+        """Release resources and persist any state held by the sensor."""
+        pass
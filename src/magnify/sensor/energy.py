@@ -1,12 +1,21 @@
 from __future__ import annotations
 
 import datetime
+import hashlib
+import json
+import os
+import pathlib
+import socket
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 
 import numpy as np
 import polars
 from sklearn.linear_model import ElasticNet
 
 from magnify.sensor.base import BaseSensor
+from magnify.sensor.rapl import cpu_socket_ids
 from magnify.types import TimedMeasurement
 
 # Default events to use to predict energy on an intel x86 machine
@@ -17,10 +26,129 @@ _DEFAULT_ENERGY_EVENTS = [
 ]
 
 
+class RecursiveLeastSquares:
+    """Online linear regression using recursive least squares.
+
+    Implements the subset of the scikit-learn regressor interface used by
+    the energy sensor (`fit`, `partial_fit`, `predict`, `coef_` and
+    `intercept_`) so it can be swapped in for `ElasticNet`. Each sample
+    updates the coefficients in O(features^2), so the model never needs to
+    be refit from scratch.
+
+    Counter rates are around 1e9 to 1e10 per second, so the features are
+    centered and scaled by the mean and standard deviation of the first
+    samples before the update, otherwise the intercept cannot be told apart
+    from the features. The statistics are fixed after the first samples so
+    the estimate stays consistent, and the coefficients are reported in
+    the units of the features.
+    """
+
+    def __init__(
+        self,
+        *,
+        forgetting: float = 0.99,
+        delta: float = 1000.0,
+        positive: bool = True,
+    ):
+        """Initialize an empty model.
+
+        Args:
+            forgetting: Exponential forgetting factor in (0, 1]. Smaller
+                values track changes in the workload faster.
+            delta: Initial scale of the inverse covariance matrix.
+            positive: Report non-negative coefficients (but not intercept).
+                The internal estimate is left unconstrained so that the
+                recursive update stays consistent with its covariance.
+        """
+        if not 0 < forgetting <= 1:
+            raise ValueError('forgetting must be in the range (0, 1].')
+        self.forgetting = forgetting
+        self.delta = delta
+        self.positive = positive
+        # Empty until the model sees its first samples
+        self.theta = np.zeros(0)
+        self.P = np.zeros((0, 0))
+        self.mean = np.zeros(0)
+        self.scale = np.zeros(0)
+
+    @property
+    def coef_(self) -> np.ndarray:
+        """Return the coefficients of the features."""
+        if self.theta.size == 0:
+            raise ValueError('The model is not fitted.')
+        coef = self.theta[:-1] / self.scale
+        if self.positive:
+            return np.maximum(coef, 0)
+        return coef
+
+    @property
+    def intercept_(self) -> float:
+        """Return the intercept of the model."""
+        if self.theta.size == 0:
+            raise ValueError('The model is not fitted.')
+        return float(self.theta[-1] - self.theta[:-1] / self.scale @ self.mean)
+
+    def _reset(self, X: np.ndarray) -> None:  # noqa: N803
+        n_features = X.shape[1]
+        self.theta = np.zeros(n_features + 1)
+        self.P = np.eye(n_features + 1) * self.delta
+        self.mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        # A single sample or a constant feature has no spread to scale by
+        self.scale = np.where(
+            scale > 0,
+            scale,
+            np.maximum(np.abs(self.mean), 1.0),
+        )
+
+    def _update(self, x: np.ndarray, y: float) -> None:
+        z = np.append((x - self.mean) / self.scale, 1.0)
+        pz = self.P @ z
+        gain = pz / (self.forgetting + z @ pz)
+        self.theta = self.theta + gain * (y - self.theta @ z)
+        self.P = (self.P - np.outer(gain, pz)) / self.forgetting
+
+        # Without new information in some direction the covariance grows
+        # without bound when forgetting < 1, so cap it at its initial size
+        trace = np.trace(self.P)
+        if trace > self.delta * len(z):
+            self.P *= self.delta * len(z) / trace
+
+    def partial_fit(
+        self,
+        X: np.ndarray,  # noqa: N803
+        y: np.ndarray,
+    ) -> RecursiveLeastSquares:
+        """Update the model with one or more new samples."""
+        X = np.atleast_2d(X)  # noqa: N806
+        y = np.atleast_1d(y)
+        if self.theta.size == 0:
+            self._reset(X)
+        for x_i, y_i in zip(X, y):
+            self._update(x_i, y_i)
+        return self
+
+    def fit(
+        self,
+        X: np.ndarray,  # noqa: N803
+        y: np.ndarray,
+    ) -> RecursiveLeastSquares:
+        """Fit the model from scratch on the given samples."""
+        self.theta = np.zeros(0)
+        return self.partial_fit(X, y)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:  # noqa: N803
+        """Predict the target for each row of X."""
+        return np.atleast_2d(X) @ self.coef_ + self.intercept_
+
+
+_MODELS = ('elasticnet', 'rls')
+
+
 class PerfEnergySensor(BaseSensor):
     """Sensor to measure energy based on RAPL plus performance counters."""
 
-    def __init__(
+    def __init__(  # noqa: PLR0913
         self,
         *,
         eps: float = 0.2,
@@ -28,73 +156,448 @@ class PerfEnergySensor(BaseSensor):
         k: int = 50,
         min_samples: int = 10,
         events: list[str] = _DEFAULT_ENERGY_EVENTS,
+        model: str = 'rls',
+        forgetting: float = 0.99,
+        background: bool = True,
+        state_dir: None | str | os.PathLike[str] = None,
+        save_interval: float = 60.0,
     ):
-        """Initialize sensor to create rolling energy models."""
-        self.model = None
-        self.training_data = []  # TODO: Switch to circular buffer
+        """Initialize sensor to create rolling energy models.
+
+        Args:
+            eps: Rolling relative error above which the ElasticNet model is
+                refit.
+            alpha: Smoothing factor of the rolling error.
+            k: Number of recent samples kept for (re)training.
+            min_samples: Number of samples needed before the first fit.
+            events: Performance counters used as features.
+            model: Either "rls" to update a recursive least squares model
+                online every sample, or "elasticnet" to refit an ElasticNet
+                model whenever the rolling error exceeds eps.
+            forgetting: Forgetting factor of the recursive least squares
+                model.
+            background: Refit the ElasticNet model on a worker thread from a
+                snapshot of the training data. The current model keeps
+                serving predictions until the new one is swapped in.
+            state_dir: Directory to periodically save the model and training
+                window to. A saved state for the same host and events is
+                loaded on startup so predictions are available immediately.
+            save_interval: Seconds between saves of the model state.
+        """
+        if model not in _MODELS:
+            raise ValueError(
+                f'Unknown energy model "{model}". Expected one of {_MODELS}.',
+            )
+        self.model: None | ElasticNet | RecursiveLeastSquares = None
+        self.model_kind = model
+        self.forgetting = forgetting
+        # TODO: Switch to circular buffer
+        self.training_data: list[tuple[np.ndarray, float]] = []
         self.rolling_error = 0.0
         self.eps = eps
         self.alpha = alpha
         self.k = k
         self.min_samples = min_samples
         self.events = events
+        self.background = background
         self.prev_timestamp: datetime.datetime = datetime.datetime.now(
             datetime.UTC,
         )
 
+        self._executor: ThreadPoolExecutor | None = None
+        self._retrain: Future[ElasticNet | RecursiveLeastSquares] | None = None
+        self.retrains_completed = 0
+        self.retrains_skipped = 0
+        self.retrains_failed = 0
+
+        self.state_path: pathlib.Path | None = None
+        self.save_interval = save_interval
+        self.last_save = self.prev_timestamp
+        if state_dir is not None:
+            self.state_path = pathlib.Path(state_dir) / self._state_name()
+            self.load_state()
+
     @property
     def name(self) -> str:
         """Return the logical name of this sensor."""
         return 'energy'
 
     @property
-    def subscribes(self) -> tuple[str]:
+    def subscribes(self) -> tuple[str, ...]:
         """Return the names of the data streams this sensor depends on."""
         return ('perf', 'rapl')
 
-    def _train_model(self) -> None:
-        """Retrain the model with the existing data."""
-        self.model = ElasticNet(random_state=0, positive=True)
-        self.model.fit(
-            np.vstack([X for X, _ in self.training_data]),
-            np.array([Y for _, Y in self.training_data]),
+    def _new_model(self) -> ElasticNet | RecursiveLeastSquares:
+        if self.model_kind == 'rls':
+            return RecursiveLeastSquares(forgetting=self.forgetting)
+        return ElasticNet(random_state=0, positive=True)
+
+    def _fit(
+        self,
+        training_data: list[tuple[np.ndarray, float]],
+    ) -> ElasticNet | RecursiveLeastSquares:
+        model = self._new_model()
+        model.fit(
+            np.vstack([X for X, _ in training_data]),
+            np.array([Y for _, Y in training_data]),
         )
+        return model
+
+    def _train_model(self) -> ElasticNet | RecursiveLeastSquares:
+        """Retrain the model with the existing data and return it."""
+        model = self.model = self._fit(self.training_data)
         self.rolling_error = 0
+        return model
 
-    def invoke(self, perf: polars.DataFrame, rapl: float) -> TimedMeasurement:
-        """Calculate energy from perf counters and Rapl measurements."""
-        timestamp: datetime.datetime = datetime.datetime.now(datetime.UTC)
-        duration = (timestamp - self.prev_timestamp).total_seconds()
-        self.prev_timestamp = timestamp
-        features = perf.select(polars.sum(self.events) / duration).to_numpy()
-        power = rapl / duration
+    @property
+    def retrains_in_flight(self) -> int:
+        """Return the number of background retrains still running."""
+        return int(self._retrain is not None and not self._retrain.done())
+
+    def _start_retrain(self) -> None:
+        """Refit a model from a snapshot of the training data."""
+        if self._retrain is not None:
+            # Only one retrain at a time, the next tick over eps retries
+            self.retrains_skipped += 1
+            return
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix='magnify-energy-retrain',
+            )
+        self._retrain = self._executor.submit(
+            self._fit,
+            list(self.training_data),
+        )
+
+    def _swap_retrained_model(self) -> None:
+        """Swap in the result of a finished background retrain."""
+        if self._retrain is None or not self._retrain.done():
+            return
+
+        retrain, self._retrain = self._retrain, None
+        if retrain.exception() is not None:
+            # Keep serving the previous model
+            self.retrains_failed += 1
+            return
 
+        self.model = retrain.result()
+        self.rolling_error = 0
+        self.retrains_completed += 1
+
+    def _update_model(
+        self,
+        features: np.ndarray,
+        power: float,
+    ) -> None | ElasticNet | RecursiveLeastSquares:
+        """Add a training sample and update the model if needed.
+
+        Returns:
+            The model to make predictions with, None if there is not
+            enough data to train one yet.
+        """
         # Only keep the last k training examples
-        self.training_data.append((features.flatten(), power))
+        self.training_data.append((features, power))
         self.training_data = self.training_data[-self.k :]
-        if len(self.training_data) < self.min_samples:
-            # Figure out if we need to keep samples before model is trained?
-            return None
+        self._swap_retrained_model()
 
-        if self.model is None:
-            self._train_model()
+        model = self.model
+        if model is None:
+            if len(self.training_data) < self.min_samples:
+                # Figure out if we need to keep samples before model is
+                # trained?
+                return None
+            model = self._train_model()
 
-        predicted_power = self.model.predict(features)
-        error = np.abs(predicted_power - power) / power
+        predicted_power = model.predict(features.reshape(1, -1))[0]
+        error = abs(predicted_power - power) / power
         self.rolling_error = ((1 - self.alpha) * self.rolling_error) + (
             self.alpha * error
         )
-        if self.rolling_error > self.eps:
+
+        if isinstance(model, RecursiveLeastSquares):
+            model.partial_fit(features.reshape(1, -1), np.array([power]))
+        elif self.rolling_error > self.eps:
             # Retrain model
-            self._train_model()
+            if self.background:
+                self._start_retrain()
+            else:
+                model = self._train_model()
+
+        return model
+
+    def _state_name(self) -> str:
+        """Return the state file name keyed by host and event set."""
+        digest = hashlib.sha1(','.join(self.events).encode()).hexdigest()
+        return f'energy-{socket.gethostname()}-{digest[:12]}.json'
+
+    def save_state(self) -> None:
+        """Write the model and recent training window to the state file."""
+        if self.state_path is None:
+            return
+
+        model = self.model
+        state = {
+            'events': self.events,
+            'model': self.model_kind,
+            'rolling_error': float(self.rolling_error),
+            'training_data': [
+                [*X.tolist(), float(Y)] for X, Y in self.training_data
+            ],
+        }
+        if model is not None:
+            state['coef'] = model.coef_.tolist()
+            state['intercept'] = float(model.intercept_)
+            if isinstance(model, RecursiveLeastSquares):
+                state['theta'] = model.theta.tolist()
+                state['P'] = model.P.tolist()
+                state['mean'] = model.mean.tolist()
+                state['scale'] = model.scale.tolist()
+
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        # Replace atomically so a crash never leaves a partial state file
+        os.replace(tmp_path, self.state_path)
+
+    def load_state(self) -> bool:
+        """Restore the model and training window from the state file.
+
+        Returns:
+            True if a state was found and loaded.
+        """
+        if self.state_path is None or not self.state_path.exists():
+            return False
+
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state['events'] != self.events:
+            return False
 
-        scale = (power - self.model.intercept_) / (
-            predicted_power - self.model.intercept_
+        self.training_data = [
+            (np.array(row[:-1]), row[-1])
+            for row in state['training_data'][-self.k :]
+        ]
+        self.rolling_error = state['rolling_error']
+
+        if 'coef' not in state:
+            self.model = None
+        elif state['model'] != self.model_kind:
+            # Coefficients from another kind of model are not comparable
+            self.model = None
+            if len(self.training_data) >= self.min_samples:
+                self._train_model()
+        else:
+            model = self._new_model()
+            if isinstance(model, RecursiveLeastSquares):
+                model.theta = np.array(state['theta'])
+                model.P = np.array(state['P'])
+                # States saved before scaling have unscaled estimates
+                n_features = len(model.theta) - 1
+                model.mean = np.array(state.get('mean', [0.0] * n_features))
+                model.scale = np.array(state.get('scale', [1.0] * n_features))
+            else:
+                model.coef_ = np.array(state['coef'])
+                model.intercept_ = state['intercept']
+                model.n_features_in_ = len(state['coef'])
+            self.model = model
+        return True
+
+    def close(self) -> None:
+        """Save the model state and stop any background retraining."""
+        self.save_state()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._retrain = None
+
+    def invoke(
+        self,
+        perf: polars.DataFrame,
+        rapl: float,
+    ) -> None | TimedMeasurement:
+        """Calculate energy from perf counters and Rapl measurements."""
+        timestamp: datetime.datetime = datetime.datetime.now(datetime.UTC)
+        duration = (timestamp - self.prev_timestamp).total_seconds()
+        self.prev_timestamp = timestamp
+        features = perf.select(polars.sum(self.events) / duration).to_numpy()
+        power = rapl / duration
+
+        model = self._update_model(features.flatten(), power)
+        if (
+            self.state_path is not None
+            and (timestamp - self.last_save).total_seconds()
+            >= self.save_interval
+        ):
+            self.save_state()
+            self.last_save = timestamp
+
+        if model is None:
+            return None
+
+        predicted_power = model.predict(features)
+        scale = (power - model.intercept_) / (
+            predicted_power - model.intercept_
         )
         features = perf.select(polars.col(self.events) / duration).to_numpy()
-        power = (features @ self.model.coef_) * scale
+        power = (features @ model.coef_) * scale
         process_df = perf.select(
             polars.col(['pid', 'ppid']),
             polars.Series(name='power', values=power),
         )
         return TimedMeasurement(timestamp, process_df)
+
+
+class PerSocketEnergySensor(BaseSensor):
+    """Sensor to measure energy with a separate model for each socket.
+
+    Each process is attributed to the socket of the cpu it last ran on, and
+    a model per socket is trained against the RAPL energy of that socket.
+    Requires the "perf" stream to include a cpu column and the "rapl"
+    stream to be a per socket DataFrame (see `RaplSysfsSensor(per_socket=
+    True)`).
+    """
+
+    def __init__(
+        self,
+        *,
+        sockets: None | dict[int, int] = None,
+        cpu_column: str = 'cpu',
+        state_dir: None | str | os.PathLike[str] = None,
+        **options: Any,
+    ):
+        """Initialize sensor to create rolling energy models per socket.
+
+        Args:
+            sockets: Mapping of cpu id to socket id. Read from sysfs if not
+                provided.
+            cpu_column: Column of the perf stream with the cpu each process
+                last ran on.
+            state_dir: Directory to save the model of each socket to.
+            options: Options passed to the `PerfEnergySensor` used to model
+                each socket.
+        """
+        if sockets is None:
+            sockets = cpu_socket_ids()
+        self.sockets = sockets
+        self.cpu_column = cpu_column
+        self.state_dir = None if state_dir is None else pathlib.Path(state_dir)
+        self.options = options
+        self.events = options.get('events', _DEFAULT_ENERGY_EVENTS)
+        self.models: dict[int, PerfEnergySensor] = {}
+        self.prev_timestamp: datetime.datetime = datetime.datetime.now(
+            datetime.UTC,
+        )
+        self.last_save = self.prev_timestamp
+
+    @property
+    def name(self) -> str:
+        """Return the logical name of this sensor."""
+        return 'energy'
+
+    @property
+    def subscribes(self) -> tuple[str, ...]:
+        """Return the names of the data streams this sensor depends on."""
+        return ('perf', 'rapl')
+
+    def _socket_model(self, socket_id: int) -> PerfEnergySensor:
+        if socket_id not in self.models:
+            state_dir = None
+            if self.state_dir is not None:
+                state_dir = self.state_dir / f'socket-{socket_id}'
+            self.models[socket_id] = PerfEnergySensor(
+                state_dir=state_dir,
+                **self.options,
+            )
+        return self.models[socket_id]
+
+    def save_state(self) -> None:
+        """Save the model of every socket."""
+        for model in self.models.values():
+            model.save_state()
+
+    def close(self) -> None:
+        """Close the model of every socket."""
+        for model in self.models.values():
+            model.close()
+
+    def invoke(
+        self,
+        perf: polars.DataFrame,
+        rapl: polars.DataFrame,
+    ) -> None | TimedMeasurement:
+        """Calculate per process power from perf counters and RAPL."""
+        timestamp: datetime.datetime = datetime.datetime.now(datetime.UTC)
+        duration = (timestamp - self.prev_timestamp).total_seconds()
+        self.prev_timestamp = timestamp
+
+        perf = perf.with_columns(
+            polars.col(self.cpu_column)
+            .replace_strict(
+                self.sockets,
+                default=None,
+                return_dtype=polars.Int64,
+            )
+            .alias('socket'),
+        )
+        socket_features = perf.group_by('socket').agg(
+            polars.sum(self.events) / duration,
+        )
+        socket_data = (
+            rapl.select(
+                polars.col('socket').cast(polars.Int64),
+                (polars.col('energy') / duration).alias('power'),
+            )
+            .join(socket_features, on='socket', how='left')
+            .fill_null(0)
+        )
+
+        # Update the model of each socket and compute the weights that
+        # turn the counters of a process on that socket into power
+        weights = {}
+        features = socket_data.select(self.events).to_numpy()
+        for i, (socket_id, power) in enumerate(
+            socket_data.select('socket', 'power').iter_rows(),
+        ):
+            socket_model = self._socket_model(socket_id)
+            model = socket_model._update_model(features[i], power)
+            if model is None:
+                continue
+            predicted_power = model.predict(features[i].reshape(1, -1))[0]
+            scale = (power - model.intercept_) / (
+                predicted_power - model.intercept_
+            )
+            weights[socket_id] = model.coef_ * scale
+
+        if (timestamp - self.last_save).total_seconds() >= self.options.get(
+            'save_interval',
+            60.0,
+        ):
+            self.save_state()
+            self.last_save = timestamp
+
+        if len(weights) == 0:
+            return None
+
+        # Processes on a socket without a model index the row of NaNs
+        index = {socket_id: i for i, socket_id in enumerate(weights)}
+        weight_matrix = np.vstack(
+            [*weights.values(), np.full(len(self.events), np.nan)],
+        )
+        rows = (
+            perf.get_column('socket')
+            .replace_strict(index, default=len(weights))
+            .fill_null(len(weights))
+            .to_numpy()
+        )
+        process_features = perf.select(
+            polars.col(self.events) / duration,
+        ).to_numpy()
+        power = np.einsum('ij,ij->i', process_features, weight_matrix[rows])
+        process_df = perf.select(
+            polars.col(['pid', 'ppid', 'socket']),
+            polars.Series(name='power', values=power, nan_to_null=True),
+        )
+        return TimedMeasurement(timestamp, process_df)
@@ -38,6 +38,8 @@ class PerfSensor(BaseSensor):
         d['pid'] = proc.info['pid']
         d['ppid'] = proc.info['ppid']
         d['name'] = proc.info['name']
+        # CPU the process last ran on, used to attribute it to a socket
+        d['cpu'] = proc.info.get('cpu_num')
 
         event_counters = profiler.read_events()
         profiler.reset_events()  # How much overhead does this add?
@@ -54,7 +56,9 @@ class PerfSensor(BaseSensor):
     def invoke(self):
         """Measure the performance counters of all processes."""
         process_info = []
-        for proc in psutil.process_iter(['pid', 'username', 'name', 'ppid']):
+        for proc in psutil.process_iter(
+            ['pid', 'username', 'name', 'ppid', 'cpu_num'],
+        ):
             if (
                 proc.info['username'] != self.username
                 or proc.info['pid'] == os.getpid()
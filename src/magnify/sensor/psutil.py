@@ -12,6 +12,7 @@ from magnify.types import TimedMeasurement
 
 DEFAULT_READINGS = [
     'cpu_percent',
+    'create_time',
     'memory_percent',
     'nice',
     'name',
@@ -57,13 +58,15 @@ class PsutilSensor(BaseSensor):
         d['psutil_process_time_user'] = proc.cpu_times().user
         d['psutil_process_time_system'] = proc.cpu_times().system
         try:
-            d['psutil_process_disk_write'] = proc.io_counters().write_chars
-            d['psutil_process_disk_read'] = proc.io_counters().read_chars
+            io = proc.io_counters()
+            d['psutil_process_disk_write'] = io.write_chars
+            d['psutil_process_disk_read'] = io.read_chars
         except Exception:
             # occasionally pid temp files that hold this information are
-            # unavailable to be read so set to zero
-            d['psutil_process_disk_write'] = 0
-            d['psutil_process_disk_read'] = 0
+            # unavailable to be read so mark the counters as missing, a zero
+            # would read as a reset of the counters
+            d['psutil_process_disk_write'] = None
+            d['psutil_process_disk_read'] = None
 
         return d
 
@@ -79,5 +82,6 @@ class PsutilSensor(BaseSensor):
 
         return TimedMeasurement(
             datetime.datetime.now(datetime.UTC),
-            polars.from_dicts(process_info),
+            # Counters may be missing from the first processes
+            polars.from_dicts(process_info, infer_schema_length=None),
         )
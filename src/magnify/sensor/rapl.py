@@ -1,13 +1,28 @@
 from __future__ import annotations
 
 import datetime
+import glob
 import os
 import re
 
+import polars
+
 from magnify.sensor.base import BaseSensor
 from magnify.types import TimedMeasurement
 
 
+def cpu_socket_ids() -> dict[int, int]:
+    """Return the socket (physical package) id of each cpu on the machine."""
+    sockets = {}
+    for path in glob.glob(
+        '/sys/devices/system/cpu/cpu[0-9]*/topology/physical_package_id',
+    ):
+        cpu_id = int(re.search(r'cpu(\d+)/topology', path).group(1))
+        with open(path) as api_file:
+            sockets[cpu_id] = int(api_file.readline().strip())
+    return sockets
+
+
 class RaplSysfsSensor(BaseSensor):
     """Monitor energy using sysfs files created by intel RAPL.
 
@@ -20,8 +35,14 @@ class RaplSysfsSensor(BaseSensor):
     All rights reserved.
     """
 
-    def __init__(self):
-        """Initialize a RAPL monitor by reading sysfs."""
+    def __init__(self, *, per_socket: bool = False):
+        """Initialize a RAPL monitor by reading sysfs.
+
+        Args:
+            per_socket: Report a DataFrame with the energy of each socket
+                instead of the total energy of all sockets.
+        """
+        self.per_socket = per_socket
         self._socket_ids = self.get_socket_ids()
         self._pkg_files = self.get_pkg_files()
 
@@ -192,6 +213,25 @@ class RaplSysfsSensor(BaseSensor):
             }
             for k1 in devices
         }
-        total = sum(device['energy'] for device in result.values())
         self.prev_reading = devices
-        return TimedMeasurement(datetime.datetime.now(datetime.UTC), total)
+        timestamp = datetime.datetime.now(datetime.UTC)
+        if self.per_socket:
+            return TimedMeasurement(
+                timestamp,
+                polars.DataFrame(
+                    {
+                        'socket': self._socket_ids,
+                        'energy': [
+                            result[f'package-{i}']['energy']
+                            for i in self._socket_ids
+                        ],
+                        'dram': [
+                            result[f'package-{i}']['dram']
+                            for i in self._socket_ids
+                        ],
+                    },
+                ),
+            )
+
+        total = sum(device['energy'] for device in result.values())
+        return TimedMeasurement(timestamp, total)
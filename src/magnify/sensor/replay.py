@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import os
+import time
+from collections.abc import Sequence
+from typing import Any
+
+import polars
+
+from magnify.monitor import MagnifyMonitor
+from magnify.sensor.base import BaseSensor
+from magnify.store.recording import read_recording
+from magnify.store.recording import recording_streams
+from magnify.types import TimedMeasurement
+
+
+class ReplaySensor(BaseSensor):
+    """Sensor returning the recorded measurements of one stream.
+
+    Replay sensors are created by a
+    [`Recording`][magnify.sensor.replay.Recording] and return the
+    measurement of their stream from the tick being replayed, or None if
+    the stream was not recorded in that tick.
+    """
+
+    def __init__(self, recording: Recording, stream: str):
+        """Initialize a sensor replaying a stream of a recording."""
+        self.recording = recording
+        self.stream = stream
+
+    @property
+    def name(self) -> str:
+        """Return the logical name of this sensor."""
+        return self.stream
+
+    def invoke(
+        self,
+        *_: float | polars.DataFrame,
+    ) -> None | TimedMeasurement:
+        """Return the recorded measurement of the stream."""
+        return self.recording.current.get(self.stream)
+
+
+class Recording:
+    """Feed a recording through the filters and stores of a monitor.
+
+    A monitor built with the sensors of a recording takes the recorded
+    measurements of each tick, with their recorded times, as if its
+    sensors had measured them, and task events are put into its stores in
+    between. Other sensors may be added after the replay sensors, e.g., an
+    energy sensor subscribing to the replayed `perf` and `rapl` streams.
+
+    Example:
+        ```python
+        >>> recording = Recording('node.rec')
+        >>> monitor = MagnifyMonitor(recording.sensors(), stores)
+        >>> recording.replay(monitor)
+        {'ticks': 3600, 'tasks': 512, 'seconds': 4.2, ...}
+        ```
+    """
+
+    def __init__(self, path: str | os.PathLike[str]):
+        """Open a recording written by a `RecordingStore`.
+
+        Raises:
+            ValueError: If the file is not a recording.
+        """
+        self.path = path
+        self.streams = recording_streams(path)
+        self.current: dict[str, TimedMeasurement] = {}
+
+    def sensors(
+        self,
+        streams: None | Sequence[str] = None,
+    ) -> list[ReplaySensor]:
+        """Create the sensors replaying streams of the recording.
+
+        Args:
+            streams: Streams to replay. All recorded streams if None.
+        """
+        if streams is None:
+            streams = self.streams
+        return [ReplaySensor(self, stream) for stream in streams]
+
+    def replay(
+        self,
+        monitor: MagnifyMonitor,
+        speed: None | float = None,
+    ) -> dict[str, Any]:
+        """Replay the recording through a monitor.
+
+        Args:
+            monitor: Monitor to take the measurements with. Its stores are
+                not closed.
+            speed: Replay at this multiple of the recorded rate, e.g., 1.0
+                for real time. As fast as possible if None.
+
+        Returns:
+            The number of ticks and task events replayed, the seconds it
+            took and the ticks per second.
+        """
+        ticks = 0
+        tasks = 0
+        start = time.perf_counter()
+        first: None | float = None
+
+        for record in read_recording(self.path):
+            if isinstance(record, dict):
+                record_time = max(
+                    (m.time.timestamp() for m in record.values()),
+                    default=None,
+                )
+            else:
+                record_time = record.timestamp.timestamp()
+
+            if speed is not None and record_time is not None:
+                if first is None:
+                    first = record_time
+                delay = (record_time - first) / speed - (
+                    time.perf_counter() - start
+                )
+                if delay > 0:
+                    time.sleep(delay)
+
+            if isinstance(record, dict):
+                self.current = record
+                monitor.tick()
+                ticks += 1
+            else:
+                monitor.put_task(record)
+                tasks += 1
+
+        self.current = {}
+        seconds = time.perf_counter() - start
+        return {
+            'ticks': ticks,
+            'tasks': tasks,
+            'seconds': seconds,
+            'ticks_per_second': ticks / seconds if seconds > 0 else 0.0,
+        }
@@ -2,8 +2,10 @@ from __future__ import annotations
 
 from abc import ABC
 from abc import abstractmethod
+from collections.abc import Sequence
 
 from magnify.filters.base import BaseFilter
+from magnify.filters.chain import FilterChain
 from magnify.types import TimedMeasurement
 from magnify.types import TimedTask
 
@@ -13,33 +15,45 @@ class BaseStore(ABC):
 
     def __init__(
         self,
-        filters: list[BaseFilter] = (),
+        filters: Sequence[BaseFilter] = (),
         includes: None | set[str] = None,
-    ):
+    ) -> None:
         """Initialize a store."""
         self.filters = filters
         self.includes = includes
+        self.chain = FilterChain(filters, includes)
 
     @abstractmethod
-    def _put(self, measurements: dict[str, TimedMeasurement]):
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
         """Internal put method that should be overridden by concrete class."""
         pass
 
-    def put_measurement(self, measurements: dict[str, TimedMeasurement]):
+    def put_measurement(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> None:
         """Public method for storing measurements to store.
 
-        First applies filters, then calls internal _put method.
+        First applies filters, then calls internal _put method. The filtered
+        measurements may be shared with other stores, so _put must not
+        modify them.
         """
-        if self.includes is not None:
-            measurements = {
-                k: measurements[k] for k in self.includes & measurements.keys()
-            }
-        for f in self.filters:
-            measurements = f.apply(measurements)
-
-        self._put(measurements)
+        self._put(self.chain(measurements))
 
     @abstractmethod
-    def put_task(self, task: TimedTask):
+    def put_task(self, task: TimedTask) -> None:
         """Method to store task information."""
         pass
+
+    def flush_filters(self) -> None:
+        """Store the measurements held back by the filters.
+
+        Called before the store is closed.
+        """
+        flushed = self.chain.flush()
+        if flushed:
+            self._put(flushed)
+
+    def close(self) -> None:  # noqa: B027
+        """Write any buffered data and release resources held by the store."""
+        pass
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import collections
+import datetime
+from typing import NamedTuple
+
+
+class ClockSample(NamedTuple):
+    """Offset of a node clock measured by one ping exchange.
+
+    `time` is the middle of the exchange on the node clock in seconds since
+    the epoch, `offset` is how far the reference clock is ahead of the node
+    clock and `delay` is the round trip time of the exchange.
+    """
+
+    time: float
+    offset: float
+    delay: float
+
+
+class ClockEstimator:
+    """Estimate the offset and drift of a node clock from ping exchanges.
+
+    Each exchange follows NTP: the node sends a ping at `t1` (node clock),
+    the reference receives it at `t2` and replies at `t3` (reference
+    clock), and the node receives the reply at `t4`. The offset of the
+    exchange is `((t2 - t1) + (t3 - t4)) / 2`, exact if both directions
+    took the same time, and wrong by at most half the delay
+    `(t4 - t1) - (t3 - t2)` otherwise.
+
+    Exchanges delayed by queueing are the least accurate, so only the
+    `best` fraction of the last `window` samples with the lowest delay is
+    used. A line fitted through their offsets over time gives the offset
+    and the drift (seconds of offset per second) of the node clock. The
+    drift is only fitted once the samples span `min_span` seconds, and is
+    bounded by `max_drift`, so noise between close samples is not mistaken
+    for drift. Offsets are interpolated within the span of the samples and
+    held constant outside of it.
+    """
+
+    def __init__(
+        self,
+        window: int = 64,
+        best: float = 0.25,
+        min_span: float = 60.0,
+        max_drift: float = 1e-3,
+    ):
+        """Initialize an estimator.
+
+        Args:
+            window: Number of recent samples to keep.
+            best: Fraction of the samples with the lowest delay to fit.
+            min_span: Seconds the fitted samples must span to fit a drift.
+            max_drift: Maximum absolute drift.
+        """
+        self.samples: collections.deque[ClockSample] = collections.deque(
+            maxlen=window,
+        )
+        self.best = best
+        self.min_span = min_span
+        self.max_drift = max_drift
+        self.offset = 0.0
+        self.drift = 0.0
+        self.delay = 0.0
+        self.reference = 0.0
+
+    def add(self, t1: float, t2: float, t3: float, t4: float) -> ClockSample:
+        """Add the times of a ping exchange and update the estimate.
+
+        Returns:
+            The sample measured by the exchange.
+        """
+        sample = ClockSample(
+            time=(t1 + t4) / 2,
+            offset=((t2 - t1) + (t3 - t4)) / 2,
+            delay=max((t4 - t1) - (t3 - t2), 0.0),
+        )
+        self.samples.append(sample)
+        self._fit()
+        return sample
+
+    def _fit(self) -> None:
+        count = max(2, int(len(self.samples) * self.best))
+        fitted = sorted(self.samples, key=lambda s: s.delay)[:count]
+        self.delay = fitted[0].delay
+
+        self.reference = sum(s.time for s in fitted) / len(fitted)
+        self.offset = sum(s.offset for s in fitted) / len(fitted)
+        self.drift = 0.0
+        times = [s.time for s in fitted]
+        if max(times) - min(times) < self.min_span:
+            return
+
+        spread = sum((t - self.reference) ** 2 for t in times)
+        drift = (
+            sum(
+                (s.time - self.reference) * (s.offset - self.offset)
+                for s in fitted
+            )
+            / spread
+        )
+        self.drift = min(max(drift, -self.max_drift), self.max_drift)
+
+    def offset_at(self, time: float) -> float:
+        """Return the estimated offset at a time of the node clock."""
+        if not self.samples:
+            return 0.0
+        time = min(max(time, self.samples[0].time), self.samples[-1].time)
+        return self.offset + self.drift * (time - self.reference)
+
+    def correct(self, time: datetime.datetime) -> datetime.datetime:
+        """Convert a time of the node clock to the reference clock."""
+        offset = self.offset_at(time.timestamp())
+        return time + datetime.timedelta(seconds=offset)
@@ -0,0 +1,274 @@
+from __future__ import annotations
+
+import collections
+import gzip
+import http.client
+import json
+import threading
+import time
+import urllib.parse
+from collections.abc import Sequence
+from typing import Any
+
+import polars
+
+from magnify.client import TaskEvent
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+# Bulk item statuses worth retrying, other failures are rejected for good
+_RETRY_STATUSES = {429, 502, 503, 504}
+
+
+class ElasticsearchStore(BaseStore):
+    """Store to index monitoring values into Elasticsearch in bulk.
+
+    Every row of a DataFrame stream, every float measurement and every task
+    event becomes a document with the fields of the row, an `@timestamp`
+    and the name of the `stream`. Documents are buffered and sent with the
+    `_bulk` API, gzip compressed, once `batch_size` documents are buffered
+    or the oldest is `max_interval` seconds old, over a single keep-alive
+    connection.
+
+    Requests that fail, and bulk items rejected with a retryable status
+    (e.g., 429), are retried with exponential backoff up to `max_retries`
+    times. Documents that still failed stay buffered for the next flush. At
+    most `max_buffer` documents are buffered, the oldest are dropped beyond
+    that so an unreachable cluster cannot exhaust memory.
+
+    Sending happens on the thread that puts the measurements. Configure a
+    writer for the store so retries do not delay sampling.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        url: str = 'http://localhost:9200',
+        index: str = 'magnify',
+        batch_size: int = 5000,
+        max_interval: float = 10.0,
+        max_buffer: int = 100_000,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        timeout: float = 30.0,
+        compress: bool = True,
+        api_key: None | str = None,
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize a store indexing into the cluster at url.
+
+        Args:
+            url: Base URL of the cluster.
+            index: Index (or data stream) to write to.
+            batch_size: Maximum number of documents per bulk request.
+            max_interval: Age in seconds of the oldest buffered document
+                that triggers a flush.
+            max_buffer: Maximum number of buffered documents.
+            max_retries: Number of times to retry a request.
+            backoff: Seconds to wait before the first retry, doubled after
+                each retry.
+            timeout: Timeout in seconds of a request.
+            compress: Gzip compress the requests.
+            api_key: Encoded API key to authenticate with.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
+        super().__init__(filters=filters, includes=includes)
+
+        parsed = urllib.parse.urlsplit(url)
+        if parsed.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported URL scheme in "{url}".')
+        if parsed.hostname is None:
+            raise ValueError(f'Missing host in "{url}".')
+        self.url = parsed
+        self.hostname = parsed.hostname
+        self.index = index
+        self.batch_size = batch_size
+        self.max_interval = max_interval
+        self.max_buffer = max_buffer
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.compress = compress
+
+        self.headers = {'Content-Type': 'application/x-ndjson'}
+        if compress:
+            self.headers['Content-Encoding'] = 'gzip'
+        if api_key is not None:
+            self.headers['Authorization'] = f'ApiKey {api_key}'
+        self.action = json.dumps({'create': {'_index': index}}) + '\n'
+
+        self.lock = threading.Lock()
+        self.connection: None | http.client.HTTPConnection = None
+        self.buffer: collections.deque[str] = collections.deque()
+        self.first_buffered: None | float = None
+        self.next_attempt = 0.0
+
+        self.indexed = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.requests = 0
+        self.retries = 0
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.connection is None:
+            connection_type = (
+                http.client.HTTPSConnection
+                if self.url.scheme == 'https'
+                else http.client.HTTPConnection
+            )
+            self.connection = connection_type(
+                self.hostname,
+                self.url.port,
+                timeout=self.timeout,
+            )
+        return self.connection
+
+    def _disconnect(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _request(self, docs: list[str]) -> None | dict[str, Any]:
+        """Send one bulk request.
+
+        Returns:
+            The decoded response, or None if the request should be retried.
+        """
+        body = ''.join(self.action + doc for doc in docs).encode()
+        if self.compress:
+            body = gzip.compress(body, compresslevel=1)
+
+        path = self.url.path.rstrip('/') + '/_bulk'
+        self.requests += 1
+        try:
+            connection = self._connect()
+            connection.request('POST', path, body, self.headers)
+            response = connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            # Reconnect on the next attempt
+            self._disconnect()
+            return None
+
+        if response.status in _RETRY_STATUSES:
+            return None
+        if response.status >= 400:  # noqa: PLR2004
+            # The whole request is invalid, retrying will not help
+            self.rejected += len(docs)
+            return {'errors': False, 'items': []}
+        return json.loads(payload)
+
+    def _send(self, docs: list[str]) -> list[str]:
+        """Send documents, retrying failures with backoff.
+
+        Returns:
+            Documents that could not be sent.
+        """
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                self.retries += 1
+                time.sleep(delay)
+                delay *= 2
+
+            result = self._request(docs)
+            if result is None:
+                continue
+
+            retry = []
+            if result.get('errors'):
+                for doc, item in zip(docs, result['items']):
+                    status = next(iter(item.values()))['status']
+                    if status in _RETRY_STATUSES:
+                        retry.append(doc)
+                    elif status >= 400:  # noqa: PLR2004
+                        self.rejected += 1
+                    else:
+                        self.indexed += 1
+            else:
+                self.indexed += len(result['items'])
+
+            if len(retry) == 0:
+                return []
+            docs = retry
+        return docs
+
+    def _flush(self) -> None:
+        failed: list[str] = []
+        while self.buffer:
+            count = min(self.batch_size, len(self.buffer))
+            docs = [self.buffer.popleft() for _ in range(count)]
+            failed = self._send(docs)
+            if failed:
+                break
+
+        # Keep what could not be sent and wait an interval before trying
+        # again so an unreachable cluster does not delay every tick
+        self.buffer.extendleft(reversed(failed))
+        self.first_buffered = time.monotonic() if self.buffer else None
+        if failed:
+            self.next_attempt = time.monotonic() + self.max_interval
+
+    def _append(self, docs: list[str]) -> None:
+        if self.first_buffered is None:
+            self.first_buffered = time.monotonic()
+        self.buffer.extend(docs)
+        overflow = len(self.buffer) - self.max_buffer
+        for _ in range(max(overflow, 0)):
+            self.buffer.popleft()
+        self.dropped += max(overflow, 0)
+
+        now = time.monotonic()
+        if now >= self.next_attempt and (
+            len(self.buffer) >= self.batch_size
+            or now - self.first_buffered >= self.max_interval
+        ):
+            self._flush()
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        docs = []
+        for stream, timed_measurement in measurements.items():
+            timestamp = timed_measurement.time.isoformat()
+            measurement = timed_measurement.measurement
+            if isinstance(measurement, polars.DataFrame):
+                ndjson = measurement.with_columns(
+                    polars.lit(timestamp).alias('@timestamp'),
+                    polars.lit(stream).alias('stream'),
+                ).write_ndjson()
+                docs.extend(ndjson.splitlines(keepends=True))
+            else:
+                doc = {
+                    '@timestamp': timestamp,
+                    'stream': stream,
+                    'value': float(measurement),
+                }
+                docs.append(json.dumps(doc) + '\n')
+
+        with self.lock:
+            self._append(docs)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Buffer a task event to index."""
+        doc = {
+            '@timestamp': task.timestamp.isoformat(),
+            'stream': 'tasks',
+            'task_id': str(task.task_id),
+            'pid': task.pid,
+            'event': TaskEvent(task.event).name,
+        }
+        with self.lock:
+            self._append([json.dumps(doc) + '\n'])
+
+    def flush(self) -> None:
+        """Send all buffered documents."""
+        with self.lock:
+            self._flush()
+
+    def close(self) -> None:
+        """Send all buffered documents and close the connection."""
+        with self.lock:
+            self._flush()
+            self._disconnect()
@@ -1,72 +1,369 @@
 from __future__ import annotations
 
 import csv
+import datetime
+import gzip
 import os
 import pathlib
+import shutil
+import threading
+from collections.abc import Sequence
 from typing import TextIO
 
 import polars
 
 from magnify.filters.base import BaseFilter
 from magnify.store.base import BaseStore
+from magnify.tasks import TaskInterval
+from magnify.tasks import TaskTracker
 from magnify.types import TimedMeasurement
 from magnify.types import TimedTask
 
+_PARTITIONS = {
+    'day': ('%Y-%m-%d', datetime.timedelta(days=1)),
+    'hour': ('%Y-%m-%dT%H', datetime.timedelta(hours=1)),
+    'minute': ('%Y-%m-%dT%H-%M', datetime.timedelta(minutes=1)),
+}
+_TASK_HEADER = (
+    'task_id',
+    'process_id',
+    'start_time',
+    'end_time',
+    'status',
+    'host',
+)
+
+
+def _utc(time: datetime.datetime) -> datetime.datetime:
+    # Naive times are assumed to already be in UTC
+    if time.tzinfo is None:
+        return time.replace(tzinfo=datetime.UTC)
+    return time.astimezone(datetime.UTC)
+
+
+def parse_partition(
+    name: str,
+) -> None | tuple[datetime.datetime, datetime.datetime]:
+    """Parse the time range of a partition directory of a file store.
+
+    Args:
+        name: Name of the partition directory, e.g., "2024-01-01T13".
+
+    Returns:
+        The UTC start (inclusive) and end (exclusive) of the partition, or
+        None if name is not a partition.
+    """
+    for fmt, length in _PARTITIONS.values():
+        try:
+            start = datetime.datetime.strptime(name, fmt)
+        except ValueError:
+            continue
+        start = start.replace(tzinfo=datetime.UTC)
+        return start, start + length
+    return None
+
+
+def _partitions(
+    dir_name: str | os.PathLike[str],
+    start: None | datetime.datetime = None,
+    end: None | datetime.datetime = None,
+) -> list[tuple[datetime.datetime, datetime.datetime, pathlib.Path]]:
+    found = []
+    for path in pathlib.Path(dir_name).iterdir():
+        bounds = parse_partition(path.name) if path.is_dir() else None
+        if bounds is None:
+            continue
+        if start is not None and bounds[1] <= _utc(start):
+            continue
+        if end is not None and bounds[0] >= _utc(end):
+            continue
+        found.append((*bounds, path))
+    return sorted(found)
+
+
+def partitions(
+    dir_name: str | os.PathLike[str],
+    start: None | datetime.datetime = None,
+    end: None | datetime.datetime = None,
+) -> list[pathlib.Path]:
+    """List the partitions of a file store that overlap a time range.
+
+    Example:
+        ```python
+        >>> paths = partitions('cache', start=last_hour)
+        >>> polars.concat(
+        ...     polars.read_csv(p, try_parse_dates=True)
+        ...     for path in paths
+        ...     for p in path.glob('perf*.csv*')
+        ... )
+        ```
+
+    Args:
+        dir_name: Root directory of the file store.
+        start: Skip partitions that end before start.
+        end: Skip partitions that begin at or after end.
+
+    Returns:
+        Partition directories in time order.
+    """
+    return [path for _, _, path in _partitions(dir_name, start, end)]
+
+
+class _StreamFile:
+    """Open csv file of a stream, rotated by partition and size."""
+
+    def __init__(self, name: str, suffix: str):
+        self.name = name
+        self.suffix = suffix
+        self.fp: None | TextIO = None
+        self.directory: None | pathlib.Path = None
+        self.index = 0
+        self.written = 0
+
+    def _path(self, directory: pathlib.Path) -> pathlib.Path:
+        if self.index == 0:
+            return directory / f'{self.name}{self.suffix}'
+        return directory / f'{self.name}.{self.index}{self.suffix}'
+
+    def open(self, directory: pathlib.Path, compress: bool) -> None:
+        """Open the next unused file of the stream in directory."""
+        self.close()
+        if directory != self.directory:
+            self.directory = directory
+            self.index = 0
+        # Never overwrite the files of previous runs
+        while self._path(directory).exists():
+            self.index += 1
+        path = self._path(directory)
+        self.fp = gzip.open(path, 'xt') if compress else path.open('x')  # noqa: SIM115
+        self.written = 0
+
+    def write(self, text: str) -> int:
+        """Write text, counting the uncompressed bytes of the file."""
+        if self.fp is None:
+            raise ValueError('I/O operation on closed file.')
+        self.written += len(text)
+        return self.fp.write(text)
+
+    def close(self) -> None:
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
 
 class FileStore(BaseStore):
-    """Store to write monitoring values to file system directly as csv."""
+    """Store to write monitoring values to file system directly as csv.
 
-    def __init__(
+    Each stream is written to `<stream>.csv`, and tasks to `tasks.csv`
+    with one row per task and process once the task ends, and the host of
+    tasks forwarded by an aggregator. Tasks still running when the store is
+    closed, or that did not end within `task_ttl` seconds, are written
+    without an end time or status.
+
+    With `partition` set, files are written into a directory per hour (or
+    day or minute) of the measurement time, named like `2024-01-01T13` so
+    readers can skip partitions by name, see
+    [`partitions()`][magnify.store.file.partitions]. Partitions older
+    than `retention` are deleted as new ones are created.
+
+    A file that reaches `max_bytes` is rotated to `<stream>.1.csv`,
+    `<stream>.2.csv` and so on. Files of earlier runs are never
+    overwritten, a restarted store continues with the next free name.
+
+    Measurements and tasks may be put from different threads.
+    """
+
+    def __init__(  # noqa: PLR0913
         self,
-        dir_name: str | os.PathLike,
-        filters: tuple[BaseFilter] = (),
+        dir_name: str | os.PathLike[str],
+        partition: None | str = None,
+        max_bytes: None | int = None,
+        compress: bool = False,
+        retention: None | float = None,
+        task_ttl: float = 3600.0,
+        filters: Sequence[BaseFilter] = (),
         includes: None | set[str] = None,
     ):
-        """Initialize a file store rooted at dir_name."""
+        """Initialize a file store rooted at dir_name.
+
+        Args:
+            dir_name: Directory to write the files to.
+            partition: Write files into a directory per "day", "hour" or
+                "minute". All files are written to dir_name if None.
+            max_bytes: Number of (uncompressed) bytes after which a file is
+                rotated. Files are not rotated if None.
+            compress: Write gzip compressed files (`.csv.gz`).
+            retention: Number of seconds to keep partitions for. Requires
+                partition to be set. Partitions are kept forever if None.
+            task_ttl: Seconds to wait for the end of a task.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
         super().__init__(filters=filters, includes=includes)
+        self.streams: dict[str, _StreamFile] = {}
+        self.tracker = TaskTracker(ttl=task_ttl, history=0)
+        # Guards the files, partitions and tasks, written by the monitor and
+        # task listener threads
+        self.lock = threading.Lock()
+
+        if partition is not None and partition not in _PARTITIONS:
+            raise ValueError(
+                f'Unknown partition "{partition}". Expected one of '
+                f'{tuple(_PARTITIONS)}.',
+            )
+        if retention is not None and partition is None:
+            raise ValueError('Retention requires a partition.')
+
+        self.partition = partition
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self.retention = retention
+        self.suffix = '.csv.gz' if compress else '.csv'
 
-        self.streams: dict[str, TextIO] = {}
         self.parent_dir = pathlib.Path(dir_name)
         self.parent_dir.mkdir(parents=True, exist_ok=True)
+        self.newest_partition: None | datetime.datetime = None
+        if self.partition is not None:
+            # Continue from the partitions of previous runs
+            existing = _partitions(self.parent_dir)
+            if existing:
+                self.newest_partition, _, _ = existing[-1]
+                self._expire()
+
+        # Create the file for tasks, partitions are created on first write
+        if self.partition is None:
+            self._file(
+                'tasks',
+                datetime.datetime.now(datetime.UTC),
+                _TASK_HEADER,
+            )
+
+    def _directory(self, time: datetime.datetime) -> pathlib.Path:
+        if self.partition is None:
+            return self.parent_dir
+
+        fmt, _ = _PARTITIONS[self.partition]
+        directory = self.parent_dir / _utc(time).strftime(fmt)
+        if not directory.exists():
+            directory.mkdir(parents=True, exist_ok=True)
+            start = datetime.datetime.strptime(directory.name, fmt).replace(
+                tzinfo=datetime.UTC,
+            )
+            if self.newest_partition is None or start > self.newest_partition:
+                self.newest_partition = start
+                self._expire()
+        return directory
 
-        # Create the file for tasks
-        task_path: pathlib.Path = self.parent_dir / 'tasks.csv'
-        self.task_file = task_path.open('w')
-        writer = csv.writer(self.task_file)
-        writer.writerow(('task_id', 'process_id', 'start_time', 'end_time'))
+    def _expire(self) -> None:
+        if self.retention is None or self.newest_partition is None:
+            return
 
-    def _put(self, measurements: dict[str, TimedMeasurement]):
+        cutoff = self.newest_partition - datetime.timedelta(
+            seconds=self.retention,
+        )
+        for _, end, path in _partitions(self.parent_dir, end=cutoff):
+            if end > cutoff:
+                continue
+            for stream_file in self.streams.values():
+                if stream_file.directory == path:
+                    stream_file.close()
+            shutil.rmtree(path)
+
+    def _file(
+        self,
+        stream: str,
+        time: datetime.datetime,
+        header: None | Sequence[str] = None,
+    ) -> tuple[_StreamFile, bool]:
+        """Get the file to write the next rows of stream at time to.
+
+        Returns:
+            The file and whether it was just opened. The header is written
+            to new files if given.
+        """
+        if stream not in self.streams:
+            self.streams[stream] = _StreamFile(stream, self.suffix)
+        stream_file = self.streams[stream]
+
+        directory = self._directory(time)
+        if (
+            stream_file.fp is None
+            or stream_file.directory != directory
+            or (
+                self.max_bytes is not None
+                and stream_file.written >= self.max_bytes
+            )
+        ):
+            stream_file.open(directory, self.compress)
+            if header is not None:
+                csv.writer(stream_file).writerow(header)
+            return stream_file, True
+
+        return stream_file, False
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        with self.lock:
+            self._write_measurements(measurements)
+
+    def _write_measurements(
+        self,
+        measurements: dict[str, TimedMeasurement],
+    ) -> None:
         for stream, timed_measurement in measurements.items():
-            include_header = False
-            if stream not in self.streams:
-                stream_path: pathlib.Path = self.parent_dir / f'{stream}.csv'
-                self.streams[stream] = stream_path.open('w')
-                include_header = True
+            stream_file, include_header = self._file(
+                stream,
+                timed_measurement.time,
+            )
 
             if isinstance(timed_measurement.measurement, polars.DataFrame):
                 df = timed_measurement.measurement.with_columns(
                     polars.lit(timed_measurement.time).alias('time'),
                 )
-                df.write_csv(
-                    self.streams[stream],
-                    separator=',',
-                    include_header=include_header,
+                stream_file.write(
+                    df.write_csv(
+                        separator=',',
+                        include_header=include_header,
+                    ),
                 )
 
             elif isinstance(timed_measurement.measurement, float):
-                writer = csv.writer(self.streams[stream])
+                writer = csv.writer(stream_file)
                 if include_header:
                     writer.writerow(['time', 'value'])
                 writer.writerow(timed_measurement)
 
-    def put_task(self, timed_task: TimedTask):
-        """Write task to file store."""
-        writer = csv.writer(self.task_file)
-        writer.writerow(timed_task)
+    def _write_task(self, interval: TaskInterval) -> None:
+        # Intervals without a start always have an end
+        time = interval.end_time or interval.start_time
+        if time is None:
+            return
+        stream_file, _ = self._file('tasks', time, _TASK_HEADER)
+        csv.writer(stream_file).writerow(
+            (
+                interval.task_id,
+                interval.pid,
+                interval.start_time,
+                interval.end_time,
+                None if interval.status is None else interval.status.name,
+                interval.host,
+            ),
+        )
+
+    def put_task(self, timed_task: TimedTask) -> None:
+        """Write the tasks that ended with a task event to file store."""
+        with self.lock:
+            for interval in self.tracker.add(timed_task):
+                self._write_task(interval)
+
+    def close(self) -> None:
+        """Write the running tasks and close open file pointers."""
+        with self.lock:
+            for interval in self.tracker.drain():
+                self._write_task(interval)
+            for stream_file in self.streams.values():
+                stream_file.close()
+            self.streams.clear()
 
-    def __del__(self):
+    def __del__(self) -> None:
         """Delete file store object. Close open file pointers."""
-        for fp in self.streams.values():
-            fp.close()
-        self.streams.clear()
-        self.task_file.close()
+        self.close()
@@ -0,0 +1,345 @@
+from __future__ import annotations
+
+import bisect
+import datetime
+import threading
+from collections.abc import Sequence
+
+import polars
+
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.tasks import TaskInterval
+from magnify.tasks import TaskTracker
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_PID_COLUMNS = ('pid', 'psutil_process_pid')
+
+
+class _Series:
+    """Time-ordered chunks of one stream with their time bounds."""
+
+    def __init__(self) -> None:
+        self.chunks: list[polars.DataFrame] = []
+        self.starts: list[datetime.datetime] = []
+        self.ends: list[datetime.datetime] = []
+        # Number of trailing single tick chunks not yet compacted
+        self.small = 0
+        self.schema: None | polars.Schema = None
+
+    def append(self, df: polars.DataFrame, time: datetime.datetime) -> None:
+        if self.schema is None:
+            self.schema = df.schema
+        elif df.schema != self.schema:
+            # Fix the schema of the stream to the schema of its first tick
+            df = df.select(
+                polars.col(c).cast(dtype, strict=False)
+                if c in df.columns
+                else polars.lit(None, dtype=dtype).alias(c)
+                for c, dtype in self.schema.items()
+            )
+        if self.ends and time < self.ends[-1]:
+            self._insert(df, time)
+            return
+        self.chunks.append(df)
+        self.starts.append(time)
+        self.ends.append(time)
+        self.small += 1
+
+    def _insert(self, df: polars.DataFrame, time: datetime.datetime) -> None:
+        # A tick older than the newest one, e.g., after the wall clock
+        # stepped back, goes into the chunk covering its time, or between
+        # the chunks around it, so the chunks stay ordered
+        index = bisect.bisect_right(self.starts, time)
+        if index > 0 and time <= self.ends[index - 1]:
+            self.chunks[index - 1] = polars.concat(
+                [self.chunks[index - 1], df],
+            ).sort('time', maintain_order=True)
+            return
+        if index >= len(self.chunks) - self.small:
+            self.small += 1
+        self.chunks.insert(index, df)
+        self.starts.insert(index, time)
+        self.ends.insert(index, time)
+
+    def compact(self) -> None:
+        """Merge the trailing single tick chunks into one chunk."""
+        if self.small < 2:  # noqa: PLR2004
+            return
+        first = len(self.chunks) - self.small
+        merged = polars.concat(self.chunks[first:], rechunk=True)
+        end = self.ends[-1]
+        del self.chunks[first:], self.starts[first + 1 :], self.ends[first:]
+        self.chunks.append(merged)
+        self.ends.append(end)
+        self.small = 0
+
+    def expire(self, cutoff: datetime.datetime) -> None:
+        """Drop the chunks that ended before cutoff."""
+        count = bisect.bisect_left(self.ends, cutoff)
+        if count == 0:
+            return
+        del self.chunks[:count], self.starts[:count], self.ends[:count]
+        self.small = min(self.small, len(self.chunks))
+
+
+class MemoryStore(BaseStore):
+    """Store keeping recent measurements in memory for online queries.
+
+    Each stream is kept as a list of time-ordered polars DataFrames
+    (chunks) with a `time` column, along with the first and last time of
+    every chunk. Every tick is appended as its own chunk, and once
+    `chunk_ticks` ticks have accumulated they are merged into one chunk
+    so queries do not have to walk many tiny chunks. Chunks older than
+    `retention` seconds before the newest tick are dropped. Ticks older
+    than the newest one, e.g., after the wall clock stepped back, are
+    inserted in time order.
+
+    Queries find the chunks overlapping a time range by binary search over
+    the chunk bounds. Chunks entirely within the range are returned as is,
+    concatenated without copying, so only the chunks at the edges of the
+    range are filtered.
+
+    Float streams are stored as frames with `time` and `value` columns.
+    Task events are paired into intervals by a
+    [`TaskTracker`][magnify.tasks.TaskTracker], ended tasks are kept for
+    the retention window as well.
+    Queries may run on other threads than the monitor.
+    """
+
+    def __init__(
+        self,
+        retention: float = 600.0,
+        chunk_ticks: int = 60,
+        task_ttl: float = 3600.0,
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize an in-memory store.
+
+        Args:
+            retention: Seconds of measurements to keep for each stream.
+            chunk_ticks: Number of ticks merged into a chunk.
+            task_ttl: Seconds to wait for the end of a task.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
+        super().__init__(filters=filters, includes=includes)
+
+        self.retention = datetime.timedelta(seconds=retention)
+        self.chunk_ticks = chunk_ticks
+        self.series: dict[str, _Series] = {}
+        self.tracker = TaskTracker(ttl=task_ttl, history=retention)
+        self.lock = threading.Lock()
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        for stream, (time, measurement) in measurements.items():
+            if isinstance(measurement, polars.DataFrame):
+                df = measurement.with_columns(polars.lit(time).alias('time'))
+            else:
+                df = polars.DataFrame(
+                    {'time': [time], 'value': [float(measurement)]},
+                )
+
+            with self.lock:
+                if stream not in self.series:
+                    self.series[stream] = _Series()
+                series = self.series[stream]
+                series.append(df, time)
+                if series.small >= self.chunk_ticks:
+                    series.compact()
+                series.expire(time - self.retention)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Record the start or end of a task."""
+        with self.lock:
+            self.tracker.add(task)
+
+    def running(
+        self,
+        pid: int,
+        time: datetime.datetime,
+        host: None | str = None,
+    ) -> list[TaskInterval]:
+        """Return the intervals of the tasks running on a process at a time.
+
+        Tasks forwarded by an aggregator are found by the host of the
+        process.
+        """
+        with self.lock:
+            return self.tracker.running(pid, time, host)
+
+    def _chunks(
+        self,
+        stream: str,
+        start: None | datetime.datetime,
+        end: None | datetime.datetime,
+    ) -> tuple[list[polars.DataFrame], None | polars.Schema]:
+        with self.lock:
+            series = self.series.get(stream)
+            if series is None:
+                return [], None
+            first = 0
+            if start is not None:
+                first = bisect.bisect_left(series.ends, start)
+            last = len(series.chunks)
+            if end is not None:
+                last = bisect.bisect_left(series.starts, end)
+
+            chunks = []
+            for i in range(first, last):
+                chunk = series.chunks[i]
+                if (start is not None and series.starts[i] < start) or (
+                    end is not None and series.ends[i] >= end
+                ):
+                    # Only the chunks at the edges of the range are copied
+                    time = polars.col('time')
+                    if start is not None:
+                        chunk = chunk.filter(time >= start)
+                    if end is not None:
+                        chunk = chunk.filter(time < end)
+                chunks.append(chunk)
+            return chunks, series.schema
+
+    def range(
+        self,
+        stream: str,
+        start: None | datetime.datetime = None,
+        end: None | datetime.datetime = None,
+    ) -> polars.DataFrame:
+        """Return the rows of a stream in a time range.
+
+        Args:
+            stream: Name of the stream.
+            start: Start of the range (inclusive). Unbounded if None.
+            end: End of the range (exclusive). Unbounded if None.
+
+        Raises:
+            KeyError: If the stream has not been stored.
+        """
+        chunks, schema = self._chunks(stream, start, end)
+        if schema is None:
+            raise KeyError(f'Unknown stream "{stream}".')
+        if not chunks:
+            return polars.DataFrame(schema=schema)
+        return polars.concat(chunks, rechunk=False)
+
+    def latest(self, stream: str, pid: None | int = None) -> polars.DataFrame:
+        """Return the rows of the newest tick of a stream.
+
+        Args:
+            stream: Name of the stream.
+            pid: Only return the newest rows of the process.
+
+        Raises:
+            KeyError: If the stream has not been stored.
+        """
+        with self.lock:
+            series = self.series.get(stream)
+            if series is None:
+                raise KeyError(f'Unknown stream "{stream}".')
+            chunks = list(series.chunks)
+            schema = series.schema
+
+        pid_column = (
+            _pid_column(schema)
+            if pid is not None and schema is not None
+            else None
+        )
+        for chunk in reversed(chunks):
+            if pid_column is not None:
+                chunk = chunk.filter(polars.col(pid_column) == pid)  # noqa: PLW2901
+            if len(chunk) > 0:
+                return chunk.filter(polars.col('time') == chunk['time'].max())
+        return polars.DataFrame(schema=schema)
+
+    def task_intervals(self) -> polars.DataFrame:
+        """Return the start, end and final event of every task."""
+        with self.lock:
+            rows = [
+                (
+                    str(interval.task_id),
+                    *interval[1:4],
+                    None if interval.status is None else int(interval.status),
+                )
+                for interval in self.tracker.intervals()
+            ]
+        return polars.DataFrame(
+            rows,
+            schema={
+                'task_id': polars.String,
+                'pid': polars.Int64,
+                'start_time': polars.Datetime('us', 'UTC'),
+                'end_time': polars.Datetime('us', 'UTC'),
+                'status': polars.Int64,
+            },
+            orient='row',
+        )
+
+    def task_aggregate(
+        self,
+        stream: str,
+        task_id: str,
+        aggregates: Sequence[str] = ('mean', 'max'),
+    ) -> polars.DataFrame:
+        """Aggregate the rows of the processes of a task while it ran.
+
+        Rows are matched to the task by the pid column of the stream and the
+        start and end of the task on each of its processes. Tasks that have
+        not completed are aggregated up to the newest tick.
+
+        Args:
+            stream: Name of the stream.
+            task_id: Identifier of the task.
+            aggregates: Aggregations of every numeric column, e.g., "mean",
+                "min", "max" or "sum".
+
+        Returns:
+            One row per process of the task with a column per aggregate,
+            named `<column>_<aggregate>`, and the number of rows matched.
+        """
+        with self.lock:
+            intervals = [
+                interval
+                for interval in self.tracker.intervals()
+                if str(interval.task_id) == str(task_id)
+            ]
+
+        frames = []
+        for _, pid, start, end, *_ in intervals:
+            df = self.range(stream, start, end)
+            pid_column = _pid_column(df.schema)
+            frames.append(
+                df.filter(polars.col(pid_column) == pid).with_columns(
+                    polars.lit(pid).alias('_task_pid'),
+                ),
+            )
+        if not frames:
+            raise KeyError(f'Unknown task "{task_id}".')
+
+        df = polars.concat(frames, rechunk=False)
+        numeric = [
+            c
+            for c, dtype in df.schema.items()
+            if dtype.is_numeric() and not c.startswith('_task')
+        ]
+        return (
+            df.group_by('_task_pid', maintain_order=True)
+            .agg(
+                polars.len().alias('rows'),
+                *(
+                    getattr(polars.col(c), agg)().alias(f'{c}_{agg}')
+                    for c in numeric
+                    for agg in aggregates
+                ),
+            )
+            .rename({'_task_pid': 'pid'})
+        )
+
+
+def _pid_column(schema: polars.Schema) -> str:
+    for column in _PID_COLUMNS:
+        if column in schema:
+            return column
+    raise KeyError(f'No pid column in {list(schema)}.')
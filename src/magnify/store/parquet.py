@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import datetime
+import os
+import pathlib
+from collections.abc import Sequence
+from typing import Literal
+
+import numpy as np
+import polars
+
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_EXTENSIONS = {'parquet': 'parquet', 'ipc': 'arrow'}
+
+
+class _StreamBuffer:
+    """Ticks of one stream waiting to be written as a single part file.
+
+    The time of each tick is kept once, not per row, and the time column
+    is only built when the part is taken.
+    """
+
+    def __init__(
+        self,
+        directory: pathlib.Path,
+        extension: str,
+        time_column: None | str = 'time',
+    ):
+        self.directory = directory
+        self.extension = extension
+        self.time_column = time_column
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Continue numbering after parts written by previous runs
+        self.next_part = 1 + max(
+            (
+                int(path.stem.removeprefix('part-'))
+                for path in self.directory.glob(f'part-*.{extension}')
+            ),
+            default=-1,
+        )
+        self.columns: list[str] = []
+        self.frames: list[polars.DataFrame] = []
+        self.times: list[datetime.datetime] = []
+        self.rows = 0
+
+    def append(self, df: polars.DataFrame, time: datetime.datetime) -> None:
+        if not self.columns:
+            # The columns of a stream are fixed by its first tick
+            self.columns = df.columns
+        self.frames.append(df)
+        self.times.append(time)
+        self.rows += len(df)
+
+    def take(self) -> tuple[polars.DataFrame, pathlib.Path]:
+        # Relaxed so the dtypes of the ticks are widened to their supertype
+        # instead of casting later ticks to the dtypes of the first
+        df = polars.concat(self.frames, how='diagonal_relaxed')
+        df = df.select(
+            polars.col(c) if c in df.columns else polars.lit(None).alias(c)
+            for c in self.columns
+        )
+        if self.time_column is not None:
+            ticks = np.repeat(
+                np.arange(len(self.times)),
+                [len(f) for f in self.frames],
+            )
+            df = df.with_columns(
+                polars.Series(self.time_column, self.times).gather(ticks),
+            )
+        path = self.directory / f'part-{self.next_part:06d}.{self.extension}'
+        self.next_part += 1
+        self.frames = []
+        self.times = []
+        self.rows = 0
+        return df, path
+
+
+class ParquetStore(BaseStore):
+    """Store to write monitoring values to compressed columnar files.
+
+    Ticks of each stream are buffered in memory and written as one
+    compressed Parquet (or Arrow IPC) part file once the buffer holds
+    `max_rows` rows or its oldest tick is `max_interval` seconds old. Each
+    stream is written to its own directory, `<dir_name>/<stream>/part-*`,
+    which can be read lazily with `polars.scan_parquet` (or `scan_ipc`).
+    The columns of a stream are fixed by its first tick: missing columns
+    are null and new columns are dropped. The dtype of a column is the
+    supertype of its ticks in a part file, e.g., a column that is null on
+    the first tick takes the dtype of its later values.
+    Buffered ticks are written when the store is closed.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        dir_name: str | os.PathLike[str],
+        format: str = 'parquet',  # noqa: A002
+        compression: Literal['uncompressed', 'lz4', 'zstd'] = 'zstd',
+        max_rows: int = 100_000,
+        max_interval: float = 60.0,
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize a columnar store rooted at dir_name.
+
+        Args:
+            dir_name: Directory to write the streams to.
+            format: Either "parquet" or "ipc" (Arrow IPC).
+            compression: Compression codec, "zstd", "lz4" or
+                "uncompressed".
+            max_rows: Number of buffered rows of a stream that triggers a
+                write.
+            max_interval: Age in seconds of the oldest buffered tick of a
+                stream that triggers a write.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
+        super().__init__(filters=filters, includes=includes)
+
+        if format not in _EXTENSIONS:
+            raise ValueError(
+                f'Unknown format "{format}". Expected parquet or ipc.',
+            )
+        self.format = format
+        self.compression = compression
+        self.max_rows = max_rows
+        self.max_interval = max_interval
+        self.parent_dir = pathlib.Path(dir_name)
+        self.parent_dir.mkdir(parents=True, exist_ok=True)
+        self.buffers: dict[str, _StreamBuffer] = {}
+
+    def _buffer(self, stream: str) -> _StreamBuffer:
+        if stream not in self.buffers:
+            self.buffers[stream] = _StreamBuffer(
+                self.parent_dir / stream,
+                _EXTENSIONS[self.format],
+                # Task events have their own timestamp
+                None if stream == 'tasks' else 'time',
+            )
+        return self.buffers[stream]
+
+    def _write(self, buffer: _StreamBuffer) -> None:
+        df, path = buffer.take()
+        tmp_path = path.with_suffix('.tmp')
+        if self.format == 'parquet':
+            df.write_parquet(
+                tmp_path,
+                compression=self.compression,
+                row_group_size=self.max_rows,
+            )
+        else:
+            df.write_ipc(tmp_path, compression=self.compression)
+        # Rename so readers scanning the directory never see partial files
+        os.replace(tmp_path, path)
+
+    def _append(
+        self,
+        stream: str,
+        df: polars.DataFrame,
+        time: datetime.datetime,
+    ) -> None:
+        buffer = self._buffer(stream)
+        buffer.append(df, time)
+        if (
+            buffer.rows >= self.max_rows
+            or (time - buffer.times[0]).total_seconds() >= self.max_interval
+        ):
+            self._write(buffer)
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        for stream, timed_measurement in measurements.items():
+            measurement = timed_measurement.measurement
+            if isinstance(measurement, polars.DataFrame):
+                df = measurement
+            else:
+                df = polars.DataFrame({'value': [float(measurement)]})
+            self._append(stream, df, timed_measurement.time)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Buffer a task event to write to the tasks directory."""
+        df = polars.DataFrame(
+            {
+                'task_id': [str(task.task_id)],
+                'process_id': [task.pid],
+                'timestamp': [task.timestamp],
+                'event': [int(task.event)],
+                'host': polars.Series([task.host], dtype=polars.String),
+            },
+        )
+        self._append('tasks', df, task.timestamp)
+
+    def flush(self) -> None:
+        """Write all buffered ticks."""
+        for buffer in self.buffers.values():
+            if len(buffer.frames) > 0:
+                self._write(buffer)
+
+    def close(self) -> None:
+        """Write all buffered ticks."""
+        self.flush()
@@ -0,0 +1,539 @@
+from __future__ import annotations
+
+import collections
+import datetime
+import io
+import json
+import logging
+import math
+import socket
+import threading
+import time
+from collections.abc import Sequence
+from typing import Literal
+
+import polars
+import zmq
+from pydantic import AnyUrl
+
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.store.clock import ClockEstimator
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_HELLO = b'hello'
+_CREDIT = b'credit'
+_MEASUREMENTS = b'measurements'
+_TASK = b'task'
+_PING = b'ping'
+_PONG = b'pong'
+_SYNC = b'sync'
+# Pings sent back to back after connecting to get a first clock estimate
+_WARMUP_PINGS = 4
+
+logger = logging.getLogger(__name__)
+
+
+def encode_measurements(
+    measurements: dict[str, TimedMeasurement],
+    host: str,
+    compression: Literal['uncompressed', 'lz4', 'zstd'] = 'zstd',
+) -> list[bytes]:
+    """Frame the measurements of a tick to forward to an aggregator.
+
+    Returns:
+        A JSON header describing each stream followed by one compressed
+        Arrow IPC frame per DataFrame stream.
+    """
+    streams: list[dict[str, str | float]] = []
+    frames = []
+    for stream, timed_measurement in measurements.items():
+        entry: dict[str, str | float] = {
+            'stream': stream,
+            'time': timed_measurement.time.isoformat(),
+        }
+        measurement = timed_measurement.measurement
+        if isinstance(measurement, polars.DataFrame):
+            buffer = io.BytesIO()
+            measurement.write_ipc(buffer, compression=compression)
+            frames.append(buffer.getvalue())
+        else:
+            entry['value'] = float(measurement)
+        streams.append(entry)
+    header = {'host': host, 'streams': streams}
+    return [json.dumps(header).encode(), *frames]
+
+
+def decode_measurements(
+    frames: list[bytes],
+) -> tuple[str, dict[str, TimedMeasurement]]:
+    """Decode measurements framed by `encode_measurements()`.
+
+    Returns:
+        The host and the measurements of the tick.
+    """
+    header = json.loads(frames[0])
+    payloads = iter(frames[1:])
+    measurements = {}
+    for entry in header['streams']:
+        time = datetime.datetime.fromisoformat(entry['time'])
+        if 'value' in entry:
+            measurement = entry['value']
+        else:
+            measurement = polars.read_ipc(io.BytesIO(next(payloads)))
+        measurements[entry['stream']] = TimedMeasurement(time, measurement)
+    return header['host'], measurements
+
+
+class ForwardingStore(BaseStore):
+    """Store to forward measurements and tasks to a central aggregator.
+
+    Each tick is sent as one message over a ZMQ DEALER socket, with
+    DataFrame streams framed as compressed Arrow IPC, to an
+    [`Aggregator`][magnify.store.proxy.Aggregator] that writes them into
+    its own stores.
+
+    Sending is flow controlled by credits: the aggregator grants each node
+    a number of messages it may have in flight and returns credits as it
+    stores them. Without credit, messages wait in a queue of at most
+    `max_pending` messages and the oldest are dropped beyond that, so a
+    slow or unreachable aggregator never blocks the monitor. A node without
+    credit for `hello_interval` seconds introduces itself again, which
+    starts a new epoch: credits of earlier epochs, still on their way, are
+    ignored and the aggregator grants the full credits again, so a lost
+    credit message never starves the node.
+
+    Every `sync_interval` seconds the node pings the aggregator from a
+    background thread, which stamps the answer as soon as it arrives, so
+    the aggregator can estimate the offset of the clock of the node, see
+    [`ClockEstimator`][magnify.store.clock.ClockEstimator].
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        address: str | AnyUrl = 'tcp://localhost:5560',
+        host: None | str = None,
+        compression: Literal['uncompressed', 'lz4', 'zstd'] = 'zstd',
+        max_pending: int = 1024,
+        hello_interval: float = 5.0,
+        sync_interval: None | float = 10.0,
+        linger: float = 5.0,
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize a store forwarding to the aggregator at address.
+
+        Args:
+            address: Address the aggregator is bound to.
+            host: Name of this node. Defaults to the hostname.
+            compression: Compression of the Arrow IPC frames.
+            max_pending: Maximum number of messages waiting for credit.
+            hello_interval: Seconds without credit after which the node
+                introduces itself again, e.g., after the aggregator
+                restarted.
+            sync_interval: Seconds between clock synchronization pings.
+                Disabled if None.
+            linger: Seconds to wait for credit to send pending messages
+                when closing.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
+        super().__init__(filters=filters, includes=includes)
+
+        self.address = str(address)
+        self.host = socket.gethostname() if host is None else host
+        self.compression = compression
+        self.max_pending = max_pending
+        self.hello_interval = hello_interval
+        self.sync_interval = sync_interval
+        self.linger = linger
+
+        self.pending: collections.deque[list[bytes]] = collections.deque()
+        self.credits = 0
+        self.epoch = 0
+        self.sent = 0
+        self.dropped = 0
+        self.pongs = 0
+
+        # ZMQ sockets are not thread safe and tasks arrive on another thread
+        self.lock = threading.Lock()
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(self.address)
+        self._hello()
+
+        self.closed = threading.Event()
+        self.sync_thread: None | threading.Thread = None
+        if self.sync_interval is not None:
+            self.sync_thread = threading.Thread(
+                target=self._sync,
+                args=(self.sync_interval,),
+                daemon=True,
+            )
+            self.sync_thread.start()
+
+    def _hello(self) -> None:
+        self.epoch += 1
+        self.credits = 0
+        self.socket.send_multipart(
+            [_HELLO, self.host.encode(), str(self.epoch).encode()],
+        )
+        self.last_hello = time.monotonic()
+
+    def _sync(self, interval: float) -> None:
+        # Pings have their own socket and thread so the answer is stamped as
+        # soon as it arrives, not at the next tick
+        sync_socket = self.context.socket(zmq.DEALER)
+        sync_socket.setsockopt(zmq.LINGER, 0)
+        sync_socket.connect(self.address)
+        while not self.closed.is_set():
+            sent = time.time()
+            sync_socket.send_multipart([_PING, repr(sent).encode()])
+            deadline = time.monotonic() + interval
+            while not self.closed.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Wake up regularly to notice the store closing
+                if not sync_socket.poll(math.ceil(min(remaining, 0.1) * 1000)):
+                    continue
+                kind, *frames = sync_socket.recv_multipart()
+                received = time.time()
+                if kind != _PONG or float(frames[0]) != sent:
+                    # Answer to a ping that timed out
+                    continue
+                t1, t2, t3 = (float(f) for f in frames)
+                sync = {
+                    'host': self.host,
+                    'times': [t1, t2, t3, received],
+                }
+                sync_socket.send_multipart([_SYNC, json.dumps(sync).encode()])
+                self.pongs += 1
+                # Ping back to back after connecting, then every interval
+                if self.pongs >= _WARMUP_PINGS:
+                    self.closed.wait(max(deadline - time.monotonic(), 0))
+                break
+        sync_socket.close()
+
+    def _receive(self) -> None:
+        while self.socket.poll(0):
+            kind, *frames = self.socket.recv_multipart()
+            if kind == _CREDIT and int(frames[1]) == self.epoch:
+                self.credits += int(frames[0])
+
+    def _pump(self) -> None:
+        self._receive()
+        while self.credits > 0 and self.pending:
+            self.socket.send_multipart(self.pending.popleft())
+            self.credits -= 1
+            self.sent += 1
+
+        if (
+            self.pending
+            and self.credits == 0
+            and time.monotonic() - self.last_hello >= self.hello_interval
+        ):
+            self._hello()
+
+    def _send(self, message: list[bytes]) -> None:
+        with self.lock:
+            self.pending.append(message)
+            if len(self.pending) > self.max_pending:
+                self.pending.popleft()
+                self.dropped += 1
+            self._pump()
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        frames = encode_measurements(measurements, self.host, self.compression)
+        self._send([_MEASUREMENTS, *frames])
+
+    def put_task(self, task: TimedTask) -> None:
+        """Forward a task event to the aggregator."""
+        message = {
+            'host': self.host,
+            'task_id': task.task_id,
+            'pid': task.pid,
+            'timestamp': task.timestamp.isoformat(),
+            'event': int(task.event),
+        }
+        self._send([_TASK, json.dumps(message).encode()])
+
+    def close(self) -> None:
+        """Send pending messages while credit arrives, then disconnect."""
+        self.closed.set()
+        if self.sync_thread is not None:
+            self.sync_thread.join()
+        deadline = time.monotonic() + self.linger
+        with self.lock:
+            while self.pending and time.monotonic() < deadline:
+                self.socket.poll(100)
+                self._pump()
+            # Let messages already handed to ZMQ reach the aggregator
+            remaining = max(deadline - time.monotonic(), 0)
+            self.socket.setsockopt(zmq.LINGER, int(remaining * 1000))
+            self.socket.close()
+            self.context.term()
+
+
+class Aggregator:
+    """Process merging the streams forwarded by many nodes into stores.
+
+    Binds a ZMQ ROUTER socket that
+    [`ForwardingStore`s][magnify.store.proxy.ForwardingStore] connect to.
+    A `host` column with the name of the node is added to every DataFrame
+    stream, and float streams become one row frames with `value` and `host`
+    columns, so the streams of all nodes can share the same stores.
+
+    Every node may have `credits` messages in flight. A credit is returned
+    to a node once its message has been written to the stores, so nodes
+    slow down to the rate the stores can sustain. A node introducing
+    itself again starts a new epoch and is granted `credits` for it, while
+    the credits of the messages it sent before are returned in the old
+    epoch, which the node ignores, so a slow aggregator does not hand out
+    more. Nodes silent for `idle_timeout` seconds are forgotten.
+
+    A message that cannot be processed, e.g., malformed or failing in a
+    store, is logged and counted in `errors`, and still returns its credit.
+
+    The aggregator answers the clock synchronization pings of the nodes
+    and keeps a [`ClockEstimator`][magnify.store.clock.ClockEstimator] per
+    host. With `correct_clocks` set, the times of measurements and task
+    events are converted to the clock of the aggregator as they are
+    ingested. Every estimate is recorded in the `clock` stream with the
+    host, the offset (seconds to add to the times of the host), the drift
+    and the delay of the best exchange.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        stores: list[BaseStore],
+        address: str | AnyUrl = 'tcp://*:5560',
+        credits: int = 16,  # noqa: A002
+        correct_clocks: bool = True,
+        clock_window: int = 64,
+        poll_interval: float = 0.1,
+        idle_timeout: float = 600.0,
+    ):
+        """Initialize an aggregator writing to stores.
+
+        Args:
+            stores: Stores to write the merged streams to.
+            address: Address to bind to.
+            credits: Number of messages each node may have in flight.
+            correct_clocks: Correct the times of the nodes to the clock of
+                the aggregator.
+            clock_window: Number of recent pings to estimate the clock of
+                a node from.
+            poll_interval: Seconds between checks of the kill event.
+            idle_timeout: Seconds after the last message of a node after
+                which its epoch is forgotten.
+        """
+        self.stores = stores
+        self.address = str(address)
+        self.credits = credits
+        self.correct_clocks = correct_clocks
+        self.clock_window = clock_window
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.clocks: dict[str, ClockEstimator] = {}
+
+        self.kill_event = threading.Event()
+        self.started = False
+        self.ready = threading.Event()
+        self.hosts: dict[str, int] = collections.Counter()
+        # Current epoch and time of the last message of each node
+        self.epochs: dict[bytes, int] = {}
+        self.last_seen: dict[bytes, float] = {}
+        self.messages = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def _correct(
+        self,
+        host: str,
+        time_: datetime.datetime,
+    ) -> datetime.datetime:
+        clock = self.clocks.get(host)
+        if not self.correct_clocks or clock is None:
+            return time_
+        return clock.correct(time_)
+
+    def synchronize(self, host: str, times: list[float]) -> None:
+        """Add a ping exchange of a host and record the new estimate.
+
+        Args:
+            host: Host that sent the ping.
+            times: Times the ping was sent, received, answered and the
+                answer received.
+        """
+        if host not in self.clocks:
+            self.clocks[host] = ClockEstimator(self.clock_window)
+        clock = self.clocks[host]
+        clock.add(*times)
+
+        now = datetime.datetime.now(datetime.UTC)
+        record = polars.DataFrame(
+            {
+                'host': [host],
+                'offset': [clock.offset_at(now.timestamp())],
+                'drift': [clock.drift],
+                'delay': [clock.delay],
+                'corrected': [self.correct_clocks],
+            },
+        )
+        for store in self.stores:
+            store.put_measurement({'clock': TimedMeasurement(now, record)})
+
+    def process(self, kind: bytes, frames: list[bytes]) -> None:
+        """Write one message from a node to the stores.
+
+        Raises:
+            ValueError: If the kind of message is unknown.
+        """
+        if kind == _SYNC:
+            message = json.loads(frames[0])
+            self.synchronize(message['host'], message['times'])
+            return
+
+        if kind == _TASK:
+            message = json.loads(frames[0])
+            host = message.pop('host')
+            message['timestamp'] = self._correct(
+                host,
+                datetime.datetime.fromisoformat(message['timestamp']),
+            )
+            task = TimedTask(**message, host=host)
+            for store in self.stores:
+                store.put_task(task)
+        elif kind == _MEASUREMENTS:
+            host, measurements = decode_measurements(frames)
+            tagged = {}
+            for stream, (time_, measurement) in measurements.items():
+                if isinstance(measurement, polars.DataFrame):
+                    df = measurement.with_columns(
+                        polars.lit(host).alias('host'),
+                    )
+                else:
+                    df = polars.DataFrame(
+                        {'value': [measurement], 'host': [host]},
+                    )
+                tagged[stream] = TimedMeasurement(
+                    self._correct(host, time_),
+                    df,
+                )
+            for store in self.stores:
+                store.put_measurement(tagged)
+        else:
+            raise ValueError(f'Unknown message kind {kind!r}.')
+        self.hosts[host] += 1
+
+    def _handle(
+        self,
+        router: zmq.Socket[bytes],
+        identity: bytes,
+        message: list[bytes],
+        received: float,
+        returned: dict[bytes, int],
+    ) -> None:
+        kind, *frames = message
+        self.last_seen[identity] = received
+        if kind == _HELLO:
+            # Messages sent before the hello were handled before it, and
+            # their credits belong to the epoch the node left
+            self.epochs[identity] = int(frames[1])
+            returned[identity] = self.credits
+        elif kind == _PING:
+            router.send_multipart(
+                [
+                    identity,
+                    _PONG,
+                    frames[0],
+                    repr(received).encode(),
+                    repr(time.time()).encode(),
+                ],
+            )
+        elif kind == _SYNC:
+            self.process(kind, frames)
+        else:
+            # The credit used by the message is returned even if it fails.
+            # Nodes not seen to introduce themselves will do so again.
+            if identity in self.epochs:
+                returned[identity] += 1
+            self.process(kind, frames)
+
+    def _expire(self, now: float) -> None:
+        for identity, last_seen in list(self.last_seen.items()):
+            if now - last_seen > self.idle_timeout:
+                del self.last_seen[identity]
+                self.epochs.pop(identity, None)
+
+    def run(self) -> None:
+        """Receive and store messages until the kill event is set."""
+        context = zmq.Context()
+        router = context.socket(zmq.ROUTER)
+        router.setsockopt(zmq.LINGER, 0)
+        router.bind(self.address)
+        self.ready.set()
+
+        while not self.kill_event.is_set():
+            self._expire(time.time())
+            if not router.poll(math.ceil(self.poll_interval * 1000)):
+                continue
+
+            # Drain what arrived, then return the credits in one message
+            # per node
+            returned: dict[bytes, int] = collections.Counter()
+            while router.poll(0) and not self.kill_event.is_set():
+                identity, *message = router.recv_multipart(copy=True)
+                received = time.time()
+                self.messages += 1
+                self.bytes += sum(len(f) for f in message)
+                try:
+                    self._handle(router, identity, message, received, returned)
+                except Exception:
+                    self.errors += 1
+                    logger.exception(
+                        'Failed to process a message from node %r.',
+                        identity,
+                    )
+
+            for identity, count in returned.items():
+                if count > 0 and identity in self.epochs:
+                    epoch = str(self.epochs[identity]).encode()
+                    router.send_multipart(
+                        [identity, _CREDIT, str(count).encode(), epoch],
+                    )
+
+        router.close()
+        context.term()
+
+    def start(self) -> None:
+        """Start receiving messages on a thread."""
+        if self.started:
+            raise Exception('Cannot start previously started aggregator')
+
+        self.started = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def wait(self) -> None:
+        """Wait for the aggregator to stop."""
+        if not self.started:
+            return
+        self.thread.join()
+
+    def shutdown(self) -> None:
+        """Stop receiving messages and wait for the thread to end."""
+        self.kill_event.set()
+        self.wait()
+        self.kill_event.clear()
+        self.ready.clear()
+        self.started = False
+
+    def close(self) -> None:
+        """Close the stores."""
+        for store in self.stores:
+            store.flush_filters()
+            store.close()
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import datetime
+import json
+import os
+import struct
+import threading
+from collections.abc import Iterator
+from collections.abc import Sequence
+from typing import BinaryIO
+from typing import Literal
+
+from magnify.client import TaskEvent
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.store.proxy import decode_measurements
+from magnify.store.proxy import encode_measurements
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_MAGIC = b'MAGREC01'
+_TICK = 1
+_TASK = 2
+# Kind and number of frames of a record, then the length of each frame
+_RECORD = struct.Struct('<BH')
+_FRAME = struct.Struct('<I')
+
+
+def _read_frames(
+    fp: BinaryIO,
+    first_only: bool = False,
+) -> None | tuple[int, list[bytes]]:
+    head = fp.read(_RECORD.size)
+    if len(head) < _RECORD.size:
+        return None
+    kind, count = _RECORD.unpack(head)
+    frames = []
+    for i in range(count):
+        size = fp.read(_FRAME.size)
+        if len(size) < _FRAME.size:
+            return None
+        (length,) = _FRAME.unpack(size)
+        if first_only and i > 0:
+            fp.seek(length, os.SEEK_CUR)
+            continue
+        frame = fp.read(length)
+        if len(frame) < length:
+            return None
+        frames.append(frame)
+    return kind, frames
+
+
+def _open(path: str | os.PathLike[str]) -> BinaryIO:
+    fp = open(path, 'rb')  # noqa: SIM115
+    if fp.read(len(_MAGIC)) != _MAGIC:
+        fp.close()
+        raise ValueError(f'{path} is not a recording.')
+    return fp
+
+
+def recording_streams(path: str | os.PathLike[str]) -> list[str]:
+    """List the streams of a recording without decoding the measurements.
+
+    Returns:
+        Names of the streams in the order they first appear.
+
+    Raises:
+        ValueError: If the file is not a recording.
+    """
+    streams: dict[str, None] = {}
+    with _open(path) as fp:
+        while (record := _read_frames(fp, first_only=True)) is not None:
+            kind, frames = record
+            if kind == _TICK:
+                header = json.loads(frames[0])
+                streams.update(
+                    dict.fromkeys(e['stream'] for e in header['streams']),
+                )
+    return list(streams)
+
+
+def read_recording(
+    path: str | os.PathLike[str],
+) -> Iterator[dict[str, TimedMeasurement] | TimedTask]:
+    """Read the ticks and task events of a recording in order.
+
+    A record cut short, e.g., by a crash of the recording monitor, ends
+    the recording.
+
+    Yields:
+        The measurements of a tick, or a task event.
+
+    Raises:
+        ValueError: If the file is not a recording.
+    """
+    with _open(path) as fp:
+        while (record := _read_frames(fp)) is not None:
+            kind, frames = record
+            if kind == _TICK:
+                _, measurements = decode_measurements(frames)
+                yield measurements
+            elif kind == _TASK:
+                task = json.loads(frames[0])
+                yield TimedTask(
+                    task['task_id'],
+                    task['pid'],
+                    datetime.datetime.fromisoformat(task['timestamp']),
+                    TaskEvent(task['event']),
+                )
+
+
+class RecordingStore(BaseStore):
+    """Store recording ticks and task events to a binary log to replay.
+
+    Each tick is appended as one record holding the measurements of every
+    stream, with DataFrame streams framed as compressed Arrow IPC like
+    the [`ForwardingStore`][magnify.store.proxy.ForwardingStore], and each
+    task event as one record in between. Without filters the raw output of
+    the sensors is recorded, which can be fed back through the filters and
+    stores of a monitor with a
+    [`Recording`][magnify.sensor.replay.Recording].
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        compression: Literal['uncompressed', 'lz4', 'zstd'] = 'zstd',
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize a store recording to path.
+
+        Args:
+            path: File to write the recording to, replaced if it exists.
+            compression: Compression of the Arrow IPC frames, "zstd", "lz4"
+                or "uncompressed".
+            filters: Filters to apply before recording measurements.
+            includes: Streams to record.
+        """
+        super().__init__(filters=filters, includes=includes)
+        self.path = path
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.fp: None | BinaryIO = open(path, 'wb')  # noqa: SIM115
+        self.fp.write(_MAGIC)
+
+    def _write(self, kind: int, frames: list[bytes]) -> None:
+        with self.lock:
+            if self.fp is None:
+                raise ValueError('Recording store is closed.')
+            self.fp.write(_RECORD.pack(kind, len(frames)))
+            for frame in frames:
+                self.fp.write(_FRAME.pack(len(frame)))
+                self.fp.write(frame)
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        frames = encode_measurements(measurements, '', self.compression)
+        self._write(_TICK, frames)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Record a task event."""
+        message = {
+            'task_id': task.task_id,
+            'pid': task.pid,
+            'timestamp': task.timestamp.isoformat(),
+            'event': int(task.event),
+        }
+        self._write(_TASK, [json.dumps(message).encode()])
+
+    def flush(self) -> None:
+        """Flush the records written so far to the file."""
+        with self.lock:
+            if self.fp is not None:
+                self.fp.flush()
+
+    def close(self) -> None:
+        """Close the file of the recording."""
+        with self.lock:
+            if self.fp is not None:
+                self.fp.close()
+                self.fp = None
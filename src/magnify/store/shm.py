@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import json
+import math
+import mmap
+import os
+import pathlib
+import struct
+import time
+from collections.abc import Sequence
+
+import numpy as np
+import polars
+
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_MAGIC = b'MAGNIFY1'
+_HEADER_SIZE = 4096
+# Magic, number of columns, capacity in rows, sequence and rows written
+_HEADER = struct.Struct('<8sQQQQ')
+_SEQUENCE_OFFSET = 24
+_NAMES_OFFSET = _HEADER.size
+# Seconds to wait between reads that overlap a write, doubled up to the max
+_RETRY_DELAY = 1e-5
+_RETRY_DELAY_MAX = 1e-3
+
+
+def _ring_path(
+    directory: str | os.PathLike[str],
+    name: str,
+    stream: str,
+) -> pathlib.Path:
+    return pathlib.Path(directory) / f'{name}-{stream}'
+
+
+class _Ring:
+    """Columns of a stream in a memory-mapped ring buffer.
+
+    The file starts with a header page holding the layout, a sequence
+    counter and the number of rows ever written, followed by one float64
+    array of `capacity` values per column. The writer makes the sequence
+    odd while it updates the ring and even when done, so readers can
+    detect, and retry, reads that overlapped a write.
+    """
+
+    def __init__(self, path: pathlib.Path, columns: list[str], capacity: int):
+        names = json.dumps(columns).encode()
+        if _NAMES_OFFSET + 4 + len(names) > _HEADER_SIZE:
+            raise ValueError(f'Too many columns to map {path}.')
+
+        self.path = path
+        self.columns = columns
+        self.capacity = capacity
+        size = _HEADER_SIZE + 8 * capacity * len(columns)
+
+        # Write to a new file and rename it so readers never map a file
+        # without a header
+        tmp_path = path.with_name(f'.{path.name}.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.truncate(size)
+            f.write(_HEADER.pack(_MAGIC, len(columns), capacity, 0, 0))
+            f.write(struct.pack('<I', len(names)) + names)
+        self.file = open(tmp_path, 'r+b')  # noqa: SIM115
+        self.map = mmap.mmap(self.file.fileno(), size)
+        os.replace(tmp_path, path)
+
+        # sequence and rows written
+        self.state = np.ndarray(
+            (2,),
+            dtype=np.uint64,
+            buffer=self.map,
+            offset=_SEQUENCE_OFFSET,
+        )
+        self.data = np.ndarray(
+            (len(columns), capacity),
+            dtype=np.float64,
+            buffer=self.map,
+            offset=_HEADER_SIZE,
+        )
+
+    def write(self, values: np.ndarray) -> None:
+        """Append the rows of a (columns, rows) array."""
+        rows = values.shape[1]
+        if rows > self.capacity:
+            values = values[:, -self.capacity :]
+            rows = self.capacity
+
+        written = int(self.state[1])
+        start = written % self.capacity
+        first = min(rows, self.capacity - start)
+
+        self.state[0] += 1
+        self.data[:, start : start + first] = values[:, :first]
+        self.data[:, : rows - first] = values[:, first:]
+        self.state[1] = written + rows
+        self.state[0] += 1
+
+    def close(self, unlink: bool) -> None:
+        del self.state, self.data
+        self.map.close()
+        self.file.close()
+        if unlink:
+            self.path.unlink(missing_ok=True)
+
+
+class SharedMemoryStore(BaseStore):
+    """Store keeping the latest rows of each stream in shared memory.
+
+    Each stream is written to a ring buffer of `capacity` rows in a
+    memory-mapped file, `<directory>/<name>-<stream>`, that other processes
+    read with [`SharedMemoryReader`][magnify.store.shm.SharedMemoryReader]
+    without any calls into the monitor. Rows are stored in a fixed
+    columnar layout of float64 values: a `time` column (seconds since the
+    epoch) followed by the numeric columns of the first tick of the stream
+    or `value` for float streams. Other columns are dropped, and columns
+    missing from later ticks are NaN.
+
+    The ring holds rows, not ticks: a process table adds a row per process
+    each tick. To keep the last `seconds` instead, each ring is sized from
+    the first tick of its stream, `ceil(seconds / interval)` ticks of as
+    many rows as that tick. Streams whose tables grow later keep fewer
+    seconds.
+
+    Task events are not stored.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        name: str = 'magnify',
+        directory: str | os.PathLike[str] = '/dev/shm',
+        capacity: int = 65536,
+        seconds: None | float = None,
+        interval: float = 1.0,
+        unlink: bool = True,
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize a shared memory store.
+
+        Args:
+            name: Prefix of the files of the streams.
+            directory: Directory to create the files in, a tmpfs so the
+                rings are only kept in memory.
+            capacity: Number of rows kept for each stream. Ignored if
+                seconds is set.
+            seconds: Seconds of ticks kept for each stream.
+            interval: Seconds between the ticks of the monitor, used to
+                size the rings when seconds is set.
+            unlink: Remove the files when the store is closed.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
+        super().__init__(filters=filters, includes=includes)
+
+        self.name = name
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.capacity = capacity
+        self.seconds = seconds
+        self.interval = interval
+        self.unlink = unlink
+        self.rings: dict[str, _Ring] = {}
+
+    def _ring(self, stream: str, df: polars.DataFrame) -> _Ring:
+        if stream not in self.rings:
+            columns = [
+                c
+                for c, dtype in df.schema.items()
+                if c != 'time'
+                and (dtype.is_numeric() or dtype == polars.Boolean)
+            ]
+            capacity = self.capacity
+            if self.seconds is not None:
+                ticks = math.ceil(self.seconds / self.interval)
+                capacity = ticks * max(len(df), 1)
+            self.rings[stream] = _Ring(
+                _ring_path(self.directory, self.name, stream),
+                ['time', *columns],
+                capacity,
+            )
+        return self.rings[stream]
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        for stream, timed_measurement in measurements.items():
+            measurement = timed_measurement.measurement
+            if isinstance(measurement, polars.DataFrame):
+                df = measurement
+            else:
+                df = polars.DataFrame({'value': [float(measurement)]})
+
+            ring = self._ring(stream, df)
+            timestamp = timed_measurement.time.timestamp()
+            values = df.select(
+                polars.lit(timestamp, dtype=polars.Float64).alias('time'),
+                *(
+                    polars.col(c).cast(polars.Float64, strict=False)
+                    if c in df.columns
+                    else polars.lit(float('nan')).alias(c)
+                    for c in ring.columns[1:]
+                ),
+            )
+            ring.write(values.to_numpy().T)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Ignore task events."""
+        pass
+
+    def close(self) -> None:
+        """Unmap the rings, removing their files if unlink is set."""
+        for ring in self.rings.values():
+            ring.close(self.unlink)
+        self.rings.clear()
+
+
+class SharedMemoryReader:
+    """Read-only view of a stream written by a `SharedMemoryStore`.
+
+    Example:
+        ```python
+        >>> reader = SharedMemoryReader('psutil')
+        >>> latest = reader.window(5)
+        >>> latest['psutil_process_cpu_percent'].sum()
+        ```
+    """
+
+    def __init__(
+        self,
+        stream: str,
+        name: str = 'magnify',
+        directory: str | os.PathLike[str] = '/dev/shm',
+    ):
+        """Map the ring of a stream.
+
+        Args:
+            stream: Name of the stream.
+            name: Prefix of the files of the store.
+            directory: Directory of the files of the store.
+
+        Raises:
+            FileNotFoundError: If the stream has not been written yet.
+            ValueError: If the file is not a ring of a shared memory store.
+        """
+        self.path = _ring_path(directory, name, stream)
+        with open(self.path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, ncolumns, capacity, _, _ = _HEADER.unpack_from(self.map)
+        if magic != _MAGIC:
+            raise ValueError(f'{self.path} is not a shared memory ring.')
+        (length,) = struct.unpack_from('<I', self.map, _NAMES_OFFSET)
+        start = _NAMES_OFFSET + 4
+        self.columns: list[str] = json.loads(self.map[start : start + length])
+        self.capacity = capacity
+
+        self._state = np.ndarray(
+            (2,),
+            dtype=np.uint64,
+            buffer=self.map,
+            offset=_SEQUENCE_OFFSET,
+        )
+        self.data = np.ndarray(
+            (ncolumns, capacity),
+            dtype=np.float64,
+            buffer=self.map,
+            offset=_HEADER_SIZE,
+        )
+
+    @property
+    def written(self) -> int:
+        """Number of rows ever written to the stream."""
+        return int(self._state[1])
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a zero-copy view of the ring of a column.
+
+        The view is in ring order and may change while it is read, use
+        [`latest()`][magnify.store.shm.SharedMemoryReader.latest] for a
+        consistent copy.
+        """
+        return self.data[self.columns.index(name)]
+
+    def latest(
+        self,
+        rows: None | int = None,
+        timeout: float = 1.0,
+    ) -> dict[str, np.ndarray]:
+        """Return a consistent copy of the latest rows, oldest first.
+
+        Args:
+            rows: Number of rows to return. All rows in the ring if None.
+            timeout: Seconds to retry reads that overlap a write.
+
+        Raises:
+            TimeoutError: If no read completed without overlapping a write.
+        """
+        deadline = time.monotonic() + timeout
+        delay = _RETRY_DELAY
+        while True:
+            sequence = int(self._state[0])
+            written = int(self._state[1])
+            if sequence % 2 == 0:
+                count = min(written, self.capacity)
+                if rows is not None:
+                    count = min(count, rows)
+                index = np.arange(written - count, written) % self.capacity
+                values = self.data[:, index]
+                if int(self._state[0]) == sequence:
+                    return dict(zip(self.columns, values))
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Could not read {self.path}.')
+            # Back off so a reader does not compete with the writer
+            time.sleep(delay)
+            delay = min(delay * 2, _RETRY_DELAY_MAX)
+
+    def window(self, seconds: float) -> dict[str, np.ndarray]:
+        """Return the rows of the last seconds, relative to the newest."""
+        latest = self.latest()
+        times = latest['time']
+        if len(times) == 0:
+            return latest
+        keep = times >= times[-1] - seconds
+        return {name: values[keep] for name, values in latest.items()}
+
+    def close(self) -> None:
+        """Unmap the ring."""
+        del self._state, self.data
+        self.map.close()
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import datetime
+import itertools
+import os
+import sqlite3
+import threading
+from collections.abc import Iterable
+from collections.abc import Sequence
+from typing import Any
+
+import polars
+
+from magnify.client import TaskEvent
+from magnify.filters.base import BaseFilter
+from magnify.store.base import BaseStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_PID_COLUMNS = ('pid', 'psutil_process_pid')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS measurements (
+    stream TEXT NOT NULL,
+    time REAL NOT NULL,
+    pid INTEGER,
+    value REAL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS measurements_stream_time
+    ON measurements (stream, time);
+CREATE INDEX IF NOT EXISTS measurements_pid ON measurements (pid, time);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    host TEXT NOT NULL DEFAULT '',
+    start_time REAL,
+    end_time REAL,
+    status INTEGER,
+    PRIMARY KEY (host, task_id, pid)
+);
+CREATE INDEX IF NOT EXISTS tasks_host_pid ON tasks (host, pid);
+CREATE INDEX IF NOT EXISTS tasks_host_time
+    ON tasks (host, start_time, end_time);
+'''
+# Tasks tables of databases created before the host column
+_MIGRATE_TASKS = '''
+DROP INDEX IF EXISTS tasks_pid;
+DROP INDEX IF EXISTS tasks_time;
+ALTER TABLE tasks RENAME TO tasks_without_host;
+'''
+_COPY_TASKS = '''
+INSERT INTO tasks (task_id, pid, start_time, end_time, status)
+SELECT task_id, pid, start_time, end_time, status FROM tasks_without_host;
+DROP TABLE tasks_without_host;
+'''
+
+_INSERT_MEASUREMENT = '''
+INSERT INTO measurements (stream, time, pid, value, data)
+VALUES (?, ?, ?, ?, ?)
+'''
+_UPSERT_START = '''
+INSERT INTO tasks (task_id, pid, host, start_time) VALUES (?, ?, ?, ?)
+ON CONFLICT (host, task_id, pid) DO UPDATE
+SET start_time = excluded.start_time
+'''
+_UPSERT_END = '''
+INSERT INTO tasks (task_id, pid, host, end_time, status)
+VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (host, task_id, pid) DO UPDATE
+SET end_time = excluded.end_time, status = excluded.status
+'''
+
+
+def _timestamp(time: datetime.datetime) -> float:
+    # Naive times are assumed to be in UTC
+    if time.tzinfo is None:
+        time = time.replace(tzinfo=datetime.UTC)
+    return time.timestamp()
+
+
+class SqliteStore(BaseStore):
+    """Store to write monitoring values to a SQLite database.
+
+    All streams are written to the `measurements` table with the stream
+    name, the time as seconds since the epoch and the pid of the row if the
+    stream has a pid column. Float streams set `value`, each row of a
+    DataFrame stream is stored as a JSON object in `data`, which can be
+    queried with the SQLite JSON functions, e.g.,
+    `data ->> 'psutil_process_memory_resident'`.
+
+    Task events are joined into one row per task and process in the `tasks`
+    table with the start and end times and the final event (`status`).
+    Tasks forwarded by an aggregator are kept apart by their `host`, which
+    is empty for local tasks.
+
+    The database uses write-ahead logging so readers can query it while the
+    monitor is running, and all rows of a tick are inserted in a single
+    transaction.
+    """
+
+    def __init__(
+        self,
+        db_path: str | os.PathLike[str],
+        filters: Sequence[BaseFilter] = (),
+        includes: None | set[str] = None,
+    ):
+        """Initialize a store writing to the database at db_path.
+
+        Args:
+            db_path: Path of the database. Created if it does not exist.
+            filters: Filters to apply before storing measurements.
+            includes: Streams to store.
+        """
+        super().__init__(filters=filters, includes=includes)
+
+        self.db_path = db_path
+        # Measurements and tasks are written from different threads
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        columns = {
+            row[1]
+            for row in self.connection.execute('PRAGMA table_info(tasks)')
+        }
+        migrate = len(columns) > 0 and 'host' not in columns
+        if migrate:
+            self.connection.executescript(_MIGRATE_TASKS)
+        self.connection.executescript(_SCHEMA)
+        if migrate:
+            self.connection.executescript(_COPY_TASKS)
+
+    def _rows(
+        self,
+        stream: str,
+        timed_measurement: TimedMeasurement,
+    ) -> Iterable[tuple[Any, ...]]:
+        time = _timestamp(timed_measurement.time)
+        measurement = timed_measurement.measurement
+        if not isinstance(measurement, polars.DataFrame):
+            return [(stream, time, None, float(measurement), None)]
+
+        pid_column = next(
+            (c for c in _PID_COLUMNS if c in measurement.columns),
+            None,
+        )
+        pids = (
+            measurement[pid_column].to_list()
+            if pid_column is not None
+            else itertools.repeat(None)
+        )
+        data = measurement.select(
+            polars.struct(polars.all()).struct.json_encode(),
+        ).to_series()
+        return zip(
+            itertools.repeat(stream),
+            itertools.repeat(time),
+            pids,
+            itertools.repeat(None),
+            data.to_list(),
+        )
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        rows = itertools.chain.from_iterable(
+            self._rows(stream, timed_measurement)
+            for stream, timed_measurement in measurements.items()
+        )
+        with self.lock, self.connection:
+            self.connection.executemany(_INSERT_MEASUREMENT, rows)
+
+    def put_task(self, task: TimedTask) -> None:
+        """Record the start or end of a task."""
+        time = _timestamp(task.timestamp)
+        task_id = str(task.task_id)
+        host = task.host or ''
+        with self.lock, self.connection:
+            if task.event == TaskEvent.START:
+                self.connection.execute(
+                    _UPSERT_START,
+                    (task_id, task.pid, host, time),
+                )
+            else:
+                self.connection.execute(
+                    _UPSERT_END,
+                    (task_id, task.pid, host, time, int(task.event)),
+                )
+
+    def query(
+        self,
+        sql: str,
+        parameters: tuple[Any, ...] = (),
+    ) -> polars.DataFrame:
+        """Run a query against the database.
+
+        Example:
+            ```python
+            >>> store.query(
+            ...     'SELECT * FROM tasks '
+            ...     'WHERE start_time < ? AND end_time > ?',
+            ...     (t2, t1),
+            ... )
+            ```
+
+        Returns:
+            The result as a DataFrame.
+        """
+        with self.lock:
+            cursor = self.connection.execute(sql, parameters)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        return polars.DataFrame(
+            rows,
+            schema=columns,
+            orient='row',
+            infer_schema_length=None,
+        )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import collections
+import logging
+import threading
+import time
+from typing import Any
+from typing import Literal
+
+from magnify.filters.chain import FilterChain
+from magnify.store.base import BaseStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+# Queued items are tagged with their kind
+_Item = (
+    tuple[Literal['measurement'], dict[str, TimedMeasurement]]
+    | tuple[Literal['task'], TimedTask]
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncStore(BaseStore):
+    """Store that hands writes to another store on a writer thread.
+
+    Measurements are filtered by the chain of the wrapped store on the
+    calling thread, so stateful filters still see every tick in order, and
+    the filtered measurements and tasks are put on a bounded queue. A
+    writer thread drains the queue into the wrapped store, so a slow disk
+    delays the writes instead of the sampling loop.
+
+    When the queue is full, the `policy` decides what happens:
+
+    - `block`: wait for the writer to make room.
+    - `drop_oldest`: discard the oldest queued item to make room.
+    - `drop_newest`: discard the item being put.
+
+    Items the wrapped store fails to write are logged and counted in
+    `write_failures`, and the writer moves on to the next item.
+
+    Metrics of the queue are available as attributes and from
+    [`metrics()`][magnify.store.writer.AsyncStore.metrics].
+    """
+
+    def __init__(
+        self,
+        store: BaseStore,
+        max_size: int = 1024,
+        policy: str = 'block',
+    ):
+        """Initialize a store writing to store on a writer thread.
+
+        Args:
+            store: Store to write to.
+            max_size: Maximum number of queued measurements and tasks.
+            policy: What to do when the queue is full. One of "block",
+                "drop_oldest" or "drop_newest".
+        """
+        if policy not in _POLICIES:
+            raise ValueError(
+                f'Unknown policy "{policy}". Expected one of {_POLICIES}.',
+            )
+        if max_size < 1:
+            raise ValueError('Queue size must be at least 1.')
+
+        self.store = store
+        self.filters = store.filters
+        self.includes = store.includes
+        self.max_size = max_size
+        self.policy = policy
+
+        self.queue: collections.deque[_Item] = collections.deque()
+        self._condition = threading.Condition()
+        self._writing = False
+        self._closed = False
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.write_failures = 0
+        self.max_depth = 0
+        self.enqueue_seconds_total = 0.0
+        self.enqueue_seconds_max = 0.0
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+        self._writer.start()
+
+    @property
+    def chain(self) -> FilterChain:
+        """Filter chain of the wrapped store."""
+        return self.store.chain
+
+    @chain.setter
+    def chain(self, chain: FilterChain) -> None:
+        self.store.chain = chain
+
+    @property
+    def depth(self) -> int:
+        """Number of measurements and tasks waiting to be written."""
+        return len(self.queue)
+
+    def metrics(self) -> dict[str, Any]:
+        """Return the metrics of the queue."""
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'written': self.written,
+            'write_failures': self.write_failures,
+            'enqueue_seconds_mean': (
+                self.enqueue_seconds_total / self.enqueued
+                if self.enqueued > 0
+                else 0.0
+            ),
+            'enqueue_seconds_max': self.enqueue_seconds_max,
+        }
+
+    def _enqueue(self, item: _Item) -> None:
+        start = time.perf_counter()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Cannot put to a closed store.')
+
+            if len(self.queue) >= self.max_size:
+                if self.policy == 'block':
+                    self._condition.wait_for(
+                        lambda: len(self.queue) < self.max_size
+                        or self._closed,
+                    )
+                    if self._closed:
+                        raise RuntimeError('Cannot put to a closed store.')
+                elif self.policy == 'drop_oldest':
+                    self.queue.popleft()
+                    self.dropped += 1
+                else:
+                    self.dropped += 1
+                    return
+
+            self.queue.append(item)
+            self.enqueued += 1
+            self.max_depth = max(self.max_depth, len(self.queue))
+            self._condition.notify_all()
+
+            # Measurements and tasks are put from different threads
+            elapsed = time.perf_counter() - start
+            self.enqueue_seconds_total += elapsed
+            self.enqueue_seconds_max = max(self.enqueue_seconds_max, elapsed)
+
+    def _write_loop(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self.queue or self._closed)
+                if not self.queue:
+                    return
+                item = self.queue.popleft()
+                self._writing = True
+                self._condition.notify_all()
+
+            try:
+                if item[0] == 'task':
+                    self.store.put_task(item[1])
+                else:
+                    self.store._put(item[1])
+            except Exception:
+                # Keep writing later items, the failure is logged and counted
+                failed = True
+                logger.exception(
+                    'Failed to write a %s to %s.',
+                    item[0],
+                    type(self.store).__name__,
+                )
+            else:
+                failed = False
+
+            with self._condition:
+                if failed:
+                    self.write_failures += 1
+                else:
+                    self.written += 1
+                self._writing = False
+                self._condition.notify_all()
+
+    def _put(self, measurements: dict[str, TimedMeasurement]) -> None:
+        self._enqueue(('measurement', measurements))
+
+    def put_task(self, task: TimedTask) -> None:
+        """Queue a task to be written."""
+        self._enqueue(('task', task))
+
+    def flush(self, timeout: None | float = None) -> bool:
+        """Wait for the queued items to be written.
+
+        Args:
+            timeout: Maximum number of seconds to wait. Waits indefinitely
+                if None.
+
+        Returns:
+            True if the queue was drained, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self.queue and not self._writing,
+                timeout,
+            )
+
+    def close(self) -> None:
+        """Write the queued items and close the wrapped store."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._writer.join()
+        self.store.close()
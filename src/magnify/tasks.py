@@ -0,0 +1,349 @@
+"""Pair task events into intervals and index them by process."""
+
+from __future__ import annotations
+
+import collections
+import datetime
+import heapq
+import itertools
+import math
+import random
+from collections.abc import Iterator
+from typing import Any
+from typing import NamedTuple
+
+from magnify.client import TaskEvent
+from magnify.types import TimedTask
+
+
+class TaskInterval(NamedTuple):
+    """Time a task ran on a process.
+
+    `start_time` is None if the start of the task was not seen, and
+    `end_time` and `status` are None if the task has not ended, or its
+    start expired before an end was seen. `host` is the node of the task
+    events, None for local events.
+    """
+
+    task_id: Any
+    pid: int
+    start_time: None | datetime.datetime
+    end_time: None | datetime.datetime
+    status: None | TaskEvent
+    host: None | str = None
+
+
+# Start time and arrival counter of an interval, unique within an index
+_Key = tuple[float, int]
+# Host and pid of a process
+_Process = tuple[None | str, int]
+
+
+class _Node:
+    __slots__ = (
+        'end',
+        'interval',
+        'key',
+        'left',
+        'max_end',
+        'priority',
+        'right',
+    )
+
+    def __init__(self, key: _Key, end: float, interval: TaskInterval):
+        self.key = key
+        self.end = end
+        self.max_end = end
+        self.interval = interval
+        self.priority = random.random()
+        self.left: None | _Node = None
+        self.right: None | _Node = None
+
+    def update(self) -> None:
+        self.max_end = self.end
+        if self.left is not None and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+def _split(
+    node: None | _Node,
+    key: _Key,
+) -> tuple[None | _Node, None | _Node]:
+    # Split into the nodes with keys less than key and the others
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+
+def _merge(left: None | _Node, right: None | _Node) -> None | _Node:
+    # All keys of left are less than the keys of right
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+def _insert(node: None | _Node, new: _Node) -> _Node:
+    if node is None:
+        return new
+    if new.priority > node.priority:
+        new.left, new.right = _split(node, new.key)
+        new.update()
+        return new
+    if new.key < node.key:
+        node.left = _insert(node.left, new)
+    else:
+        node.right = _insert(node.right, new)
+    node.update()
+    return node
+
+
+def _remove(node: None | _Node, key: _Key) -> None | _Node:
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    node.update()
+    return node
+
+
+def _stab(node: None | _Node, time: float, found: list[TaskInterval]) -> None:
+    # Skip subtrees whose intervals all ended at or before time
+    if node is None or node.max_end <= time:
+        return
+    _stab(node.left, time, found)
+    if node.key[0] <= time:
+        if time < node.end:
+            found.append(node.interval)
+        _stab(node.right, time, found)
+
+
+class _IntervalTree:
+    """Intervals of one process in a treap ordered by start time.
+
+    Every node also holds the latest end of its subtree so a stab query
+    only visits the subtrees that can contain a running interval, taking
+    O(log n + k) expected time for k results.
+    """
+
+    def __init__(self) -> None:
+        self.root: None | _Node = None
+        self.size = 0
+
+    def add(self, key: _Key, end: float, interval: TaskInterval) -> None:
+        self.root = _insert(self.root, _Node(key, end, interval))
+        self.size += 1
+
+    def remove(self, key: _Key) -> None:
+        self.root = _remove(self.root, key)
+        self.size -= 1
+
+    def stab(self, time: float) -> list[TaskInterval]:
+        found: list[TaskInterval] = []
+        _stab(self.root, time, found)
+        return found
+
+    def __iter__(self) -> Iterator[TaskInterval]:
+        stack: list[_Node] = []
+        node = self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            yield node.interval
+            node = node.right
+
+
+class TaskTracker:
+    """Pair the start and end events of tasks into intervals.
+
+    Starts are kept in a hash map until the matching COMPLETE or FAIL event
+    of the same task on the same process arrives. Starts that see no end
+    within `ttl` seconds, e.g., because the process was killed, are
+    expired so the map stays bounded.
+
+    Running and recently ended intervals are indexed in an interval tree
+    per host and process to answer which tasks were running on a process
+    at a time with [`running()`][magnify.tasks.TaskTracker.running]. Ended
+    intervals are dropped from the index `history` seconds after their
+    end.
+
+    Times are relative to the newest event added, so events replayed from
+    a log expire the same as live ones.
+
+    Example:
+        ```python
+        >>> tracker = TaskTracker(ttl=3600)
+        >>> for interval in tracker.add(task):
+        ...     write(interval)
+        >>> tracker.running(pid, time)
+        ```
+    """
+
+    def __init__(self, ttl: float = 3600.0, history: float = 600.0):
+        """Initialize a tracker.
+
+        Args:
+            ttl: Seconds to wait for the end of a task.
+            history: Seconds to keep ended intervals in the index.
+        """
+        self.ttl = ttl
+        self.history = history
+        # (host, task_id, pid) -> index key and interval of the start, in
+        # order of arrival.
+        self.open: collections.OrderedDict[
+            tuple[None | str, Any, int],
+            tuple[_Key, TaskInterval],
+        ] = collections.OrderedDict()
+        self.sequence = itertools.count()
+        # (host, pid) -> index of the intervals of the process
+        self.trees: dict[_Process, _IntervalTree] = {}
+        # End, key and process of the ended intervals in the index. Keys are
+        # unique so processes are never compared.
+        self.ended: list[tuple[float, _Key, _Process]] = []
+        self.newest = -math.inf
+        self.expired = 0
+
+    def _tree(self, process: _Process) -> _IntervalTree:
+        if process not in self.trees:
+            self.trees[process] = _IntervalTree()
+        return self.trees[process]
+
+    def _remove(self, process: _Process, key: _Key) -> None:
+        tree = self.trees[process]
+        tree.remove(key)
+        if tree.size == 0:
+            del self.trees[process]
+
+    def add(self, task: TimedTask) -> list[TaskInterval]:
+        """Add a task event.
+
+        Returns:
+            Intervals that ended with the event: the interval of the task if
+            the event is a COMPLETE or FAIL, and any starts that expired.
+        """
+        timestamp = task.timestamp.timestamp()
+        pair = (task.host, task.task_id, task.pid)
+        process = (task.host, task.pid)
+        ended = []
+
+        if task.event == TaskEvent.START:
+            previous = self.open.pop(pair, None)
+            if previous is not None:
+                # Restarted without an end, the first start is lost
+                self._remove(process, previous[0])
+            interval = TaskInterval(
+                task.task_id,
+                task.pid,
+                task.timestamp,
+                None,
+                None,
+                task.host,
+            )
+            key = (timestamp, next(self.sequence))
+            self.open[pair] = (key, interval)
+            self._tree(process).add(key, math.inf, interval)
+        else:
+            start = self.open.pop(pair, None)
+            interval = TaskInterval(
+                task.task_id,
+                task.pid,
+                None if start is None else start[1].start_time,
+                task.timestamp,
+                TaskEvent(task.event),
+                task.host,
+            )
+            if start is not None:
+                key = start[0]
+                self._remove(process, key)
+                self._tree(process).add(key, timestamp, interval)
+                heapq.heappush(self.ended, (timestamp, key, process))
+            ended.append(interval)
+
+        ended.extend(self.expire(timestamp))
+        return ended
+
+    def expire(self, timestamp: float) -> list[TaskInterval]:
+        """Expire starts and ended intervals older than timestamp allows.
+
+        Args:
+            timestamp: Current time in seconds since the epoch. Times before
+                the newest event added are ignored.
+
+        Returns:
+            Intervals of the expired starts.
+        """
+        self.newest = max(self.newest, timestamp)
+
+        while self.ended and self.ended[0][0] < self.newest - self.history:
+            _, key, process = heapq.heappop(self.ended)
+            self._remove(process, key)
+
+        expired = []
+        cutoff = self.newest - self.ttl
+        while self.open:
+            pair, (key, interval) = next(iter(self.open.items()))
+            if key[0] >= cutoff:
+                break
+            del self.open[pair]
+            self._remove((interval.host, interval.pid), key)
+            expired.append(interval)
+        self.expired += len(expired)
+        return expired
+
+    def running(
+        self,
+        pid: int,
+        time: datetime.datetime,
+        host: None | str = None,
+    ) -> list[TaskInterval]:
+        """Return the intervals of the tasks running on a process at a time.
+
+        A task is running from its start (inclusive) to its end (exclusive).
+        Tasks that have not ended are running at any time after their start.
+
+        Args:
+            pid: Process to find the tasks of.
+            time: Time the tasks were running at.
+            host: Node of the process, None for local processes.
+        """
+        tree = self.trees.get((host, pid))
+        if tree is None:
+            return []
+        return tree.stab(time.timestamp())
+
+    def intervals(self) -> list[TaskInterval]:
+        """Return the running and indexed ended intervals by process."""
+        # Local processes, without a host, come first
+        order = sorted(self.trees, key=lambda p: (p[0] is not None, p))
+        return [
+            interval for process in order for interval in self.trees[process]
+        ]
+
+    def drain(self) -> list[TaskInterval]:
+        """Remove and return the intervals of the tasks still running."""
+        running = [interval for _, interval in self.open.values()]
+        for key, interval in self.open.values():
+            self._remove((interval.host, interval.pid), key)
+        self.open.clear()
+        return running
@@ -17,9 +17,14 @@ class TimedMeasurement(NamedTuple):
 
 
 class TimedTask(NamedTuple):
-    """Type for recording task information."""
+    """Type for recording task information.
+
+    `host` is the node the task ran on, set by the aggregator for events
+    forwarded from other nodes and None for local events.
+    """
 
     task_id: Any
     pid: int
     timestamp: datetime.datetime
     event: TaskEvent
+    host: None | str = None
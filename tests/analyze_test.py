@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+import pytest
+
+from magnify.analyze import main
+from magnify.analyze import scan_stream
+from magnify.analyze import task_usage
+from magnify.client import TaskEvent
+from magnify.store.file import FileStore
+from magnify.store.parquet import ParquetStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _time(seconds):
+    return START + datetime.timedelta(seconds=seconds)
+
+
+def _write_run(store):
+    events = {
+        0: [('a', 1, 0.5, TaskEvent.START), ('b', 2, 0.5, TaskEvent.START)],
+        5: [('a', 1, 4.5, TaskEvent.COMPLETE), ('c', 1, 4.7, TaskEvent.START)],
+        9: [('c', 1, 8.5, TaskEvent.FAIL)],
+    }
+    for i in range(10):
+        for task_id, pid, seconds, event in events.get(i, []):
+            store.put_task(TimedTask(task_id, pid, _time(seconds), event))
+        store.put_measurement(
+            {
+                'psutil': TimedMeasurement(
+                    _time(i),
+                    polars.DataFrame(
+                        {
+                            'psutil_process_pid': [1, 2],
+                            'psutil_process_time_user': [1.0 * i, 0.5 * i],
+                            'psutil_process_time_system': [0.0, 0.0],
+                            'psutil_process_memory_resident': [100 * i, 5],
+                            'psutil_process_disk_read': [i, i],
+                            'psutil_process_disk_write': [0, 2 * i],
+                        },
+                    ),
+                ),
+                'energy': TimedMeasurement(
+                    _time(i),
+                    polars.DataFrame(
+                        {
+                            'pid': [1, 2],
+                            'socket': [0, 0],
+                            'power': [10.0, 2.0],
+                        },
+                    ),
+                ),
+            },
+        )
+    store.close()
+
+
+@pytest.mark.parametrize(
+    'store_type',
+    (FileStore, ParquetStore),
+)
+def test_task_usage(tmp_path, store_type):
+    _write_run(store_type(tmp_path))
+
+    usage = task_usage(tmp_path).collect(engine='streaming').sort('task_id')
+
+    # b never ended so it is not attributed
+    assert usage['task_id'].to_list() == ['a', 'c']
+    assert usage['status'].to_list() == ['COMPLETE', 'FAIL']
+    assert usage['cpu_time'].to_list() == [3.0, 3.0]
+    assert usage['peak_rss'].to_list() == [400, 800]
+    assert usage['read_bytes'].to_list() == [3, 3]
+    assert usage['energy'].to_list() == pytest.approx([40.0, 38.0])
+
+
+@pytest.mark.parametrize(
+    'store_type',
+    (FileStore, ParquetStore),
+)
+def test_task_usage_hosts(tmp_path, store_type):
+    # Aggregator output, pid 1 runs a task on each node
+    store = store_type(tmp_path)
+    events = ((0.5, TaskEvent.START), (4.5, TaskEvent.COMPLETE))
+    for host, task_id in (('n0', 'a'), ('n1', 'b')):
+        for seconds, event in events:
+            store.put_task(TimedTask(task_id, 1, _time(seconds), event, host))
+    for i in range(5):
+        store.put_measurement(
+            {
+                'psutil': TimedMeasurement(
+                    _time(i),
+                    polars.DataFrame(
+                        {
+                            'psutil_process_pid': [1, 1],
+                            'psutil_process_time_user': [1.0 * i, 2.0 * i],
+                            'psutil_process_time_system': [0.0, 0.0],
+                            'host': ['n0', 'n1'],
+                        },
+                    ),
+                ),
+            },
+        )
+    store.close()
+
+    usage = task_usage(tmp_path).collect().sort('task_id')
+    assert usage['host'].to_list() == ['n0', 'n1']
+    assert usage['cpu_time'].to_list() == [3.0, 6.0]
+
+
+def test_task_usage_streams(tmp_path):
+    _write_run(FileStore(tmp_path))
+
+    usage = task_usage(tmp_path, streams=['energy']).collect()
+    assert 'cpu_time' not in usage.columns
+    assert 'energy' in usage.columns
+
+
+def test_scan_stream_rotated_partitions(tmp_path):
+    store = FileStore(tmp_path, partition='minute', max_bytes=1)
+    for i in range(0, 180, 30):
+        store.put_measurement({'rapl': TimedMeasurement(_time(i), float(i))})
+    store.close()
+
+    df = scan_stream(tmp_path, 'rapl').collect()
+    assert df['value'].to_list() == [float(i) for i in range(0, 180, 30)]
+    assert scan_stream(tmp_path, 'missing') is None
+
+
+def test_analyze_main(tmp_path, capsys):
+    _write_run(FileStore(tmp_path / 'run'))
+
+    assert (
+        main([str(tmp_path / 'run'), '-o', str(tmp_path / 'out.parquet')]) == 0
+    )
+    usage = polars.read_parquet(tmp_path / 'out.parquet')
+    assert len(usage) == 2  # noqa: PLR2004
+
+    main([str(tmp_path / 'run')])
+    assert capsys.readouterr().out.startswith('task_id,pid')
+
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / 'missing')])
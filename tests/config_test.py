@@ -4,13 +4,26 @@ import pathlib
 
 import pytest
 
+from magnify.config import AggregatorConfig
 from magnify.config import FilterConfig
 from magnify.config import MonitorConfig
 from magnify.config import SensorConfig
 from magnify.config import StoreConfig
+from magnify.filters.basic import Aggregate
 from magnify.filters.basic import Downsample
+from magnify.filters.basic import TopK
+from magnify.filters.compression import SwingingDoor
+from magnify.filters.delta import CounterRate
+from magnify.filters.delta import Deadband
 from magnify.sensor.rapl import RaplSysfsSensor
+from magnify.store.elasticsearch import ElasticsearchStore
 from magnify.store.file import FileStore
+from magnify.store.memory import MemoryStore
+from magnify.store.parquet import ParquetStore
+from magnify.store.recording import RecordingStore
+from magnify.store.shm import SharedMemoryStore
+from magnify.store.sqlite import SqliteStore
+from magnify.store.writer import AsyncStore
 
 
 @pytest.mark.parametrize(
@@ -29,7 +42,16 @@ def test_get_sensor_type(kind: str, expected: type) -> None:
 
 @pytest.mark.parametrize(
     ('kind', 'expected'),
-    (('file', FileStore), ('FileStore', FileStore)),
+    (
+        ('file', FileStore),
+        ('FileStore', FileStore),
+        ('parquet', ParquetStore),
+        ('sqlite', SqliteStore),
+        ('elasticsearch', ElasticsearchStore),
+        ('sharedmemory', SharedMemoryStore),
+        ('memory', MemoryStore),
+        ('recording', RecordingStore),
+    ),
 )
 def test_get_store_type(kind: str, expected: type) -> None:
     config = StoreConfig(kind=kind)
@@ -40,6 +62,11 @@ def test_get_store_type(kind: str, expected: type) -> None:
     ('kind', 'expected'),
     (
         ('downsample', Downsample),
+        ('aggregate', Aggregate),
+        ('topk', TopK),
+        ('swingingdoor', SwingingDoor),
+        ('deadband', Deadband),
+        ('counterrate', CounterRate),
         ('magnify.filters.basic.Downsample', Downsample),
     ),
 )
@@ -75,3 +102,61 @@ options = {{ k = 5 }}
     assert config.stores[0].kind == 'file'
     # assert config.stores[0].includes == 'rapl'
     assert config.stores[0].options['dir_name'] == str(store_dir)
+
+
+def test_monitor_config_shares_filter_chains(tmp_path: pathlib.Path) -> None:
+    filters = [FilterConfig(kind='downsample', options={'k': 2})]
+    config = MonitorConfig(
+        sensors=[],
+        stores=[
+            StoreConfig(
+                kind='file',
+                includes=['rapl', 'perf'],
+                filters=filters,
+                options={'dir_name': str(tmp_path / 'a')},
+            ),
+            StoreConfig(
+                kind='file',
+                includes=['perf', 'rapl'],
+                filters=filters,
+                options={'dir_name': str(tmp_path / 'b')},
+            ),
+            StoreConfig(
+                kind='file',
+                options={'dir_name': str(tmp_path / 'c')},
+            ),
+        ],
+    )
+
+    monitor = config.get_monitor()
+    chains = [store.chain for store in monitor.stores]
+    assert chains[0] is chains[1]
+    assert chains[0].memoize
+    assert chains[2] is not chains[0]
+    assert isinstance(chains[0].filters[0], Downsample)
+
+
+def test_store_config_writer(tmp_path: pathlib.Path) -> None:
+    config = StoreConfig(
+        kind='file',
+        options={'dir_name': str(tmp_path)},
+        writer={'max_size': 8, 'policy': 'drop_oldest'},
+    )
+
+    store = config.get_store()
+    assert isinstance(store, AsyncStore)
+    assert isinstance(store.store, FileStore)
+    assert store.max_size == 8  # noqa: PLR2004
+    assert store.policy == 'drop_oldest'
+    store.close()
+
+
+def test_aggregator_config(tmp_path: pathlib.Path) -> None:
+    config = AggregatorConfig(
+        stores=[StoreConfig(kind='file', options={'dir_name': str(tmp_path)})],
+        address=f'ipc://{tmp_path}/aggregator',
+    )
+
+    aggregator = config.get_aggregator()
+    assert isinstance(aggregator.stores[0], FileStore)
+    assert aggregator.credits == 16  # noqa: PLR2004
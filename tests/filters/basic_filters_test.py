@@ -5,7 +5,9 @@ import datetime
 import polars
 import pytest
 
+from magnify.filters.basic import Aggregate
 from magnify.filters.basic import Downsample
+from magnify.filters.basic import TopK
 from magnify.types import TimedMeasurement
 
 
@@ -57,3 +59,163 @@ def test_downsample_to(fake_measurement_generator):
             assert len(filtered) == 2  # noqa: PLR2004
         else:
             assert len(filtered) == 1
+
+
+def test_aggregate_requires_one_window():
+    with pytest.raises(ValueError, match='Exactly one'):
+        Aggregate()
+    with pytest.raises(ValueError, match='Exactly one'):
+        Aggregate(k=2, window=1.0)
+    with pytest.raises(ValueError, match='Unknown aggregates'):
+        Aggregate(k=2, aggregates=('mode',))
+
+
+def test_aggregate_k():
+    f = Aggregate(k=3, percentiles=(0.5,))
+    start = datetime.datetime.now(datetime.UTC)
+    for i in range(6):
+        m = {
+            'psutil': TimedMeasurement(
+                start,
+                polars.DataFrame(
+                    {
+                        'pid': [1, 2],
+                        'cpu': [float(i), 10.0 * (i == 4)],  # noqa: PLR2004
+                        'name': ['a', 'b'],
+                    },
+                ),
+            ),
+            'rapl': TimedMeasurement(start, float(i)),
+        }
+        filtered = f.apply(m)
+
+        if i % 3 != 2:  # noqa: PLR2004
+            assert filtered == {}
+            continue
+
+        df = filtered['psutil'].measurement
+        assert df['pid'].to_list() == [1, 2]
+        assert df['cpu_mean'].to_list() == [i - 1, 10 / 3 * (i == 5)]  # noqa: PLR2004
+        assert df['cpu_min'].to_list() == [i - 2, 0]
+        assert df['cpu_max'].to_list() == [i, 10 * (i == 5)]  # noqa: PLR2004
+        assert df['cpu_p50'].to_list()[0] == i - 1
+        assert df['name'].to_list() == ['a', 'b']
+
+        rapl = filtered['rapl'].measurement
+        assert rapl.columns == ['mean', 'min', 'max', 'p50']
+        assert rapl.row(0) == (i - 1, i - 2, i, i - 1)
+
+
+def test_aggregate_window(fake_measurement_generator):
+    f = Aggregate(window=2.5, to={'rapl'})
+    start = datetime.datetime.now(datetime.UTC)
+    emitted = []
+    for i in range(6):
+        m = fake_measurement_generator.get()
+        m['rapl'] = TimedMeasurement(
+            start + datetime.timedelta(seconds=i),
+            float(i),
+        )
+        filtered = f.apply(m)
+        assert 'perf' in filtered
+        if 'rapl' in filtered:
+            emitted.append(filtered['rapl'])
+
+    assert len(emitted) == 1
+    assert emitted[0].time == start + datetime.timedelta(seconds=3)
+    assert emitted[0].measurement['max'].item() == 3  # noqa: PLR2004
+
+
+def _psutil(cpu):
+    return polars.DataFrame(
+        {
+            'psutil_process_pid': [10, 11],
+            'psutil_process_ppid': [1, 10],
+            'psutil_process_create_time': [1700000000.0, 1700000001.0],
+            'psutil_process_name': ['python', 'bash'],
+            'psutil_process_cpu_percent': cpu,
+        },
+    )
+
+
+def test_aggregate_psutil_stream():
+    f = Aggregate(k=2)
+    now = datetime.datetime.now(datetime.UTC)
+    f.apply({'psutil': TimedMeasurement(now, _psutil([1.0, 3.0]))})
+    filtered = f.apply({'psutil': TimedMeasurement(now, _psutil([3.0, 5.0]))})
+
+    df = filtered['psutil'].measurement
+    assert df['psutil_process_pid'].to_list() == [10, 11]
+    assert df['psutil_process_ppid'].to_list() == [1, 10]
+    assert df['psutil_process_cpu_percent_mean'].to_list() == [2.0, 4.0]
+
+
+def test_aggregate_missing_by():
+    f = Aggregate(k=1, by='pid')
+    now = datetime.datetime.now(datetime.UTC)
+    with pytest.raises(ValueError, match='no column'):
+        f.apply({'psutil': TimedMeasurement(now, _psutil([1.0, 3.0]))})
+
+
+def test_aggregate_flush():
+    f = Aggregate(k=3)
+    now = datetime.datetime.now(datetime.UTC)
+    for i in range(4):
+        f.apply({'rapl': TimedMeasurement(now, float(i))})
+
+    flushed = f.flush()
+    assert flushed['rapl'].measurement['mean'].item() == 3.0  # noqa: PLR2004
+    assert f.flush() == {}
+
+
+def _processes():
+    return {
+        'psutil': TimedMeasurement(
+            datetime.datetime.now(datetime.UTC),
+            polars.DataFrame(
+                {
+                    'pid': [1, 2, 3, 4, 5],
+                    'rss': [10, 50, 20, 40, 30],
+                    'name': ['a', 'b', 'c', 'd', 'e'],
+                },
+            ),
+        ),
+        'rapl': TimedMeasurement(datetime.datetime.now(datetime.UTC), 1.0),
+    }
+
+
+def test_top_k():
+    f = TopK(k=2, by='rss')
+    m = _processes()
+    filtered = f.apply(m)
+
+    assert filtered['psutil'].measurement['pid'].to_list() == [2, 4]
+    assert filtered['rapl'] == m['rapl']
+
+
+def test_top_k_other():
+    f = TopK(k=2, by='rss', other=True)
+    df = f.apply(_processes())['psutil'].measurement
+
+    assert df['pid'].to_list() == [2, 4, None]
+    assert df['rss'].to_list() == [50, 40, 60]
+    assert df['name'].to_list() == ['b', 'd', 'other']
+
+
+def test_top_k_fewer_rows():
+    f = TopK(k=10, by='rss', other=True)
+    m = _processes()
+    assert f.apply(m)['psutil'].measurement.equals(m['psutil'].measurement)
+
+
+def test_top_k_other_psutil_stream():
+    f = TopK(k=1, by='psutil_process_cpu_percent', other=True)
+    now = datetime.datetime.now(datetime.UTC)
+    filtered = f.apply({'psutil': TimedMeasurement(now, _psutil([1.0, 3.0]))})
+
+    other = filtered['psutil'].measurement.row(1, named=True)
+    assert other['psutil_process_pid'] is None
+    assert other['psutil_process_ppid'] is None
+    assert other['psutil_process_create_time'] is None
+    assert other['psutil_process_name'] == 'other'
+    assert other['psutil_process_cpu_percent'] == 1.0
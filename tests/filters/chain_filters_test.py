@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import datetime
+from unittest import mock
+
+import polars
+import pytest
+
+from magnify.filters.basic import Downsample
+from magnify.filters.basic import TopK
+from magnify.filters.chain import FilterChain
+from magnify.filters.compression import SwingingDoor
+from magnify.types import TimedMeasurement
+
+
+@pytest.fixture
+def measurements():
+    now = datetime.datetime.now(datetime.UTC)
+    return {
+        'perf': TimedMeasurement(
+            now,
+            polars.DataFrame({'pid': [1, 2, 3], 'cycles': [3, 1, 2]}),
+        ),
+        'rapl': TimedMeasurement(now, 100.0),
+        'psutil': TimedMeasurement(now, polars.DataFrame({'pid': [1]})),
+    }
+
+
+def test_empty_chain(measurements):
+    chain = FilterChain()
+    assert chain(measurements) is measurements
+
+
+def test_chain_includes(measurements):
+    chain = FilterChain(includes=['perf', 'missing'])
+    assert chain(measurements).keys() == {'perf'}
+
+
+def test_chain_routes_streams(measurements):
+    copied = measurements.copy()
+    chain = FilterChain(
+        [TopK(k=1, by='cycles', to={'perf'}), Downsample(k=2, to={'rapl'})],
+    )
+
+    filtered = chain(measurements)
+    assert filtered.keys() == measurements.keys()
+    assert filtered['perf'].measurement['pid'].to_list() == [1]
+
+    filtered = chain(measurements)
+    assert filtered.keys() == {'perf', 'psutil'}
+    assert measurements == copied, 'Chain changed original measurement'
+
+
+def test_chain_matches_apply(measurements):
+    filters = [Downsample(k=2, to={'rapl'}), TopK(k=2, by='cycles')]
+    expected_filters = [Downsample(k=2, to={'rapl'}), TopK(k=2, by='cycles')]
+    chain = FilterChain(filters, includes=['perf', 'rapl'])
+
+    for _ in range(4):
+        expected = {k: measurements[k] for k in ('perf', 'rapl')}
+        for f in expected_filters:
+            expected = f.apply(expected)
+
+        filtered = chain(measurements)
+        assert filtered.keys() == expected.keys()
+        for k in expected:
+            assert filtered[k].time == expected[k].time
+
+
+def test_chain_duck_typed_filter(measurements):
+    f = mock.Mock()
+    f.apply.side_effect = lambda x: x
+    chain = FilterChain([f])
+
+    chain(measurements)
+    f.apply.assert_called_once_with(measurements)
+
+
+def test_chain_memoize(measurements):
+    f = mock.Mock()
+    f.apply.side_effect = lambda x: dict(x)
+    chain = FilterChain([f], memoize=True)
+
+    first = chain(measurements)
+    assert chain(measurements) is first
+    assert f.apply.call_count == 1
+
+    chain(dict(measurements))
+    assert f.apply.call_count == 2  # noqa: PLR2004
+
+
+def test_chain_timings(measurements):
+    chain = FilterChain([Downsample(1), TopK(1, by='cycles', to={'perf'})])
+    chain(measurements)
+    assert chain.timings is None
+
+    chain.timings = [None, None]
+    chain(measurements)
+    assert all(t > 0 for t in chain.timings)
+
+
+def test_chain_flush():
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    door = SwingingDoor(tolerance=0.1)
+    chain = FilterChain([door, Downsample(1)], memoize=True)
+    for i in range(3):
+        measurement = TimedMeasurement(
+            start + datetime.timedelta(seconds=i),
+            float(i),
+        )
+        chain({'rapl': measurement})
+
+    flushed = chain.flush()
+    assert flushed['rapl'].time == start + datetime.timedelta(seconds=2)
+    assert flushed['rapl'].measurement == pytest.approx(2.0)
+    # Stores sharing the chain get the same flushed measurements
+    assert chain.flush() is flushed
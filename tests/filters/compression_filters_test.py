@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import datetime
+import math
+
+import polars
+import pytest
+
+from magnify.filters.compression import interpolate
+from magnify.filters.compression import SwingingDoor
+from magnify.types import TimedMeasurement
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _signal(n):
+    return [
+        TimedMeasurement(
+            START + datetime.timedelta(milliseconds=100 * i),
+            math.sin(i / 50) + 0.3 * math.sin(i / 7),
+        )
+        for i in range(n)
+    ]
+
+
+def _compress(f, signal):
+    vertices = []
+    for point in signal:
+        filtered = f.apply({'rapl': point})
+        if 'rapl' in filtered:
+            vertices.append(filtered['rapl'])
+    vertices.extend(f.flush().values())
+    return polars.DataFrame(vertices, schema=['time', 'value'], orient='row')
+
+
+@pytest.mark.parametrize('tolerance', (0.01, 0.1))
+def test_swinging_door_error_bound(tolerance):
+    signal = _signal(1000)
+    vertices = _compress(SwingingDoor(tolerance=tolerance), signal)
+    assert len(vertices) < len(signal) / 5
+
+    rebuilt = interpolate(vertices, [p.time for p in signal])
+    for point, value in zip(signal, rebuilt['value']):
+        assert abs(point.measurement - value) <= tolerance + 1e-9
+
+
+def test_swinging_door_line():
+    signal = [
+        TimedMeasurement(START + datetime.timedelta(seconds=i), 2.0 * i)
+        for i in range(10)
+    ]
+    vertices = _compress(SwingingDoor(tolerance=0.1), signal)
+    # The first sample, and the last one flushed at the end
+    assert vertices['value'].to_list() == pytest.approx([0.0, 18.0])
+
+
+def test_swinging_door_max_interval():
+    signal = [
+        TimedMeasurement(START + datetime.timedelta(seconds=i), 1.0)
+        for i in range(10)
+    ]
+    max_interval = 3
+    f = SwingingDoor(tolerance=0.1, max_interval=max_interval)
+    vertices = _compress(f, signal)
+    assert vertices['value'].to_list() == [1.0] * 4
+    gaps = vertices['time'].diff().drop_nulls().dt.total_seconds()
+    assert (gaps <= max_interval).all()
+
+
+def test_swinging_door_max_interval_error_bound():
+    values = [0.0, 0.0, 0.0, 10.0, 10.0, 10.0, 10.0, 10.0]
+    signal = [
+        TimedMeasurement(START + datetime.timedelta(seconds=i), value)
+        for i, value in enumerate(values)
+    ]
+    vertices = _compress(SwingingDoor(tolerance=0.1, max_interval=3), signal)
+    rebuilt = interpolate(vertices, [p.time for p in signal])
+    assert rebuilt['value'].to_list() == pytest.approx(values, abs=0.1)
+
+
+def test_swinging_door_dataframe_passthrough():
+    f = SwingingDoor(tolerance=0.1)
+    m = {'perf': TimedMeasurement(START, polars.DataFrame({'pid': [1]}))}
+    assert f.apply(m) == m
+
+
+def test_interpolate_grid():
+    vertices = polars.DataFrame(
+        {
+            'time': [START, START + datetime.timedelta(seconds=10)],
+            'value': [0.0, 10.0],
+        },
+    )
+    grid = [START + datetime.timedelta(seconds=s) for s in (-1, 0, 3, 10, 11)]
+    rebuilt = interpolate(vertices, grid)
+    assert rebuilt['time'].to_list() == grid
+    assert rebuilt['value'].to_list() == [None, 0.0, 3.0, 10.0, None]
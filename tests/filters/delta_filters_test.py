@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+
+from magnify.filters.delta import CounterRate
+from magnify.filters.delta import Deadband
+from magnify.types import TimedMeasurement
+
+
+def _measurement(**columns):
+    return {
+        'psutil': TimedMeasurement(
+            datetime.datetime.now(datetime.UTC),
+            polars.DataFrame(columns),
+        ),
+    }
+
+
+def test_deadband_keeps_changed_rows():
+    f = Deadband(absolute={'rss': 10})
+
+    first = f.apply(
+        _measurement(pid=[1, 2], rss=[100, 200], status=['R', 'S']),
+    )
+    assert len(first['psutil'].measurement) == 2  # noqa: PLR2004
+
+    # Nothing moved past the deadband
+    assert (
+        f.apply(_measurement(pid=[1, 2], rss=[105, 200], status=['R', 'S']))
+        == {}
+    )
+
+    # pid 1 moved from the last kept value, pid 2 changed status, pid 3 is new
+    filtered = f.apply(
+        _measurement(pid=[1, 2, 3], rss=[111, 200, 0], status=['R', 'R', 'S']),
+    )
+    assert filtered['psutil'].measurement['pid'].to_list() == [1, 2, 3]
+
+
+def test_deadband_relative():
+    f = Deadband(relative={'rss': 0.1})
+    f.apply(_measurement(pid=[1, 2], rss=[100, 1000]))
+
+    filtered = f.apply(_measurement(pid=[1, 2], rss=[120, 1050]))
+    assert filtered['psutil'].measurement['pid'].to_list() == [1]
+
+
+def test_deadband_keyframe():
+    f = Deadband(keyframe=3)
+    kept = [
+        len(f.apply(_measurement(pid=[1, 2], rss=[1, 2]))) for _ in range(6)
+    ]
+    assert kept == [1, 0, 0, 1, 0, 0]
+
+
+def test_deadband_forgets_exited_processes():
+    f = Deadband()
+    f.apply(_measurement(pid=[1, 2], rss=[1, 2]))
+    f.apply(_measurement(pid=[1], rss=[1]))
+    assert f.last['psutil']['pid'].to_list() == [1]
+
+    # A reused pid is treated as new
+    filtered = f.apply(_measurement(pid=[1, 2], rss=[1, 2]))
+    assert filtered['psutil'].measurement['pid'].to_list() == [2]
+
+
+def test_deadband_float_stream():
+    f = Deadband(absolute={'value': 5}, to={'rapl'})
+    now = datetime.datetime.now(datetime.UTC)
+    kept = [
+        'rapl' in f.apply({'rapl': TimedMeasurement(now, value)})
+        for value in (100.0, 104.0, 106.0, 110.0, 112.0)
+    ]
+    assert kept == [True, False, True, False, True]
+
+
+def _psutil(rss, status=('S', 'S')):
+    # Columns of the psutil sensor with the default readings
+    return polars.DataFrame(
+        {
+            'psutil_process_cpu_percent': [0.0, 1.0],
+            'psutil_process_create_time': [1700000000.0, 1700000001.0],
+            'psutil_process_memory_percent': [0.1, 0.2],
+            'psutil_process_nice': [0, 0],
+            'psutil_process_name': ['python', 'bash'],
+            'psutil_process_pid': [10, 11],
+            'psutil_process_ppid': [1, 10],
+            'psutil_process_status': list(status),
+            'psutil_process_memory_virtual': [1000, 2000],
+            'psutil_process_memory_resident': rss,
+            'psutil_process_time_user': [1.0, 2.0],
+            'psutil_process_time_system': [0.5, 0.5],
+            'psutil_process_disk_write': [0, 0],
+            'psutil_process_disk_read': [0, 0],
+        },
+    )
+
+
+def test_deadband_psutil_stream():
+    f = Deadband(absolute={'psutil_process_memory_resident': 10})
+    now = datetime.datetime.now(datetime.UTC)
+    self_stream = polars.DataFrame({'tick_ns': [1000]})
+
+    def _tick(df):
+        return f.apply(
+            {
+                'psutil': TimedMeasurement(now, df),
+                'magnify_self': TimedMeasurement(now, self_stream),
+            },
+        )
+
+    first = _tick(_psutil([100, 200]))
+    assert len(first['psutil'].measurement) == 2  # noqa: PLR2004
+    filtered = _tick(_psutil([105, 300]))
+    kept = filtered['psutil'].measurement
+    assert kept['psutil_process_pid'].to_list() == [11]
+    # Streams without a process key are passed through
+    assert filtered['magnify_self'].measurement is self_stream
+
+
+def _counters(time, pid, create_time, user, **columns):
+    return {
+        'psutil': TimedMeasurement(
+            time,
+            polars.DataFrame(
+                {
+                    'psutil_process_pid': pid,
+                    'psutil_process_create_time': create_time,
+                    'psutil_process_time_user': user,
+                    **columns,
+                },
+            ),
+        ),
+    }
+
+
+def test_counter_rate():
+    f = CounterRate()
+    start = datetime.datetime.now(datetime.UTC)
+
+    first = f.apply(_counters(start, [1, 2], [0.0, 0.0], [1.0, 2.0]))
+    df = first['psutil'].measurement
+    assert 'psutil_process_time_user' not in df.columns
+    assert df['psutil_process_time_user_rate'].is_null().all()
+
+    filtered = f.apply(
+        _counters(
+            start + datetime.timedelta(seconds=2),
+            [1, 2, 3],
+            [0.0, 5.0, 0.0],
+            [5.0, 2.0, 1.0],
+        ),
+    )
+    df = filtered['psutil'].measurement
+    assert df['psutil_process_pid'].to_list() == [1, 2, 3]
+    # pid 2 was reused by a new process and pid 3 is new
+    assert df['psutil_process_time_user_rate'].to_list() == [2.0, None, None]
+
+
+def test_counter_rate_reset():
+    f = CounterRate(key='psutil_process_pid', keep_counters=True)
+    start = datetime.datetime.now(datetime.UTC)
+    f.apply(_counters(start, [1, 2], [0.0, 0.0], [10.0, 2.0]))
+    filtered = f.apply(
+        _counters(
+            start + datetime.timedelta(seconds=1),
+            [1, 2],
+            [0.0, 0.0],
+            [1.0, 3.0],
+        ),
+    )
+    df = filtered['psutil'].measurement
+    assert df['psutil_process_time_user'].to_list() == [1.0, 3.0]
+    assert df['psutil_process_time_user_rate'].to_list() == [None, 1.0]
+
+
+def test_counter_rate_state_is_bounded():
+    f = CounterRate()
+    start = datetime.datetime.now(datetime.UTC)
+    f.apply(_counters(start, [1, 2, 3], [0.0] * 3, [1.0] * 3))
+    f.apply(_counters(start, [1], [0.0], [1.0]))
+    assert len(f.last['psutil'].measurement) == 1
+
+
+def test_counter_rate_float_passthrough():
+    f = CounterRate()
+    m = {'rapl': TimedMeasurement(datetime.datetime.now(datetime.UTC), 1.0)}
+    assert f.apply(m) == m
+
+
+def test_counter_rate_passes_through_other_frames():
+    f = CounterRate()
+    now = datetime.datetime.now(datetime.UTC)
+    perf = polars.DataFrame({'pid': [1], 'cycles': [10]})
+    self_stream = polars.DataFrame({'tick_ns': [1000]})
+    for _ in range(2):
+        filtered = f.apply(
+            {
+                'psutil': TimedMeasurement(now, _psutil([100, 200])),
+                'perf': TimedMeasurement(now, perf),
+                'magnify_self': TimedMeasurement(now, self_stream),
+            },
+        )
+        now += datetime.timedelta(seconds=1)
+
+    assert filtered['perf'].measurement is perf
+    assert filtered['magnify_self'].measurement is self_stream
+    rates = filtered['psutil'].measurement
+    assert rates['psutil_process_time_user_rate'].to_list() == [0.0, 0.0]
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
 import datetime
+import threading
+import time
 from unittest import mock
 
 import pytest
+import zmq
 
+from magnify.filters.basic import Downsample
 from magnify.monitor import MagnifyMonitor
+from magnify.store.memory import MemoryStore
 from magnify.types import TimedMeasurement
 
 
@@ -54,8 +59,33 @@ def test_process_task(mock_store):
     mock_store.put_task.assert_called_once()
 
 
-def test_task_listener(mock_store):
-    pass
+def test_task_listener(mock_store, tmp_path):
+    address = f'ipc://{tmp_path}/monitor'
+    monitor = MagnifyMonitor([], [mock_store], monitor_address=address)
+    listener = threading.Thread(target=monitor.task_listener)
+    listener.start()
+
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.connect(address)
+    task_msg = {
+        'task_id': 'test_func',
+        'pid': 2,
+        'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+        'event': 1,
+    }
+    # Messages published before the subscription reaches the monitor are
+    # dropped, so publish until one arrives
+    deadline = time.monotonic() + 5
+    while not mock_store.put_task.called and time.monotonic() < deadline:
+        socket.send_json(task_msg)
+        time.sleep(0.01)
+
+    monitor.kill_event.set()
+    listener.join()
+    socket.close()
+    context.term()
+    assert mock_store.put_task.called
 
 
 def test_take_measurment(mock_sensor):
@@ -82,3 +112,42 @@ def test_sensor_missing(mock_sensor, mock_sensor_2):
 
 def test_run(mock_sensor, mock_store):
     pass
+
+
+def test_close(mock_sensor, mock_store):
+    monitor = MagnifyMonitor([mock_sensor], [mock_store])
+    monitor.close()
+    mock_sensor.close.assert_called_once()
+    mock_store.flush_filters.assert_called_once()
+    mock_store.close.assert_called_once()
+
+
+def test_instrumented_tick(mock_sensor):
+    store = MemoryStore(filters=(Downsample(1),))
+    monitor = MagnifyMonitor([mock_sensor], [store], instrument=True)
+    monitor.process_task(
+        {
+            'task_id': 'test_func',
+            'pid': 2,
+            'timestamp': datetime.datetime.now(datetime.UTC).isoformat(),
+            'event': 1,
+        },
+    )
+    monitor.tick()
+    monitor.tick()
+
+    first, second = store.range('magnify_self').iter_rows(named=True)
+    # Each tick publishes the timings of the previous tick
+    assert first['tick_ns'] is None
+    assert first['tasks'] == 1
+    assert second['tasks'] == 0
+    for column in (
+        'tick_ns',
+        'sensor_measurement1_ns',
+        'store_0_memorystore_filter_ns',
+        'store_0_memorystore_put_ns',
+        'filter_0_0_downsample_ns',
+    ):
+        assert second[column] > 0
+    assert second['rss'] > 0
+    assert second['open_fds'] > 0
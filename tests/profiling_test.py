@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import os
+import signal
+import threading
+import time
+import tracemalloc
+
+from magnify.profiling import Profiler
+
+
+def _busy(event: threading.Event) -> None:
+    while not event.is_set():
+        sum(range(1000))
+
+
+def test_sample(tmp_path):
+    event = threading.Event()
+    thread = threading.Thread(target=_busy, args=(event,), name='busy')
+    thread.start()
+    try:
+        path = Profiler(tmp_path, seconds=0.2, interval=0.001).sample()
+    finally:
+        event.set()
+        thread.join()
+
+    lines = path.read_text().splitlines()
+    assert path.suffix == '.folded'
+    assert any(line.startswith('busy;') and '_busy' in line for line in lines)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+
+
+def test_snapshot(tmp_path):
+    path = Profiler(tmp_path, seconds=0.01).snapshot()
+    assert not tracemalloc.is_tracing()
+    assert tracemalloc.Snapshot.load(path) is not None
+    assert path.with_suffix('.txt').exists()
+
+
+def test_one_profile_at_a_time(tmp_path):
+    profiler = Profiler(tmp_path, seconds=0.1)
+    release = threading.Event()
+
+    def profile():
+        release.wait()
+        return tmp_path
+
+    assert profiler.start(profile)
+    assert not profiler.start(profile)
+    release.set()
+    deadline = time.monotonic() + 5
+    while profiler.running.locked() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert profiler.start(lambda: tmp_path)
+
+
+def test_failed_profile(tmp_path):
+    profiler = Profiler(tmp_path)
+
+    def profile():
+        raise RuntimeError('failed')
+
+    assert profiler.start(profile)
+    deadline = time.monotonic() + 5
+    while profiler.running.locked() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    (error,) = tmp_path.glob('error-*.txt')
+    assert 'RuntimeError' in error.read_text()
+
+
+def test_signal_map(tmp_path):
+    profiler = Profiler(tmp_path / 'profiles', seconds=0.05)
+    handlers = profiler.signal_map()
+    previous = signal.signal(signal.SIGUSR1, handlers[signal.SIGUSR1])
+    try:
+        os.kill(os.getpid(), signal.SIGUSR1)
+        deadline = time.monotonic() + 5
+        while (
+            not list(tmp_path.glob('profiles/stacks-*.folded'))
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+    finally:
+        signal.signal(signal.SIGUSR1, previous)
+    assert list(tmp_path.glob('profiles/stacks-*.folded'))
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import datetime
 import random
+import threading
 from unittest import mock
 
 import numpy as np
@@ -10,6 +11,10 @@ import pytest
 
 from magnify.sensor.energy import _DEFAULT_ENERGY_EVENTS
 from magnify.sensor.energy import PerfEnergySensor
+from magnify.sensor.energy import PerSocketEnergySensor
+from magnify.sensor.energy import RecursiveLeastSquares
+
+_MIN_SAMPLES = 10
 
 
 @pytest.fixture
@@ -129,3 +134,253 @@ def test_invoke_model(fake_perf_rapl_data_factory, mock_datetime):
 
 def test_invoke_retrain_model():
     pass
+
+
+def test_rls_model_converges(fake_perf_rapl_data_factory):
+    model = RecursiveLeastSquares()
+    for _ in range(100):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        features = perf.select(polars.sum(_DEFAULT_ENERGY_EVENTS)).to_numpy()
+        model.partial_fit(features, [rapl])
+
+    perf, rapl = fake_perf_rapl_data_factory.get()
+    features = perf.select(polars.sum(_DEFAULT_ENERGY_EVENTS)).to_numpy()
+    assert model.predict(features)[0] == pytest.approx(rapl, rel=1e-3)
+    assert (model.coef_ >= 0).all()
+
+
+@pytest.mark.parametrize('forgetting', (0.99, 1.0))
+def test_rls_model_counter_magnitudes(forgetting, mock_datetime):
+    # Counter rates of a busy node and an idle power of 60 W
+    rng = np.random.default_rng(0)
+    weights = np.array([2e-9, 1e-9, 5e-10])
+    sensor = PerfEnergySensor(model='rls', forgetting=forgetting)
+    errors = []
+    for i in range(300):
+        counters = rng.uniform(
+            [1e7, 5e7, 1e8],
+            [4e7, 4e8, 3e8],
+            (100, len(weights)),
+        )
+        perf = polars.DataFrame(
+            counters,
+            schema=_DEFAULT_ENERGY_EVENTS,
+            orient='row',
+        ).with_columns(pid=polars.int_range(100), ppid=polars.lit(0))
+        power = counters.sum(axis=0) @ weights + 60
+        if i >= 200:  # noqa: PLR2004
+            features = perf.select(polars.sum(_DEFAULT_ENERGY_EVENTS))
+            predicted = sensor.model.predict(features.to_numpy())[0]
+            errors.append(abs(predicted - power) / power)
+        sensor.invoke(perf, power)
+
+    assert np.mean(errors) < 0.01  # noqa: PLR2004
+    assert sensor.model.intercept_ == pytest.approx(60, abs=1)
+    assert sensor.model.coef_ == pytest.approx(weights, rel=0.05)
+
+
+def test_rls_model_invalid_forgetting():
+    with pytest.raises(ValueError, match='forgetting'):
+        RecursiveLeastSquares(forgetting=0)
+
+
+def test_unknown_model():
+    with pytest.raises(ValueError, match='Unknown energy model'):
+        PerfEnergySensor(model='linear')
+
+
+@pytest.mark.parametrize('model', ('rls', 'elasticnet'))
+def test_invoke_model_kind(model, fake_perf_rapl_data_factory, mock_datetime):
+    sensor = PerfEnergySensor(model=model)
+    for _ in range(2 * sensor.min_samples):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        timed_measurement = sensor.invoke(perf, rapl)
+
+    assert timed_measurement is not None
+    assert timed_measurement.measurement['power'].sum() == pytest.approx(
+        rapl - sensor.model.intercept_,
+    )
+
+
+def test_background_retrain(fake_perf_rapl_data_factory, mock_datetime):
+    sensor = PerfEnergySensor(model='elasticnet', eps=float('inf'))
+    for _ in range(sensor.min_samples):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        sensor.invoke(perf, rapl)
+    initial_model = sensor.model
+    assert initial_model is not None
+
+    # Block the worker until the following ticks have been served
+    sensor.eps = -1
+    release = threading.Event()
+    fit = sensor._fit
+
+    def slow_fit(training_data):
+        release.wait()
+        return fit(training_data)
+
+    try:
+        with mock.patch.object(sensor, '_fit', side_effect=slow_fit):
+            for _ in range(2):
+                perf, rapl = fake_perf_rapl_data_factory.get()
+                assert sensor.invoke(perf, rapl) is not None
+            assert sensor.retrains_in_flight == 1
+            assert sensor.retrains_skipped == 1
+            assert sensor.model is initial_model
+
+            release.set()
+            sensor._retrain.result()
+            assert sensor.retrains_in_flight == 0
+
+            perf, rapl = fake_perf_rapl_data_factory.get()
+            assert sensor.invoke(perf, rapl) is not None
+    finally:
+        release.set()
+
+    assert sensor.retrains_completed == 1
+    assert sensor.model is not initial_model
+
+
+def test_background_retrain_failure(
+    fake_perf_rapl_data_factory,
+    mock_datetime,
+):
+    sensor = PerfEnergySensor(model='elasticnet', eps=float('inf'))
+    for _ in range(sensor.min_samples):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        sensor.invoke(perf, rapl)
+    initial_model = sensor.model
+
+    sensor.eps = -1
+    with mock.patch.object(sensor, '_fit', side_effect=ValueError()):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        sensor.invoke(perf, rapl)
+        sensor._retrain.exception()
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        assert sensor.invoke(perf, rapl) is not None
+
+    assert sensor.retrains_failed == 1
+    assert sensor.model is initial_model
+
+
+@pytest.mark.parametrize('model', ('rls', 'elasticnet'))
+def test_warm_start(
+    model,
+    tmp_path,
+    fake_perf_rapl_data_factory,
+    mock_datetime,
+):
+    sensor = PerfEnergySensor(model=model, state_dir=tmp_path)
+    for _ in range(sensor.min_samples):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        sensor.invoke(perf, rapl)
+    sensor.close()
+    assert sensor.state_path.exists()
+
+    restarted = PerfEnergySensor(model=model, state_dir=tmp_path)
+    assert restarted.model is not None
+    assert len(restarted.training_data) == sensor.min_samples
+    assert restarted.rolling_error == pytest.approx(sensor.rolling_error)
+    np.testing.assert_allclose(restarted.model.coef_, sensor.model.coef_)
+
+    perf, rapl = fake_perf_rapl_data_factory.get()
+    assert restarted.invoke(perf, rapl) is not None
+
+
+def test_warm_start_keyed_by_events(
+    tmp_path,
+    fake_perf_rapl_data_factory,
+    mock_datetime,
+):
+    sensor = PerfEnergySensor(state_dir=tmp_path)
+    for _ in range(sensor.min_samples):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        sensor.invoke(perf, rapl)
+    sensor.close()
+
+    other = PerfEnergySensor(
+        state_dir=tmp_path,
+        events=_DEFAULT_ENERGY_EVENTS[:2],
+    )
+    assert other.state_path != sensor.state_path
+    assert other.model is None
+
+
+def test_periodic_save(tmp_path, fake_perf_rapl_data_factory, mock_datetime):
+    sensor = PerfEnergySensor(state_dir=tmp_path, save_interval=5)
+    for _ in range(4):
+        perf, rapl = fake_perf_rapl_data_factory.get()
+        sensor.invoke(perf, rapl)
+    assert not sensor.state_path.exists()
+
+    perf, rapl = fake_perf_rapl_data_factory.get()
+    sensor.invoke(perf, rapl)
+    assert sensor.state_path.exists()
+
+
+@pytest.fixture
+def fake_socket_data_factory(fake_perf_data_factory):
+    class SocketDataFactory:
+        def get(self):
+            perf = fake_perf_data_factory.get().with_columns(
+                cpu=polars.col('pid') % 4,
+            )
+            weights = {
+                0: np.array([0.001, 0.00025, 0.0005]),
+                1: np.array([0.002, 0.0001, 0.0001]),
+            }
+            energy = []
+            for socket_id, w in weights.items():
+                features = (
+                    perf.filter(polars.col('cpu') // 2 == socket_id)
+                    .select(polars.sum(_DEFAULT_ENERGY_EVENTS))
+                    .to_numpy()
+                    .flatten()
+                )
+                energy.append(w @ features + 50)
+            rapl = polars.DataFrame({'socket': [0, 1], 'energy': energy})
+            return perf, rapl
+
+    return SocketDataFactory()
+
+
+def test_per_socket_energy(fake_socket_data_factory, mock_datetime):
+    sensor = PerSocketEnergySensor(sockets={0: 0, 1: 0, 2: 1, 3: 1})
+    assert sensor.name == 'energy'
+
+    for _ in range(2 * _MIN_SAMPLES):
+        perf, rapl = fake_socket_data_factory.get()
+        timed_measurement = sensor.invoke(perf, rapl)
+
+    assert set(sensor.models) == {0, 1}
+    df = timed_measurement.measurement
+    assert len(df) == len(perf)
+    for socket_id, energy in rapl.iter_rows():
+        model = sensor.models[socket_id].model
+        socket_power = df.filter(polars.col('socket') == socket_id)['power']
+        assert socket_power.sum() == pytest.approx(energy - model.intercept_)
+
+
+def test_per_socket_unknown_cpu(fake_socket_data_factory, mock_datetime):
+    sensor = PerSocketEnergySensor(sockets={0: 0, 1: 0, 2: 1})
+    for _ in range(_MIN_SAMPLES):
+        perf, rapl = fake_socket_data_factory.get()
+        timed_measurement = sensor.invoke(perf, rapl)
+
+    df = timed_measurement.measurement
+    assert df.filter(polars.col('socket').is_null())['power'].is_null().all()
+    assert df.filter(polars.col('socket') == 0)['power'].is_not_null().all()
+
+
+def test_per_socket_state(tmp_path, fake_socket_data_factory, mock_datetime):
+    sensor = PerSocketEnergySensor(
+        sockets={0: 0, 1: 0, 2: 1, 3: 1},
+        state_dir=tmp_path,
+    )
+    for _ in range(_MIN_SAMPLES):
+        perf, rapl = fake_socket_data_factory.get()
+        sensor.invoke(perf, rapl)
+    sensor.close()
+
+    assert (tmp_path / 'socket-0').is_dir()
+    assert (tmp_path / 'socket-1').is_dir()
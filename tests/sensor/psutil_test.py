@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+import datetime
+import types
 from unittest import mock
 
+import polars
+import psutil
+
+from magnify.filters.delta import CounterRate
 from magnify.sensor.psutil import PsutilSensor
+from magnify.types import TimedMeasurement
 
 
 def test_create_psutil_sensor():
@@ -25,3 +32,33 @@ def test_invoke():
     sensor = PsutilSensor()
     timed_measurement = sensor.invoke()
     assert len(timed_measurement.measurement) > 0
+
+
+def test_io_counters_failure_is_missing():
+    with mock.patch('os.getlogin', return_value='user'):
+        sensor = PsutilSensor()
+    proc = mock.MagicMock()
+    proc.as_dict.return_value = {'pid': 1, 'create_time': 1.0}
+    proc.memory_info.return_value = types.SimpleNamespace(vms=1, rss=1)
+    proc.cpu_times.return_value = types.SimpleNamespace(user=0.0, system=0.0)
+    proc.io_counters.side_effect = [
+        types.SimpleNamespace(read_chars=1000, write_chars=0),
+        psutil.AccessDenied(1),
+        types.SimpleNamespace(read_chars=3000, write_chars=0),
+        types.SimpleNamespace(read_chars=4000, write_chars=0),
+    ]
+
+    f = CounterRate()
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    rates = []
+    for i in range(4):
+        d = sensor.measure_resource_utilization(proc)
+        df = polars.from_dicts([d], infer_schema_length=None)
+        time = start + datetime.timedelta(seconds=i)
+        filtered = f.apply({'psutil': TimedMeasurement(time, df)})
+        rates.extend(
+            filtered['psutil'].measurement['psutil_process_disk_read_rate'],
+        )
+
+    # The failed read is missing, not a reset followed by a spike
+    assert rates == [None, None, None, 1000.0]
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import pytest
 
+from magnify.sensor.rapl import cpu_socket_ids
 from magnify.sensor.rapl import RaplSysfsSensor
 
 ENERGY_1 = 100
@@ -77,3 +78,21 @@ def test_rapl_dram(mock_rapl_filesystem):
 
 def test_rapl_overflow(mock_rapl_filesystem):
     pass
+
+
+def test_rapl_per_socket(mock_rapl_filesystem):
+    sensor = RaplSysfsSensor(per_socket=True)
+
+    timed_measurement = sensor.invoke()
+
+    df = timed_measurement.measurement
+    assert df['socket'].to_list() == [0, 1]
+    assert df['energy'].to_list() == [0, 0]
+
+
+def test_cpu_socket_ids(mock_rapl_filesystem):
+    sockets = cpu_socket_ids()
+
+    assert len(sockets) == 16  # noqa: PLR2004
+    assert sockets[0] == 0
+    assert sockets[15] == 1
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+
+from magnify.client import TaskEvent
+from magnify.filters.basic import Downsample
+from magnify.monitor import MagnifyMonitor
+from magnify.sensor.replay import Recording
+from magnify.store.memory import MemoryStore
+from magnify.store.recording import RecordingStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _record(path, ticks, interval=1.0):
+    store = RecordingStore(path)
+    store.put_task(TimedTask('a', 1, START, TaskEvent.START))
+    for i in range(ticks):
+        time = START + datetime.timedelta(seconds=i * interval)
+        measurements = {'rapl': TimedMeasurement(time, float(i))}
+        if i % 2 == 0:
+            measurements['psutil'] = TimedMeasurement(
+                time,
+                polars.DataFrame({'psutil_process_pid': [1], 'rss': [i]}),
+            )
+        store.put_measurement(measurements)
+    store.close()
+
+
+def test_replay_through_monitor(tmp_path):
+    _record(tmp_path / 'node.rec', 10)
+    recording = Recording(tmp_path / 'node.rec')
+    assert recording.streams == ['rapl', 'psutil']
+
+    store = MemoryStore()
+    downsampled = MemoryStore(filters=(Downsample(2),))
+    monitor = MagnifyMonitor(recording.sensors(), [store, downsampled])
+    stats = recording.replay(monitor)
+
+    assert stats['ticks'] == 10  # noqa: PLR2004
+    assert stats['tasks'] == 1
+    assert store.range('rapl')['value'].to_list() == [
+        float(i) for i in range(10)
+    ]
+    assert store.range('psutil')['rss'].to_list() == [0, 2, 4, 6, 8]
+    assert len(downsampled.range('rapl')) == 5  # noqa: PLR2004
+    assert [i.task_id for i in store.running(1, START)] == ['a']
+
+
+def test_replay_streams(tmp_path):
+    _record(tmp_path / 'node.rec', 4)
+    recording = Recording(tmp_path / 'node.rec')
+
+    store = MemoryStore()
+    monitor = MagnifyMonitor(recording.sensors(['psutil']), [store])
+    recording.replay(monitor)
+    assert list(store.series) == ['psutil']
+
+
+def test_replay_speed(tmp_path):
+    _record(tmp_path / 'node.rec', 3, interval=0.05)
+    recording = Recording(tmp_path / 'node.rec')
+
+    monitor = MagnifyMonitor(recording.sensors(), [])
+    stats = recording.replay(monitor, speed=1.0)
+    assert stats['seconds'] >= 0.1  # noqa: PLR2004
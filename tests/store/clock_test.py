@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import datetime
+
+import pytest
+
+from magnify.store.clock import ClockEstimator
+
+
+def _exchange(estimator, t, offset, up, down=None):
+    down = up if down is None else down
+    t1 = t
+    t2 = t1 + up + offset
+    t3 = t2 + 0.001
+    t4 = t3 + down - offset
+    return estimator.add(t1, t2, t3, t4)
+
+
+def test_clock_estimator_no_samples():
+    estimator = ClockEstimator()
+    time = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    assert estimator.offset_at(0) == 0
+    assert estimator.correct(time) == time
+
+
+def test_clock_estimator_offset():
+    estimator = ClockEstimator()
+    sample = _exchange(estimator, 1000.0, 1.5, 0.01)
+    assert sample.offset == pytest.approx(1.5)
+    assert sample.delay == pytest.approx(0.02)
+
+    time = datetime.datetime.fromtimestamp(1000, datetime.UTC)
+    corrected = estimator.correct(time)
+    assert (corrected - time).total_seconds() == pytest.approx(1.5)
+
+
+def test_clock_estimator_ignores_delayed_samples():
+    estimator = ClockEstimator(best=0.5)
+    for i in range(8):
+        # Every other exchange is delayed on the way in, which skews its
+        # offset by half the extra delay
+        up = 0.5 if i % 2 else 0.001
+        _exchange(estimator, 1000.0 + i, -0.25, up, 0.001)
+
+    assert estimator.offset_at(1004) == pytest.approx(-0.25, abs=1e-6)
+    assert estimator.delay == pytest.approx(0.002)
+
+
+def test_clock_estimator_drift():
+    estimator = ClockEstimator(best=1)
+    # The node clock loses 1ms per second
+    for i in range(10):
+        t = 1000.0 + 10 * i
+        _exchange(estimator, t, 0.001 * (t - 1000), 0.001)
+
+    assert estimator.drift == pytest.approx(0.001, rel=1e-3)
+    assert estimator.offset_at(1050) == pytest.approx(0.05, rel=1e-2)
+    # Offsets are not extrapolated beyond the samples
+    assert estimator.offset_at(2000) == pytest.approx(0.09, rel=1e-2)
+
+
+def test_clock_estimator_bounds_drift():
+    estimator = ClockEstimator(best=1, max_drift=1e-4)
+    _exchange(estimator, 1000.0, 0.0, 0.001)
+    _exchange(estimator, 1001.0, 0.01, 0.001)
+    # Samples too close to fit a drift
+    assert estimator.drift == 0
+
+    _exchange(estimator, 1100.0, 0.05, 0.001)
+    assert estimator.drift == pytest.approx(1e-4)
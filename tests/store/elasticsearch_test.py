@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import datetime
+import gzip
+import http.server
+import json
+import threading
+
+import polars
+import pytest
+
+from magnify.client import TaskEvent
+from magnify.store.elasticsearch import ElasticsearchStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+
+class _BulkHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # noqa: N802
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        lines = body.decode().splitlines()
+        server.connections.add(self.client_address)
+        server.paths.append(self.path)
+
+        if server.fail_requests > 0:
+            server.fail_requests -= 1
+            self._reply(503, {'error': 'unavailable'})
+            return
+
+        items = []
+        for action, line in zip(lines[::2], lines[1::2]):
+            assert json.loads(action) == {'create': {'_index': 'magnify'}}
+            doc = json.loads(line)
+            if server.reject_items > 0:
+                server.reject_items -= 1
+                items.append({'create': {'status': 429}})
+                continue
+            server.docs.append(doc)
+            items.append({'create': {'status': 201}})
+        errors = any(i['create']['status'] >= 400 for i in items)  # noqa: PLR2004
+        self._reply(200, {'errors': errors, 'items': items})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), _BulkHandler)
+    server.docs = []
+    server.paths = []
+    server.connections = set()
+    server.fail_requests = 0
+    server.reject_items = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _store(server, **options):
+    host, port = server.server_address
+    return ElasticsearchStore(
+        f'http://{host}:{port}',
+        backoff=0.01,
+        **options,
+    )
+
+
+def _tick():
+    time = datetime.datetime.now(datetime.UTC)
+    return {
+        'perf': TimedMeasurement(
+            time,
+            polars.DataFrame({'pid': [1, 2], 'cycles': [10, 20]}),
+        ),
+        'rapl': TimedMeasurement(time, 100.0),
+    }
+
+
+def test_elasticsearch_store_batches(server):
+    store = _store(server, batch_size=6)
+    store.put_measurement(_tick())
+    assert server.docs == []
+
+    store.put_measurement(_tick())
+    assert len(server.docs) == 6  # noqa: PLR2004
+    assert server.paths == ['/_bulk']
+    assert {doc['stream'] for doc in server.docs} == {'perf', 'rapl'}
+    assert sorted(d['cycles'] for d in server.docs if 'cycles' in d) == [
+        10,
+        10,
+        20,
+        20,
+    ]
+
+    store.put_task(
+        TimedTask('task', 1, datetime.datetime.now(), TaskEvent.START),
+    )
+    store.close()
+    assert server.docs[-1]['event'] == 'START'
+    # All requests reuse one keep-alive connection
+    assert len(server.connections) == 1
+    assert store.indexed == 7  # noqa: PLR2004
+
+
+def test_elasticsearch_store_retries(server):
+    server.fail_requests = 2
+    server.reject_items = 1
+    store = _store(server, compress=False)
+    store.put_measurement(_tick())
+    store.flush()
+
+    assert len(server.docs) == 3  # noqa: PLR2004
+    assert store.retries == 3  # noqa: PLR2004
+    assert store.indexed == 3  # noqa: PLR2004
+    assert len(store.buffer) == 0
+
+
+def test_elasticsearch_store_gives_up(server):
+    server.fail_requests = 10
+    store = _store(server, max_retries=1, max_buffer=4)
+    store.put_measurement(_tick())
+    store.flush()
+    assert len(store.buffer) == 3  # noqa: PLR2004
+
+    store.put_measurement(_tick())
+    assert len(store.buffer) == 4  # noqa: PLR2004
+    assert store.dropped == 2  # noqa: PLR2004
+
+    server.fail_requests = 0
+    store.close()
+    assert len(server.docs) == 4  # noqa: PLR2004
+
+
+def test_elasticsearch_store_invalid_url():
+    with pytest.raises(ValueError, match='scheme'):
+        ElasticsearchStore('ftp://localhost')
@@ -1,13 +1,18 @@
 from __future__ import annotations
 
 import datetime
+import threading
 from unittest import mock
 
 import polars
 import pytest
 
+from magnify.client import TaskEvent
 from magnify.store.file import FileStore
+from magnify.store.file import parse_partition
+from magnify.store.file import partitions
 from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
 
 
 @pytest.fixture
@@ -69,3 +74,150 @@ def test_filestore_filter(tmpdir, fake_measurement, mock_filter):
     store.put_measurement(fake_measurement)
 
     assert mock_filter.apply.called
+
+
+def _tick(time, value):
+    return {
+        'perf': TimedMeasurement(
+            time,
+            polars.DataFrame({'pid': [1, 2], 'cycles': [value, value]}),
+        ),
+        'rapl': TimedMeasurement(time, float(value)),
+    }
+
+
+START = datetime.datetime(2024, 1, 1, 12, 30, tzinfo=datetime.UTC)
+
+
+def test_filestore_invalid_options(tmp_path):
+    with pytest.raises(ValueError, match='Unknown partition'):
+        FileStore(tmp_path, partition='week')
+    with pytest.raises(ValueError, match='requires a partition'):
+        FileStore(tmp_path, retention=3600)
+
+
+def test_filestore_partitions(tmp_path):
+    store = FileStore(tmp_path, partition='hour')
+    for hour in range(3):
+        store.put_measurement(
+            _tick(START + datetime.timedelta(hours=hour), hour),
+        )
+    store.close()
+
+    found = partitions(
+        tmp_path,
+        start=START + datetime.timedelta(hours=1),
+        end=START + datetime.timedelta(hours=2),
+    )
+    assert [p.name for p in found] == ['2024-01-01T13', '2024-01-01T14']
+    perf = polars.read_csv(found[0] / 'perf.csv')
+    assert perf['cycles'].to_list() == [1, 1]
+    assert parse_partition('perf.csv') is None
+
+
+def test_filestore_retention(tmp_path):
+    store = FileStore(tmp_path, partition='hour', retention=3600)
+    for hour in range(4):
+        store.put_measurement(
+            _tick(START + datetime.timedelta(hours=hour), hour),
+        )
+    store.close()
+
+    names = [p.name for p in partitions(tmp_path)]
+    assert names[-2:] == ['2024-01-01T14', '2024-01-01T15']
+    assert '2024-01-01T13' not in names
+
+
+def test_filestore_retention_after_restart(tmp_path):
+    store = FileStore(tmp_path, partition='hour')
+    for hour in range(4):
+        store.put_measurement(
+            _tick(START + datetime.timedelta(hours=hour), hour),
+        )
+    store.close()
+
+    FileStore(tmp_path, partition='hour', retention=3600).close()
+    names = [p.name for p in partitions(tmp_path)]
+    assert names == ['2024-01-01T14', '2024-01-01T15']
+
+
+def test_filestore_concurrent_tasks(tmp_path):
+    store = FileStore(tmp_path, partition='minute', retention=60)
+    errors = []
+
+    def put_tasks():
+        try:
+            for i in range(200):
+                time = START + datetime.timedelta(seconds=30 * i)
+                store.put_task(TimedTask(i, 1, time, TaskEvent.START))
+                store.put_task(TimedTask(i, 1, time, TaskEvent.COMPLETE))
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    thread = threading.Thread(target=put_tasks)
+    thread.start()
+    for i in range(200):
+        store.put_measurement(
+            _tick(START + datetime.timedelta(seconds=30 * i), i),
+        )
+    thread.join()
+    store.close()
+
+    assert errors == []
+
+
+def test_filestore_rotation_and_compression(tmp_path):
+    store = FileStore(tmp_path, max_bytes=64, compress=True)
+    for i in range(10):
+        store.put_measurement(_tick(START + datetime.timedelta(seconds=i), i))
+    store.close()
+
+    perf_files = sorted(tmp_path.glob('perf*.csv.gz'))
+    assert len(perf_files) > 1
+    perf = polars.concat(polars.read_csv(p) for p in perf_files)
+    assert sorted(perf['cycles'].to_list()) == sorted(
+        [i for i in range(10) for _ in range(2)],
+    )
+    rapl = polars.concat(
+        polars.read_csv(p) for p in tmp_path.glob('rapl*.csv.gz')
+    )
+    assert len(rapl) == 10  # noqa: PLR2004
+
+
+def test_filestore_restart(tmp_path):
+    for i in range(2):
+        store = FileStore(tmp_path)
+        store.put_measurement(_tick(START, i))
+        store.close()
+
+    assert (tmp_path / 'rapl.csv').exists()
+    assert (tmp_path / 'rapl.1.csv').exists()
+    assert (tmp_path / 'tasks.1.csv').exists()
+
+
+def test_filestore_task_intervals(tmp_path):
+    store = FileStore(tmp_path)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+    events = [
+        ('a', TaskEvent.START, 0),
+        ('b', TaskEvent.START, 1),
+        ('a', TaskEvent.COMPLETE, 2),
+    ]
+    for task_id, event, offset in events:
+        store.put_task(
+            TimedTask(
+                task_id,
+                1,
+                start + datetime.timedelta(seconds=offset),
+                event,
+            ),
+        )
+    store.close()
+
+    tasks = polars.read_csv(tmp_path / 'tasks.csv', try_parse_dates=True)
+    assert tasks['task_id'].to_list() == ['a', 'b']
+    assert tasks['end_time'].to_list() == [
+        start + datetime.timedelta(seconds=2),
+        None,
+    ]
+    assert tasks['status'].to_list() == ['COMPLETE', None]
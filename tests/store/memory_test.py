@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+import pytest
+
+from magnify.client import TaskEvent
+from magnify.store.memory import MemoryStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _time(i):
+    return START + datetime.timedelta(seconds=i)
+
+
+def _tick(i):
+    return {
+        'psutil': TimedMeasurement(
+            _time(i),
+            polars.DataFrame(
+                {'psutil_process_pid': [1, 2], 'rss': [100 * i, 200 * i]},
+            ),
+        ),
+        'rapl': TimedMeasurement(_time(i), float(i)),
+    }
+
+
+def test_memory_store_range():
+    store = MemoryStore(chunk_ticks=4)
+    for i in range(10):
+        store.put_measurement(_tick(i))
+
+    # Ticks 0-7 were merged into two chunks
+    assert len(store.series['psutil'].chunks) == 4  # noqa: PLR2004
+
+    df = store.range('psutil', _time(3), _time(6))
+    assert df['time'].to_list() == [_time(i) for i in (3, 3, 4, 4, 5, 5)]
+    rapl = store.range('rapl')
+    assert rapl['value'].to_list() == [float(i) for i in range(10)]
+    assert len(store.range('rapl', _time(20))) == 0
+
+    with pytest.raises(KeyError):
+        store.range('missing')
+
+
+def test_memory_store_range_no_copy():
+    store = MemoryStore(chunk_ticks=2)
+    for i in range(4):
+        store.put_measurement(_tick(i))
+
+    df = store.range('psutil')
+    assert df.n_chunks() == 2  # noqa: PLR2004
+
+
+def test_memory_store_latest():
+    store = MemoryStore()
+    for i in range(3):
+        store.put_measurement(_tick(i))
+    store.put_measurement(
+        {
+            'psutil': TimedMeasurement(
+                _time(3),
+                polars.DataFrame({'psutil_process_pid': [1], 'rss': [7]}),
+            ),
+        },
+    )
+
+    assert store.latest('psutil')['rss'].to_list() == [7]
+    assert store.latest('psutil', pid=2)['rss'].to_list() == [400]
+    assert len(store.latest('psutil', pid=3)) == 0
+    assert store.latest('rapl')['value'].item() == 2.0  # noqa: PLR2004
+
+
+def test_memory_store_retention():
+    store = MemoryStore(retention=5, chunk_ticks=1)
+    for i in range(10):
+        store.put_measurement(_tick(i))
+
+    rapl = store.range('rapl')
+    assert rapl['value'].to_list() == [float(i) for i in range(4, 10)]
+
+
+@pytest.mark.parametrize('chunk_ticks', (1, 3, 60))
+def test_memory_store_out_of_order(chunk_ticks):
+    store = MemoryStore(chunk_ticks=chunk_ticks)
+    # The clock steps back within a chunk and before every chunk
+    for i in (2, 3, 4, 5, 6, 7, 1, 4, 0, 9, 8):
+        store.put_measurement(_tick(i))
+
+    times = store.range('rapl')['time'].to_list()
+    assert times == sorted(times)
+    assert len(times) == 11  # noqa: PLR2004
+    rows = store.range('rapl', _time(4), _time(8))
+    assert rows['value'].to_list() == [4.0, 4.0, 5.0, 6.0, 7.0]
+    assert store.latest('rapl')['value'].item() == 9.0  # noqa: PLR2004
+
+
+def test_memory_store_task_aggregate():
+    store = MemoryStore(chunk_ticks=3)
+    for i in range(10):
+        store.put_measurement(_tick(i))
+    events = [
+        (1, TaskEvent.START, 2),
+        (2, TaskEvent.START, 4),
+        (1, TaskEvent.COMPLETE, 5),
+    ]
+    for pid, event, offset in events:
+        store.put_task(TimedTask('task', pid, _time(offset), event))
+
+    intervals = store.task_intervals()
+    assert intervals['status'].to_list() == [TaskEvent.COMPLETE, None]
+
+    df = store.task_aggregate('psutil', 'task', ('mean', 'max'))
+    assert df['pid'].to_list() == [1, 2]
+    assert df['rows'].to_list() == [3, 6]
+    assert df['rss_max'].to_list() == [400, 1800]
+    assert df['rss_mean'].to_list() == [300.0, 1300.0]
+
+    with pytest.raises(KeyError):
+        store.task_aggregate('psutil', 'missing')
+
+
+def test_memory_store_running():
+    store = MemoryStore()
+    store.put_task(TimedTask('a', 1, _time(0), TaskEvent.START))
+    store.put_task(TimedTask('a', 1, _time(2), TaskEvent.COMPLETE))
+
+    assert [i.task_id for i in store.running(1, _time(1))] == ['a']
+    assert store.running(1, _time(2)) == []
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+import pytest
+
+from magnify.client import TaskEvent
+from magnify.store.parquet import ParquetStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _measurement(i, **extra):
+    time = START + datetime.timedelta(seconds=i)
+    return {
+        'perf': TimedMeasurement(
+            time,
+            polars.DataFrame({'pid': [1, 2], 'cycles': [i, 2 * i], **extra}),
+        ),
+        'rapl': TimedMeasurement(time, float(i)),
+    }
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match='Unknown format'):
+        ParquetStore(tmp_path, format='csv')
+
+
+@pytest.mark.parametrize(
+    ('file_format', 'scan'),
+    (('parquet', polars.scan_parquet), ('ipc', polars.scan_ipc)),
+)
+def test_parquet_store_batches(tmp_path, file_format, scan):
+    store = ParquetStore(tmp_path, format=file_format, max_rows=4)
+    for i in range(3):
+        store.put_measurement(_measurement(i))
+
+    perf_parts = list((tmp_path / 'perf').iterdir())
+    assert len(perf_parts) == 1
+    assert list((tmp_path / 'rapl').iterdir()) == []
+
+    store.close()
+    assert len(list((tmp_path / 'perf').iterdir())) == 2  # noqa: PLR2004
+
+    perf = scan(tmp_path / 'perf' / '*').collect()
+    assert perf.columns == ['pid', 'cycles', 'time']
+    assert perf['cycles'].to_list() == [0, 0, 1, 2, 2, 4]
+
+    rapl = scan(tmp_path / 'rapl' / '*').collect()
+    assert rapl['value'].to_list() == [0.0, 1.0, 2.0]
+
+
+def test_parquet_store_interval(tmp_path):
+    store = ParquetStore(tmp_path, max_interval=2)
+    for i in range(3):
+        store.put_measurement(_measurement(i))
+
+    assert len(list((tmp_path / 'rapl').iterdir())) == 1
+
+
+def test_parquet_store_fixed_schema(tmp_path):
+    store = ParquetStore(tmp_path)
+    store.put_measurement(_measurement(0))
+    store.put_measurement(
+        {'perf': TimedMeasurement(START, polars.DataFrame({'pid': [3]}))},
+    )
+    store.put_measurement(_measurement(1, extra=[0.5, 0.5]))
+    store.close()
+
+    perf = polars.read_parquet(tmp_path / 'perf')
+    assert perf.columns == ['pid', 'cycles', 'time']
+    assert perf['cycles'].to_list() == [0, 0, None, 1, 2]
+
+
+def test_parquet_store_widens_dtypes(tmp_path):
+    store = ParquetStore(tmp_path)
+    for values in ([None, None], [1, 2], [0.5, 2.5]):
+        store.put_measurement(
+            {
+                'perf': TimedMeasurement(
+                    START,
+                    polars.DataFrame({'pid': [1, 2], 'power': values}),
+                ),
+            },
+        )
+    store.close()
+
+    perf = polars.read_parquet(tmp_path / 'perf')
+    assert perf.schema['power'] == polars.Float64
+    assert perf['power'].to_list() == [None, None, 1.0, 2.0, 0.5, 2.5]
+    assert perf['time'].to_list() == [START] * 6
+
+
+def test_parquet_store_restart(tmp_path):
+    for _ in range(2):
+        store = ParquetStore(tmp_path)
+        store.put_measurement(_measurement(0))
+        store.close()
+
+    assert len(polars.read_parquet(tmp_path / 'rapl')) == 2  # noqa: PLR2004
+
+
+def test_parquet_store_tasks(tmp_path):
+    store = ParquetStore(tmp_path)
+    store.put_task(TimedTask('task', 1, START, TaskEvent.START))
+    store.put_task(TimedTask('task', 1, START, TaskEvent.COMPLETE))
+    store.close()
+
+    tasks = polars.read_parquet(tmp_path / 'tasks')
+    assert tasks['event'].to_list() == [TaskEvent.START, TaskEvent.COMPLETE]
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import datetime
+import time
+from unittest import mock
+
+import polars
+import pytest
+
+from magnify.client import TaskEvent
+from magnify.store.proxy import Aggregator
+from magnify.store.proxy import decode_measurements
+from magnify.store.proxy import encode_measurements
+from magnify.store.proxy import ForwardingStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _tick():
+    return {
+        'perf': TimedMeasurement(
+            START,
+            polars.DataFrame({'pid': [1, 2], 'cycles': [10, 20]}),
+        ),
+        'rapl': TimedMeasurement(START, 100.0),
+    }
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_encode_decode_measurements():
+    host, measurements = decode_measurements(
+        encode_measurements(_tick(), 'node0'),
+    )
+    assert host == 'node0'
+    assert measurements['rapl'] == _tick()['rapl']
+    assert measurements['perf'].time == START
+    assert measurements['perf'].measurement.equals(
+        _tick()['perf'].measurement,
+    )
+
+
+def test_forward_to_aggregator(tmp_path):
+    address = f'ipc://{tmp_path}/aggregator'
+    store = mock.MagicMock()
+    aggregator = Aggregator([store], address, credits=4)
+    aggregator.start()
+    aggregator.ready.wait()
+
+    nodes = [ForwardingStore(address, host=f'node{i}') for i in range(3)]
+    _wait_for(lambda: len(aggregator.clocks) == 3)  # noqa: PLR2004
+    for _ in range(2):
+        for node in nodes:
+            node.put_measurement(_tick())
+            time.sleep(0.01)
+    nodes[0].put_task(TimedTask('task', 1, START, TaskEvent.START))
+    for node in nodes:
+        node.close()
+
+    def _ticks():
+        return [
+            call.args[0]
+            for call in store.put_measurement.call_args_list
+            if 'clock' not in call.args[0]
+        ]
+
+    _wait_for(lambda: store.put_task.call_count == 1)
+    _wait_for(lambda: len(_ticks()) == 6)  # noqa: PLR2004
+    aggregator.shutdown()
+    aggregator.close()
+
+    task = store.put_task.call_args.args[0]
+    assert task.task_id == 'task'
+    # Nodes share the clock of the aggregator, so the offsets are tiny
+    assert abs((task.timestamp - START).total_seconds()) < 0.005  # noqa: PLR2004
+    assert set(aggregator.clocks) == {'node0', 'node1', 'node2'}
+    for clock in aggregator.clocks.values():
+        assert abs(clock.offset) < 0.005  # noqa: PLR2004
+        assert clock.delay < 0.01  # noqa: PLR2004
+    hosts = set()
+    for measurements in _ticks():
+        perf = measurements['perf'].measurement
+        assert perf.columns == ['pid', 'cycles', 'host']
+        assert measurements['rapl'].measurement.columns == ['value', 'host']
+        hosts.update(perf['host'].to_list())
+    assert hosts == {'node0', 'node1', 'node2'}
+    assert aggregator.hosts['node0'] == 3  # noqa: PLR2004
+    store.close.assert_called_once()
+
+
+def test_forwarding_store_without_credit(tmp_path):
+    address = f'ipc://{tmp_path}/aggregator'
+    store = ForwardingStore(address, max_pending=2, linger=0)
+    for _ in range(4):
+        store.put_measurement(_tick())
+
+    assert store.sent == 0
+    assert len(store.pending) == 2  # noqa: PLR2004
+    assert store.dropped == 2  # noqa: PLR2004
+    store.close()
+
+
+def test_aggregator_corrects_clocks():
+    store = mock.MagicMock()
+    aggregator = Aggregator([store])
+    # The node clock is 2 seconds behind with a 10ms round trip
+    node = START.timestamp()
+    aggregator.synchronize(
+        'node0',
+        [node, node + 2.005, node + 2.005, node + 0.01],
+    )
+    clock = store.put_measurement.call_args.args[0]['clock'].measurement
+    assert clock['host'].to_list() == ['node0']
+    assert clock['offset'].item() == pytest.approx(2, abs=1e-6)
+    assert clock['delay'].item() == pytest.approx(0.01)
+
+    aggregator.process(b'measurements', encode_measurements(_tick(), 'node0'))
+    measurements = store.put_measurement.call_args.args[0]
+    expected = START + datetime.timedelta(seconds=2)
+    assert measurements['rapl'].time == expected
+    assert measurements['perf'].time == expected
+
+    # Hosts without an estimate are not corrected
+    aggregator.process(b'measurements', encode_measurements(_tick(), 'node1'))
+    assert store.put_measurement.call_args.args[0]['rapl'].time == START
+
+
+def test_aggregator_slower_than_hello_interval(tmp_path):
+    address = f'ipc://{tmp_path}/aggregator'
+    limit = 2
+    in_flight = []
+    processed = 0
+    node = None
+
+    def put_measurement(measurements):
+        nonlocal processed
+        in_flight.append(node.sent - processed)
+        time.sleep(0.1)
+        processed += 1
+
+    store = mock.MagicMock()
+    store.put_measurement.side_effect = put_measurement
+    aggregator = Aggregator([store], address, credits=limit)
+    aggregator.start()
+    aggregator.ready.wait()
+
+    node = ForwardingStore(
+        address,
+        hello_interval=0.02,
+        sync_interval=None,
+        linger=0,
+    )
+    deadline = time.monotonic() + 1
+    while time.monotonic() < deadline:
+        node.put_measurement(_tick())
+        time.sleep(0.01)
+
+    aggregator.shutdown()
+    node.close()
+    aggregator.close()
+    # Introducing itself again does not grant the node more credit
+    assert len(in_flight) > limit
+    assert max(in_flight) <= limit
+
+
+def test_forwarding_store_recovers_lost_credit(tmp_path):
+    address = f'ipc://{tmp_path}/aggregator'
+    store = mock.MagicMock()
+    aggregator = Aggregator([store], address, credits=4)
+    aggregator.start()
+    aggregator.ready.wait()
+
+    node = ForwardingStore(
+        address,
+        hello_interval=0.05,
+        sync_interval=None,
+        linger=0,
+    )
+
+    def pump():
+        with node.lock:
+            node._pump()
+
+    _wait_for(lambda: pump() or node.credits == 4)  # noqa: PLR2004
+    # The credits never reached the node
+    with node.lock:
+        node.credits = 0
+    for _ in range(3):
+        node.put_measurement(_tick())
+    _wait_for(lambda: pump() or store.put_measurement.call_count == 3)  # noqa: PLR2004
+
+    aggregator.shutdown()
+    node.close()
+    aggregator.close()
+
+
+def test_aggregator_forgets_idle_nodes():
+    aggregator = Aggregator([], idle_timeout=60)
+    aggregator.epochs = {b'idle': 1, b'active': 1}
+    aggregator.last_seen = {b'idle': 0.0, b'active': 50.0}
+    aggregator._expire(100.0)
+    assert aggregator.epochs == {b'active': 1}
+    assert aggregator.last_seen == {b'active': 50.0}
+
+
+def test_aggregator_survives_bad_messages(tmp_path):
+    address = f'ipc://{tmp_path}/aggregator'
+    store = mock.MagicMock()
+    store.put_measurement.side_effect = [RuntimeError('store failed'), None]
+    aggregator = Aggregator([store], address, credits=4)
+    aggregator.start()
+    aggregator.ready.wait()
+
+    node = ForwardingStore(address, sync_interval=None)
+    with node.lock:
+        node.socket.send_multipart([b'unknown', b'frame'])
+        node.socket.send_multipart([b'measurements', b'not json'])
+        node.socket.send_multipart([b''])
+    node.put_measurement(_tick())
+    node.put_measurement(_tick())
+    # Closing sends the ticks still waiting for credit
+    node.close()
+    _wait_for(lambda: store.put_measurement.call_count == 2)  # noqa: PLR2004
+
+    assert aggregator.thread.is_alive()
+    assert aggregator.errors == 4  # noqa: PLR2004
+    aggregator.shutdown()
+    aggregator.close()
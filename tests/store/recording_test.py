@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+import datetime
+
+import polars
+import pytest
+
+from magnify.client import TaskEvent
+from magnify.store.recording import read_recording
+from magnify.store.recording import recording_streams
+from magnify.store.recording import RecordingStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _tick(i):
+    time = START + datetime.timedelta(seconds=i)
+    return {
+        'psutil': TimedMeasurement(
+            time,
+            polars.DataFrame(
+                {'psutil_process_pid': [1, 2], 'rss': [i, 2 * i]},
+            ),
+        ),
+        'rapl': TimedMeasurement(time, float(i)),
+    }
+
+
+def test_recording_round_trip(tmp_path):
+    path = tmp_path / 'node.rec'
+    store = RecordingStore(path)
+    store.put_measurement(_tick(0))
+    store.put_task(TimedTask('a', 1, START, TaskEvent.START))
+    store.put_measurement(_tick(1))
+    store.close()
+
+    records = list(read_recording(path))
+    assert len(records) == 3  # noqa: PLR2004
+    assert records[1] == TimedTask('a', 1, START, TaskEvent.START)
+    assert records[2]['rapl'] == _tick(1)['rapl']
+    assert records[2]['psutil'].measurement.equals(
+        _tick(1)['psutil'].measurement,
+    )
+    assert recording_streams(path) == ['psutil', 'rapl']
+
+
+def test_recording_truncated(tmp_path):
+    path = tmp_path / 'node.rec'
+    store = RecordingStore(path)
+    store.put_measurement(_tick(0))
+    store.put_measurement(_tick(1))
+    store.close()
+
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+    assert len(list(read_recording(path))) == 1
+
+
+def test_not_a_recording(tmp_path):
+    path = tmp_path / 'node.rec'
+    path.write_bytes(b'not a recording')
+    with pytest.raises(ValueError, match='not a recording'):
+        list(read_recording(path))
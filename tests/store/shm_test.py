@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import datetime
+
+import numpy as np
+import polars
+import pytest
+
+from magnify.store.shm import SharedMemoryReader
+from magnify.store.shm import SharedMemoryStore
+from magnify.types import TimedMeasurement
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _tick(i, **extra):
+    time = START + datetime.timedelta(seconds=i)
+    return {
+        'perf': TimedMeasurement(
+            time,
+            polars.DataFrame(
+                {
+                    'pid': [1, 2],
+                    'name': ['a', 'b'],
+                    'cycles': [i, 2 * i],
+                    **extra,
+                },
+            ),
+        ),
+        'rapl': TimedMeasurement(time, float(i)),
+    }
+
+
+def test_shared_memory_store(tmp_path):
+    store = SharedMemoryStore(directory=tmp_path, capacity=5)
+    store.put_measurement(_tick(0))
+
+    reader = SharedMemoryReader('perf', directory=tmp_path)
+    assert reader.columns == ['time', 'pid', 'cycles']
+    assert reader.capacity == 5  # noqa: PLR2004
+    latest = reader.latest()
+    assert latest['cycles'].tolist() == [0, 0]
+    assert latest['time'].tolist() == [START.timestamp()] * 2
+
+    # Wrap around the end of the ring
+    for i in range(1, 4):
+        store.put_measurement(_tick(i))
+    assert reader.written == 8  # noqa: PLR2004
+    assert reader.latest()['cycles'].tolist() == [2, 2, 4, 3, 6]
+    assert reader.latest(2)['pid'].tolist() == [1, 2]
+    assert not reader.column('pid').flags.writeable
+
+    rapl = SharedMemoryReader('rapl', directory=tmp_path)
+    assert rapl.window(1)['value'].tolist() == [2.0, 3.0]
+
+    reader.close()
+    rapl.close()
+    store.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_shared_memory_store_fixed_layout(tmp_path):
+    store = SharedMemoryStore(directory=tmp_path, unlink=False)
+    store.put_measurement(_tick(0))
+    store.put_measurement(
+        {'perf': TimedMeasurement(START, polars.DataFrame({'pid': [3]}))},
+    )
+    store.put_measurement(_tick(1, extra=[0.5, 0.5]))
+    store.close()
+
+    reader = SharedMemoryReader('perf', directory=tmp_path)
+    assert reader.columns == ['time', 'pid', 'cycles']
+    cycles = reader.latest()['cycles']
+    assert np.isnan(cycles[2])
+    assert cycles[[0, 1, 3, 4]].tolist() == [0, 0, 1, 2]
+    reader.close()
+
+
+def test_shared_memory_reader_errors(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SharedMemoryReader('perf', directory=tmp_path)
+
+    (tmp_path / 'magnify-perf').write_bytes(b'\0' * 4096)
+    with pytest.raises(ValueError, match='not a shared memory ring'):
+        SharedMemoryReader('perf', directory=tmp_path)
+
+
+def test_shared_memory_store_seconds(tmp_path):
+    store = SharedMemoryStore(directory=tmp_path, seconds=3, interval=0.5)
+    store.put_measurement(_tick(0))
+
+    # Six ticks of the two rows of the first tick
+    perf = SharedMemoryReader('perf', directory=tmp_path)
+    assert perf.capacity == 12  # noqa: PLR2004
+    rapl = SharedMemoryReader('rapl', directory=tmp_path)
+    assert rapl.capacity == 6  # noqa: PLR2004
+
+    perf.close()
+    rapl.close()
+    store.close()
+
+
+def test_shared_memory_reader_timeout(tmp_path):
+    store = SharedMemoryStore(directory=tmp_path)
+    store.put_measurement(_tick(0))
+    reader = SharedMemoryReader('perf', directory=tmp_path)
+
+    # A write that never finishes
+    store.rings['perf'].state[0] += 1
+    with pytest.raises(TimeoutError):
+        reader.latest(timeout=0.05)
+
+    store.rings['perf'].state[0] += 1
+    assert reader.latest()['cycles'].tolist() == [0, 0]
+    reader.close()
+    store.close()
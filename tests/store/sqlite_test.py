@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import datetime
+import sqlite3
+
+import polars
+
+from magnify.client import TaskEvent
+from magnify.store.sqlite import SqliteStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _tick(i):
+    time = START + datetime.timedelta(seconds=i)
+    return {
+        'psutil': TimedMeasurement(
+            time,
+            polars.DataFrame(
+                {'psutil_process_pid': [1, 2], 'rss': [100 * i, 200 * i]},
+            ),
+        ),
+        'rapl': TimedMeasurement(time, float(i)),
+    }
+
+
+def test_sqlite_store_measurements(tmp_path):
+    store = SqliteStore(tmp_path / 'magnify.db')
+    for i in range(3):
+        store.put_measurement(_tick(i))
+
+    journal = store.query('PRAGMA journal_mode')
+    assert journal.item() == 'wal'
+
+    rows = store.query(
+        "SELECT time, data ->> 'rss' AS rss FROM measurements "
+        'WHERE pid = ? AND time BETWEEN ? AND ? ORDER BY time',
+        (2, START.timestamp() + 1, START.timestamp() + 2),
+    )
+    assert rows['rss'].to_list() == [200, 400]
+
+    rapl = store.query(
+        "SELECT value FROM measurements WHERE stream = 'rapl'",
+    )
+    assert rapl['value'].to_list() == [0.0, 1.0, 2.0]
+    store.close()
+
+
+def test_sqlite_store_tasks(tmp_path):
+    store = SqliteStore(tmp_path / 'magnify.db')
+    events = [
+        ('a', TaskEvent.START, 0),
+        ('b', TaskEvent.START, 1),
+        ('a', TaskEvent.COMPLETE, 2),
+        ('c', TaskEvent.START, 5),
+        ('b', TaskEvent.FAIL, 6),
+    ]
+    for task_id, event, offset in events:
+        store.put_task(
+            TimedTask(
+                task_id,
+                1,
+                START + datetime.timedelta(seconds=offset),
+                event,
+            ),
+        )
+
+    tasks = store.query('SELECT * FROM tasks ORDER BY task_id')
+    assert tasks['status'].to_list() == [
+        TaskEvent.COMPLETE,
+        TaskEvent.FAIL,
+        None,
+    ]
+
+    t = START.timestamp()
+    overlapping = store.query(
+        'SELECT task_id FROM tasks WHERE start_time < ? '
+        'AND (end_time IS NULL OR end_time > ?) ORDER BY task_id',
+        (t + 4, t + 3),
+    )
+    assert overlapping['task_id'].to_list() == ['b']
+    store.close()
+
+
+def test_sqlite_store_reopen(tmp_path):
+    store = SqliteStore(tmp_path / 'magnify.db')
+    store.put_measurement(_tick(0))
+    store.close()
+
+    store = SqliteStore(tmp_path / 'magnify.db')
+    store.put_measurement(_tick(1))
+    count = store.query('SELECT count(*) FROM measurements').item()
+    assert count == 6  # noqa: PLR2004
+    store.close()
+
+
+def test_sqlite_store_task_hosts(tmp_path):
+    store = SqliteStore(tmp_path / 'magnify.db')
+    for host in ('n0', 'n1', None):
+        store.put_task(TimedTask('a', 1, START, TaskEvent.START, host))
+    store.put_task(TimedTask('a', 1, START, TaskEvent.COMPLETE, 'n1'))
+
+    tasks = store.query('SELECT host, status FROM tasks ORDER BY host')
+    assert tasks['host'].to_list() == ['', 'n0', 'n1']
+    assert tasks['status'].to_list() == [None, None, TaskEvent.COMPLETE]
+    store.close()
+
+
+def test_sqlite_store_migrates_tasks(tmp_path):
+    connection = sqlite3.connect(tmp_path / 'magnify.db')
+    connection.executescript(
+        'CREATE TABLE tasks (task_id TEXT NOT NULL, pid INTEGER NOT NULL, '
+        'start_time REAL, end_time REAL, status INTEGER, '
+        'PRIMARY KEY (task_id, pid));'
+        'CREATE INDEX tasks_pid ON tasks (pid);'
+        "INSERT INTO tasks VALUES ('a', 1, 0.0, 1.0, 1);",
+    )
+    connection.close()
+
+    store = SqliteStore(tmp_path / 'magnify.db')
+    store.put_task(TimedTask('a', 1, START, TaskEvent.START, 'n0'))
+    tasks = store.query('SELECT task_id, host FROM tasks ORDER BY host')
+    assert tasks['host'].to_list() == ['', 'n0']
+    store.close()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import datetime
+import threading
+
+import pytest
+
+from magnify.client import TaskEvent
+from magnify.store.base import BaseStore
+from magnify.store.writer import AsyncStore
+from magnify.types import TimedMeasurement
+from magnify.types import TimedTask
+
+
+class _SlowStore(BaseStore):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.release = threading.Event()
+        self.release.set()
+        self.measurements = []
+        self.tasks = []
+        self.closed = False
+
+    def _put(self, measurements):
+        self.release.wait()
+        self.measurements.append(measurements)
+
+    def put_task(self, task):
+        self.release.wait()
+        self.tasks.append(task)
+
+    def close(self):
+        self.closed = True
+
+
+def _tick(i):
+    time = datetime.datetime.now(datetime.UTC)
+    return {'rapl': TimedMeasurement(time, float(i))}
+
+
+def test_invalid_options():
+    with pytest.raises(ValueError, match='Unknown policy'):
+        AsyncStore(_SlowStore(), policy='spill')
+    with pytest.raises(ValueError, match='at least 1'):
+        AsyncStore(_SlowStore(), max_size=0)
+
+
+def test_async_store_writes():
+    inner = _SlowStore(includes={'perf'})
+    store = AsyncStore(inner)
+    store.put_measurement({**_tick(0), 'perf': _tick(1)['rapl']})
+    task = TimedTask('task', 1, datetime.datetime.now(), TaskEvent.START)
+    store.put_task(task)
+
+    assert store.flush(timeout=5)
+    assert list(inner.measurements[0]) == ['perf']
+    assert inner.tasks == [task]
+    assert store.metrics()['written'] == 2  # noqa: PLR2004
+
+    store.close()
+    assert inner.closed
+    with pytest.raises(RuntimeError, match='closed'):
+        store.put_measurement(_tick(0))
+
+
+@pytest.mark.parametrize(
+    ('policy', 'expected'),
+    (('drop_oldest', [0.0, 3.0, 4.0]), ('drop_newest', [0.0, 1.0, 2.0])),
+)
+def test_async_store_drop(policy, expected):
+    inner = _SlowStore()
+    inner.release.clear()
+    store = AsyncStore(inner, max_size=2, policy=policy)
+    try:
+        store.put_measurement(_tick(0))
+        # Wait for the writer to block on the first tick
+        while store.depth > 0:
+            pass
+        for i in range(1, 5):
+            store.put_measurement(_tick(i))
+        assert store.depth == 2  # noqa: PLR2004
+        assert store.dropped == 2  # noqa: PLR2004
+    finally:
+        inner.release.set()
+
+    store.close()
+    values = [m['rapl'].measurement for m in inner.measurements]
+    assert values == expected
+
+
+def test_async_store_block():
+    inner = _SlowStore()
+    inner.release.clear()
+    store = AsyncStore(inner, max_size=1, policy='block')
+    try:
+        store.put_measurement(_tick(0))
+        store.put_measurement(_tick(1))
+        putter = threading.Thread(
+            target=store.put_measurement,
+            args=(_tick(2),),
+        )
+        putter.start()
+        putter.join(timeout=0.1)
+        assert putter.is_alive()
+    finally:
+        inner.release.set()
+
+    putter.join()
+    store.close()
+    assert len(inner.measurements) == 3  # noqa: PLR2004
+    assert store.dropped == 0
+    assert store.metrics()['enqueue_seconds_max'] > 0
+
+
+def test_async_store_write_failure(caplog):
+    inner = _SlowStore()
+    inner._put = lambda _: 1 / 0
+    store = AsyncStore(inner)
+    store.put_measurement(_tick(0))
+    store.close()
+    assert store.write_failures == 1
+    assert 'Failed to write a measurement' in caplog.text
+    assert 'ZeroDivisionError' in caplog.text
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import datetime
+import random
+
+from magnify.client import TaskEvent
+from magnify.tasks import TaskTracker
+from magnify.types import TimedTask
+
+START = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+
+def _time(seconds):
+    return START + datetime.timedelta(seconds=seconds)
+
+
+def _task(task_id, pid, seconds, event):
+    return TimedTask(task_id, pid, _time(seconds), event)
+
+
+def test_task_tracker_pairs_events():
+    tracker = TaskTracker()
+    assert tracker.add(_task('a', 1, 0, TaskEvent.START)) == []
+    assert tracker.add(_task('b', 1, 1, TaskEvent.START)) == []
+
+    (interval,) = tracker.add(_task('a', 1, 2, TaskEvent.COMPLETE))
+    assert interval.start_time == _time(0)
+    assert interval.end_time == _time(2)
+    assert interval.status == TaskEvent.COMPLETE
+
+    # An end without a start is still reported
+    (interval,) = tracker.add(_task('c', 2, 3, TaskEvent.FAIL))
+    assert interval.start_time is None
+    assert interval.status == TaskEvent.FAIL
+
+    assert [i.task_id for i in tracker.drain()] == ['b']
+    assert tracker.open == {}
+
+
+def test_task_tracker_expires_orphans():
+    tracker = TaskTracker(ttl=10, history=5)
+    tracker.add(_task('a', 1, 0, TaskEvent.START))
+    tracker.add(_task('b', 1, 5, TaskEvent.START))
+    tracker.add(_task('b', 1, 6, TaskEvent.COMPLETE))
+
+    (_, orphan) = tracker.add(_task('c', 2, 12, TaskEvent.COMPLETE))
+    assert orphan.task_id == 'a'
+    assert orphan.end_time is None
+    assert tracker.expired == 1
+
+    # The ended interval of b left the index after the history window
+    assert tracker.trees == {}
+    (interval,) = tracker.add(_task('a', 1, 13, TaskEvent.COMPLETE))
+    assert interval.start_time is None
+
+
+def test_task_tracker_running():
+    tracker = TaskTracker()
+    tracker.add(_task('a', 1, 0, TaskEvent.START))
+    tracker.add(_task('b', 1, 2, TaskEvent.START))
+    tracker.add(_task('c', 2, 2, TaskEvent.START))
+    tracker.add(_task('a', 1, 4, TaskEvent.COMPLETE))
+
+    def running(pid, seconds):
+        return sorted(i.task_id for i in tracker.running(pid, _time(seconds)))
+
+    assert running(1, 1) == ['a']
+    assert running(1, 3) == ['a', 'b']
+    assert running(1, 4) == ['b']
+    assert running(1, 100) == ['b']
+    assert running(2, 1) == []
+    assert running(3, 1) == []
+
+
+def test_task_tracker_running_hosts():
+    tracker = TaskTracker()
+    for task_id, host in (('a', None), ('b', 'n0'), ('c', 'n1')):
+        tracker.add(
+            TimedTask(task_id, 1, _time(0), TaskEvent.START, host),
+        )
+    tracker.add(TimedTask('b', 1, _time(2), TaskEvent.COMPLETE, 'n0'))
+
+    def running(host, seconds):
+        return [i.task_id for i in tracker.running(1, _time(seconds), host)]
+
+    assert running(None, 1) == ['a']
+    assert running('n0', 1) == ['b']
+    assert running('n1', 1) == ['c']
+    assert running('n0', 3) == []
+    assert [i.task_id for i in tracker.intervals()] == ['a', 'b', 'c']
+
+
+def test_task_tracker_running_matches_scan():
+    rng = random.Random(0)
+    tracker = TaskTracker(ttl=1e9, history=1e9)
+    intervals = []
+    for i in range(500):
+        start = rng.uniform(0, 1000)
+        end = start + rng.uniform(0, 50)
+        intervals.append((i, start, end))
+    for i, start, _ in sorted(intervals, key=lambda x: x[1]):
+        tracker.add(_task(i, 1, start, TaskEvent.START))
+    for i, _, end in sorted(intervals, key=lambda x: x[2]):
+        tracker.add(_task(i, 1, end, TaskEvent.COMPLETE))
+
+    for _ in range(100):
+        t = rng.uniform(0, 1050)
+        expected = {i for i, start, end in intervals if start <= t < end}
+        found = {i.task_id for i in tracker.running(1, _time(t))}
+        assert found == expected